@@ -0,0 +1,63 @@
+""" Compares parsing metadata rows one at a time against the bulk decoder
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/parse.py
+"""
+
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.parse import parse_operation, parse_operation_rows
+
+# share the synthetic history with the replay benchmark
+sys.path.insert(0, str(Path(__file__).parent))
+
+from replay import make_history
+
+
+def parse_one_at_a_time(rows: list[tuple[str, str]]) -> list[Operation]:
+    """ The parsing path before the bulk decoder """
+    return [parse_operation(op_kind, json.loads(op_data)) for op_kind, op_data in rows]
+
+
+def time_it(fn, *args: Any) -> tuple[float, list[Operation]]:
+    start = perf_counter()
+    operations = fn(*args)
+    return perf_counter() - start, operations
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--size', type=int, default=20_000, help='number of rows in the history')
+    parser.add_argument('--tables', type=int, default=100, help='number of tables in the history')
+    parser.add_argument('--processes', type=int, default=4, help='processes for the parallel decoder')
+    args = parser.parse_args()
+
+    history = make_history(args.size, args.tables)
+    rows = [(op.KIND, op.model_dump_json(exclude_none=True)) for op in history]
+
+    # build the cached validators outside the timings
+    parse_operation_rows(rows[:len(rows) // 10])
+
+    serial_seconds, serial_ops = time_it(parse_one_at_a_time, rows)
+    bulk_seconds, bulk_ops = time_it(parse_operation_rows, rows)
+    parallel_seconds, parallel_ops = time_it(parse_operation_rows, rows, args.processes)
+
+    assert serial_ops == history and bulk_ops == history and parallel_ops == history, 'Parsers diverged'
+
+    print(f'rows:       {len(rows)}')
+    print(f'cpus:       {os.cpu_count()}')
+    print(f'serial:     {serial_seconds:.3f}s')
+    print(f'bulk:       {bulk_seconds:.3f}s ({serial_seconds / bulk_seconds:.1f}x)')
+    print(f'parallel:   {parallel_seconds:.3f}s ({serial_seconds / parallel_seconds:.1f}x, {args.processes} processes)')
+
+
+if __name__ == '__main__':
+    main()
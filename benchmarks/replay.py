@@ -0,0 +1,99 @@
+""" Compares simulating a history through `MigrateRunner` against `replay`
+
+Run from the repository root:
+
+    PYTHONPATH=src python benchmarks/replay.py
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
+from liti.core.context import Context
+from liti.core.function import replay
+from liti.core.model.v1.datatype import BOOL, INT64, STRING
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.column import AddColumn, RenameColumn, SetColumnDescription
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, SetDescription, SetLabels
+from liti.core.model.v1.schema import Column, ColumnName, Identifier, QualifiedName, Schema, Table
+from liti.core.runner import MigrateRunner
+
+
+def make_history(size: int, table_count: int) -> list[Operation]:
+    """ Builds a history of `size` operations spread over `table_count` wide tables """
+
+    schema_name = QualifiedName('bench_project.bench_dataset')
+    history: list[Operation] = [CreateSchema(schema_object=Schema(name=schema_name))]
+
+    for t in range(table_count):
+        history.append(CreateTable(table=Table(
+            name=schema_name.with_name(Identifier(f'table_{t}')),
+            columns=[Column(f'col_{c}', INT64) for c in range(50)],
+        )))
+
+    step = 0
+
+    while len(history) < size:
+        table_name = schema_name.with_name(Identifier(f'table_{step % table_count}'))
+        column_name = ColumnName(f'new_col_{step}')
+
+        history.extend([
+            AddColumn(table_name=table_name, column=Column(column_name, STRING)),
+            SetColumnDescription(table_name=table_name, column_name=column_name, description=f'step {step}'),
+            RenameColumn(table_name=table_name, from_name=column_name, to_name=ColumnName(f'renamed_col_{step}')),
+            SetDescription(entity_name=table_name, description=f'step {step}'),
+            SetLabels(entity_name=table_name, labels={'step': str(step)}),
+            AddColumn(table_name=table_name, column=Column(f'flag_{step}', BOOL)),
+        ])
+
+        step += 1
+
+    return history[:size]
+
+
+def simulate_with_runner(history: list[Operation]) -> MemoryDbBackend:
+    """ The simulation path before the replay engine """
+
+    context = Context(
+        db_backend=MemoryDbBackend(),
+        meta_backend=MemoryMetaBackend(),
+        target_operations=history,
+        silent=True,
+    )
+
+    MigrateRunner(context=context).run(wet_run=True, store_inverses=False)
+    return context.db_backend
+
+
+def simulate_with_replay(history: list[Operation]) -> MemoryDbBackend:
+    db_backend = MemoryDbBackend()
+    replay(db_backend, history)
+    return db_backend
+
+
+def time_it(fn, history: list[Operation]) -> tuple[float, MemoryDbBackend]:
+    start = perf_counter()
+    db_backend = fn(history)
+    return perf_counter() - start, db_backend
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--size', type=int, default=10_000, help='number of operations in the history')
+    parser.add_argument('--tables', type=int, default=100, help='number of tables in the history')
+    args = parser.parse_args()
+
+    history = make_history(args.size, args.tables)
+    runner_seconds, runner_db = time_it(simulate_with_runner, history)
+    replay_seconds, replay_db = time_it(simulate_with_replay, history)
+
+    assert runner_db.dump_catalog() == replay_db.dump_catalog(), 'Simulations diverged'
+
+    print(f'operations: {len(history)}')
+    print(f'runner:     {runner_seconds:.3f}s')
+    print(f'replay:     {replay_seconds:.3f}s')
+    print(f'speedup:    {runner_seconds / replay_seconds:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
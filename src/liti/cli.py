@@ -7,9 +7,16 @@ from pydantic import BaseModel, ConfigDict
 from liti import bigquery as bq
 from liti.core.backend.base import DbBackend, MetaBackend
 from liti.core.backend.bigquery import BigQueryDbBackend, BigQueryMetaBackend
+from liti.core.backend.file import FileMetaBackend
 from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
+from liti.core.backend.sqlite import DEFAULT_TABLE_NAME, SqliteMetaBackend
+from liti.core.baseline import build_baseline, write_baseline_file
+from liti.core.checkpoint import DEFAULT_INTERVAL, SimulationCheckpoints
 from liti.core.client.bigquery import BqClient
+from liti.core.client.bigquery_storage import BqWriteClient, is_available
 from liti.core.context import Context
+from liti.core.digest import EMPTY_DIGEST, prefix_digests
+from liti.core.mirror import MetaMirror
 from liti.core.model.v1.schema import DatabaseName, Identifier, QualifiedName, SchemaName
 from liti.core.runner import MigrateRunner, ScanRunner
 
@@ -33,8 +40,22 @@ def parse_all_arguments() -> Namespace:
     parser.add_argument('-d', '--down', action=BooleanOptionalAction, default=False, help='should allow performing down migrations')
     parser.add_argument('-v', '--verbose', action=BooleanOptionalAction, default=False, help='should log in a wet run')
     parser.add_argument('--db', default='memory', help='type of database backend (e.g. memory, bigquery) (default: memory)')
-    parser.add_argument('--meta', default='memory', help='type of metadata backend (e.g. memory, bigquery) (default: memory)')
+    parser.add_argument('--meta', default='memory', help='type of metadata backend (e.g. memory, bigquery, file, sqlite) (default: memory)')
     parser.add_argument('--meta-table-name', help='fully qualified table name for a metadata table')
+    parser.add_argument('--meta-file', help='path to a metadata log file or SQLite database')
+    parser.add_argument('--meta-batch-size', type=int, default=1, help='applied or rolled back operations to buffer per metadata write, 0 writes once per migration phase (default: 1)')
+    parser.add_argument('--meta-parse-processes', type=int, default=1, help='processes to parse large metadata histories with (default: 1)')
+    parser.add_argument('--meta-background', action=BooleanOptionalAction, default=False, help='should write the metadata from a background thread while the next operations run')
+    parser.add_argument('--meta-storage-write', action=BooleanOptionalAction, default=False, help='should append metadata rows through the BigQuery Storage Write API instead of DML')
+    parser.add_argument('--meta-compress', action=BooleanOptionalAction, default=False, help='should store the operation data of new metadata rows gzip compressed')
+    parser.add_argument('--meta-mirror-dir', help='directory to keep local copies of metadata tables in')
+    parser.add_argument('--meta-partitioned', action=BooleanOptionalAction, default=False, help='should create the metadata table partitioned and clustered by idx')
+    parser.add_argument('--meta-stream', help='id of the history within a metadata table shared by several histories')
+    parser.add_argument('--checkpoint-dir', help='directory to cache simulation checkpoints in')
+    parser.add_argument('--checkpoint-interval', type=int, help=f'operations between simulation checkpoints (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--baseline-count', type=int, help='number of operations from the start of the history to compact')
+    parser.add_argument('--stream-target', action='append', metavar=('stream=target',), help='[repeatable] stream id and directory with its migration files')
+    parser.add_argument('--baseline-file', default='baseline.json', help='path to write the baseline to relative to the target directory (default: baseline.json)')
     parser.add_argument('--scan-database', help='database to scan')
     parser.add_argument('--scan-schema', help='schema to scan')
     parser.add_argument('--scan-table', help='table to scan')
@@ -51,8 +72,19 @@ def parse_migrate_arguments() -> Namespace:
     parser.add_argument('-d', '--down', action=BooleanOptionalAction, default=False, help='should allow performing down migrations')
     parser.add_argument('-v', '--verbose', action=BooleanOptionalAction, default=False, help='should log in a wet run')
     parser.add_argument('--db', default='memory', help='type of database backend (e.g. memory, bigquery) (default: memory)')
-    parser.add_argument('--meta', default='memory', help='type of metadata backend (e.g. memory, bigquery) (default: memory)')
+    parser.add_argument('--meta', default='memory', help='type of metadata backend (e.g. memory, bigquery, file, sqlite) (default: memory)')
     parser.add_argument('--meta-table-name', help='fully qualified table name for a metadata table')
+    parser.add_argument('--meta-file', help='path to a metadata log file or SQLite database')
+    parser.add_argument('--meta-batch-size', type=int, default=1, help='applied or rolled back operations to buffer per metadata write, 0 writes once per migration phase (default: 1)')
+    parser.add_argument('--meta-parse-processes', type=int, default=1, help='processes to parse large metadata histories with (default: 1)')
+    parser.add_argument('--meta-background', action=BooleanOptionalAction, default=False, help='should write the metadata from a background thread while the next operations run')
+    parser.add_argument('--meta-storage-write', action=BooleanOptionalAction, default=False, help='should append metadata rows through the BigQuery Storage Write API instead of DML')
+    parser.add_argument('--meta-compress', action=BooleanOptionalAction, default=False, help='should store the operation data of new metadata rows gzip compressed')
+    parser.add_argument('--meta-mirror-dir', help='directory to keep local copies of metadata tables in')
+    parser.add_argument('--meta-partitioned', action=BooleanOptionalAction, default=False, help='should create the metadata table partitioned and clustered by idx')
+    parser.add_argument('--meta-stream', help='id of the history within a metadata table shared by several histories')
+    parser.add_argument('--checkpoint-dir', help='directory to cache simulation checkpoints in')
+    parser.add_argument('--checkpoint-interval', type=int, help=f'operations between simulation checkpoints (default: {DEFAULT_INTERVAL})')
     parser.add_argument('--gcp-project', help='project to use for GCP backends')
     return parser.parse_args()
 
@@ -68,6 +100,53 @@ def parse_scan_arguments() -> Namespace:
     return parser.parse_args()
 
 
+def parse_upgrade_meta_arguments() -> Namespace:
+    parser = ArgumentParser(prog='liti')
+    parser.add_argument('command', help='action to perform')
+    parser.add_argument('--meta', required=True, help='type of metadata backend (e.g. bigquery)')
+    parser.add_argument('--meta-table-name', required=True, help='fully qualified table name for a metadata table')
+    parser.add_argument('--meta-stream', help='id of the history within a metadata table shared by several histories')
+    parser.add_argument('--gcp-project', help='project to use for GCP backends')
+    return parser.parse_args()
+
+
+def parse_status_arguments() -> Namespace:
+    parser = ArgumentParser(prog='liti')
+    parser.add_argument('command', help='action to perform')
+    parser.add_argument('--stream-target', action='append', metavar=('stream=target',), help='[repeatable] stream id and directory with its migration files')
+    parser.add_argument('--tpl', action='append', metavar=('template',), help='[repeatable] filename containing operation templates')
+    parser.add_argument('--db', default='memory', help='type of database backend (e.g. memory, bigquery) (default: memory)')
+    parser.add_argument('--meta', required=True, help='type of metadata backend (e.g. bigquery)')
+    parser.add_argument('--meta-table-name', required=True, help='fully qualified table name for a metadata table')
+    parser.add_argument('--gcp-project', help='project to use for GCP backends')
+    return parser.parse_args()
+
+
+def parse_compact_arguments() -> Namespace:
+    parser = ArgumentParser(prog='liti')
+    parser.add_argument('command', help='action to perform')
+    parser.add_argument('-t', '--target', required=True, help='directory with migration files')
+    parser.add_argument('--tpl', action='append', metavar=('template',), help='[repeatable] filename containing operation templates')
+    parser.add_argument('-w', '--wet', action=BooleanOptionalAction, default=False, help='should also compact the metadata')
+    parser.add_argument('--baseline-count', type=int, required=True, help='number of operations from the start of the history to compact')
+    parser.add_argument('--baseline-file', default='baseline.json', help='path to write the baseline to relative to the target directory (default: baseline.json)')
+    parser.add_argument('--db', default='memory', help='type of database backend (e.g. memory, bigquery) (default: memory)')
+    parser.add_argument('--meta', default='memory', help='type of metadata backend (e.g. memory, bigquery, file, sqlite) (default: memory)')
+    parser.add_argument('--meta-table-name', help='fully qualified table name for a metadata table')
+    parser.add_argument('--meta-file', help='path to a metadata log file or SQLite database')
+    parser.add_argument('--meta-batch-size', type=int, default=1, help='applied or rolled back operations to buffer per metadata write, 0 writes once per migration phase (default: 1)')
+    parser.add_argument('--meta-parse-processes', type=int, default=1, help='processes to parse large metadata histories with (default: 1)')
+    parser.add_argument('--meta-storage-write', action=BooleanOptionalAction, default=False, help='should append metadata rows through the BigQuery Storage Write API instead of DML')
+    parser.add_argument('--meta-compress', action=BooleanOptionalAction, default=False, help='should store the operation data of new metadata rows gzip compressed')
+    parser.add_argument('--meta-mirror-dir', help='directory to keep local copies of metadata tables in')
+    parser.add_argument('--meta-partitioned', action=BooleanOptionalAction, default=False, help='should create the metadata table partitioned and clustered by idx')
+    parser.add_argument('--meta-stream', help='id of the history within a metadata table shared by several histories')
+    parser.add_argument('--checkpoint-dir', help='directory to cache simulation checkpoints in')
+    parser.add_argument('--checkpoint-interval', type=int, help=f'operations between simulation checkpoints (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--gcp-project', help='project to use for GCP backends')
+    return parser.parse_args()
+
+
 def build_clients(args: Namespace) -> Clients:
     client_ids = []
 
@@ -104,15 +183,50 @@ def build_db_backend(args: Namespace, clients: Clients) -> DbBackend:
         raise ValueError(f'Invalid database backend: {args.db}')
 
 
+def build_write_client(args: Namespace) -> BqWriteClient | None:
+    if args.meta_storage_write:
+        if is_available():
+            return BqWriteClient()
+
+        log.warning('Inserting metadata with DML, google-cloud-bigquery-storage is not installed')
+
+    return None
+
+
 def build_meta_backend(args: Namespace, clients: Clients) -> MetaBackend:
     if args.meta == 'memory':
         return MemoryMetaBackend()
     elif args.meta == 'bigquery':
-        return BigQueryMetaBackend(clients.big_query, QualifiedName(args.meta_table_name))
+        return BigQueryMetaBackend(
+            clients.big_query,
+            QualifiedName(args.meta_table_name),
+            batch_size=args.meta_batch_size or None,
+            mirror=args.meta_mirror_dir and MetaMirror(Path(args.meta_mirror_dir)),
+            partitioned=args.meta_partitioned,
+            stream=args.meta_stream,
+            parse_processes=args.meta_parse_processes,
+            write_client=build_write_client(args),
+            compress=args.meta_compress,
+        )
+    elif args.meta == 'file':
+        return FileMetaBackend(Path(args.meta_file))
+    elif args.meta == 'sqlite':
+        return SqliteMetaBackend(
+            Path(args.meta_file),
+            args.meta_table_name or DEFAULT_TABLE_NAME,
+            batch_size=args.meta_batch_size or None,
+        )
     else:
         raise ValueError(f'Invalid metadata backend: {args.meta}')
 
 
+def build_checkpoints(args: Namespace) -> SimulationCheckpoints | None:
+    if args.checkpoint_dir:
+        return SimulationCheckpoints(Path(args.checkpoint_dir), args.checkpoint_interval)
+    else:
+        return None
+
+
 def migrate():
     args = parse_migrate_arguments()
     silent = args.wet and not args.verbose
@@ -132,11 +246,13 @@ def migrate():
         target_dir=args.target and Path(args.target),
         silent=silent,
         template_files=args.tpl and [Path(template) for template in args.tpl],
+        checkpoints=build_checkpoints(args),
     ))
 
     runner.run(
         wet_run=args.wet,
         allow_down=args.down,
+        background_meta=args.meta_background,
     )
 
 
@@ -156,6 +272,73 @@ def scan():
     )
 
 
+def upgrade_meta():
+    args = parse_upgrade_meta_arguments()
+    logging.basicConfig(level=logging.INFO)
+    clients = build_clients(args)
+
+    if args.meta == 'bigquery':
+        BigQueryMetaBackend(clients.big_query, QualifiedName(args.meta_table_name), stream=args.meta_stream).upgrade_layout()
+    else:
+        raise ValueError(f'Metadata backend does not support layout upgrades: {args.meta}')
+
+
+def compact():
+    args = parse_compact_arguments()
+    logging.basicConfig(level=logging.INFO)
+    clients = build_clients(args)
+    target_dir = Path(args.target)
+    checkpoints = build_checkpoints(args)
+
+    runner = MigrateRunner(context=Context(
+        db_backend=build_db_backend(args, clients),
+        target_dir=target_dir,
+        template_files=args.tpl and [Path(template) for template in args.tpl],
+    ))
+
+    # the baseline must match the history as applied, so it is built from operations with their defaults set
+    operations = runner.prepare_target_operations()
+
+    if not 0 < args.baseline_count <= len(operations):
+        raise ValueError(f'Baseline count must be between 1 and {len(operations)}: {args.baseline_count}')
+
+    baseline = build_baseline(operations[:args.baseline_count], checkpoints)
+    write_baseline_file(target_dir / args.baseline_file, baseline)
+
+    if args.wet:
+        build_meta_backend(args, clients).compact(baseline)
+
+
+def status():
+    args = parse_status_arguments()
+    clients = build_clients(args)
+
+    if args.meta != 'bigquery':
+        raise ValueError(f'Metadata backend does not support streams: {args.meta}')
+
+    db_backend = build_db_backend(args, clients)
+    tails = BigQueryMetaBackend(clients.big_query, QualifiedName(args.meta_table_name)).get_stream_tails()
+    targets = dict(stream_target.split('=', 1) for stream_target in args.stream_target or [])
+
+    for stream in sorted(tails.keys() | targets.keys()):
+        count, digest = tails.get(stream, (0, EMPTY_DIGEST))
+
+        if stream in targets:
+            runner = MigrateRunner(context=Context(
+                db_backend=db_backend,
+                target_dir=Path(targets[stream]),
+                template_files=args.tpl and [Path(template) for template in args.tpl],
+            ))
+
+            # the applied digests are of operations with their defaults set
+            operations = runner.prepare_target_operations()
+            state = 'current' if (count, digest) == (len(operations), prefix_digests(operations)[-1]) else 'pending'
+        else:
+            state = 'untracked'
+
+        print(f'{stream}\t{count}\t{state}')
+
+
 def main():
     args = parse_all_arguments()
 
@@ -163,5 +346,11 @@ def main():
         migrate()
     elif args.command == 'scan':
         scan()
+    elif args.command == 'upgrade-meta':
+        upgrade_meta()
+    elif args.command == 'compact':
+        compact()
+    elif args.command == 'status':
+        status()
     else:
         raise ValueError(f'Invalid command: {args.command}')
@@ -0,0 +1,103 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from liti.core.backend.base import MetaBackend
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
+
+
+class BackgroundMetaBackend(MetaBackend):
+    """ Writes to another meta backend from a background thread so each write overlaps with the next operation
+
+    Every call to the wrapped backend runs in order on a single thread, so writes are never reordered, reads see the
+    writes submitted before them, and backends with thread bound connections keep working. Writes return as soon as
+    they are queued, everything else waits for its result.
+
+    At most one write is outstanding since each write first waits for the previous one. After a crash, at most two
+    applied operations are missing from the metadata, the one whose write was in flight and the one that was running,
+    and the next run checks both with `is_up`. A failed write fails every call after it, so nothing is written out of
+    order and the run aborts at its next metadata call.
+    """
+
+    def __init__(self, meta_backend: MetaBackend):
+        self.meta_backend = meta_backend
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='liti-meta')
+        self.failure: BaseException | None = None
+        self.pending_write: Future | None = None
+
+    def run(self, fn: Callable, *args: Any) -> Any:
+        """ Runs a call on the background thread """
+
+        if self.failure is not None:
+            raise RuntimeError('Skipped since an earlier metadata write failed') from self.failure
+
+        try:
+            return fn(*args)
+        except BaseException as e:
+            self.failure = e
+            raise
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        if self.failure is not None:
+            raise self.failure
+
+        return self.executor.submit(self.run, fn, *args)
+
+    def write(self, fn: Callable, *args: Any):
+        """ Queues a write after waiting for the previous one, so the queue never holds more than one write """
+
+        if self.pending_write is not None:
+            self.pending_write.result()
+
+        self.pending_write = self.submit(fn, *args)
+
+    def call(self, fn: Callable, *args: Any) -> Any:
+        """ Runs a call on the background thread after the queued writes and waits for its result """
+
+        future = self.submit(fn, *args)
+
+        try:
+            return future.result()
+        except RuntimeError:
+            # report the write that failed rather than the call skipped because of it
+            if self.failure is not None and self.failure is not future.exception():
+                raise self.failure
+
+            raise
+
+    def close(self):
+        """ Waits for the queued writes and stops the background thread """
+        self.executor.shutdown(wait=True)
+
+    def initialize(self):
+        self.call(self.meta_backend.initialize)
+
+    def get_applied_operations(self) -> list[Operation]:
+        return self.call(self.meta_backend.get_applied_operations)
+
+    def get_inverse_operations(self) -> list[Operation | None]:
+        return self.call(self.meta_backend.get_inverse_operations)
+
+    def get_applied_digests(self) -> list[str] | None:
+        return self.call(self.meta_backend.get_applied_digests)
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        return self.call(self.meta_backend.get_applied_tail, start)
+
+    def get_applied_op_data(self) -> list[tuple[str, dict[str, Any]]] | None:
+        return self.call(self.meta_backend.get_applied_op_data)
+
+    def get_migration_plan(self, target: list[Operation]) -> dict[str, list[Operation]]:
+        return self.call(self.meta_backend.get_migration_plan, target)
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        self.write(self.meta_backend.apply_operation, operation, inverse)
+
+    def unapply_operation(self, operation: Operation):
+        self.write(self.meta_backend.unapply_operation, operation)
+
+    def flush(self):
+        self.call(self.meta_backend.flush)
+
+    def compact(self, baseline: Baseline):
+        self.call(self.meta_backend.compact, baseline)
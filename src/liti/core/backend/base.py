@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from typing import Any
 
+from liti.core.digest import find_baseline, op_data_prefix_digests, prefix_digests
 from liti.core.model.v1.datatype import Array, Datatype, Struct
 from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
 from liti.core.model.v1.operation.data.table import CreateTable
 from liti.core.model.v1.operation.data.view import CreateMaterializedView, CreateView
 from liti.core.model.v1.schema import Column, ColumnName, ConstraintName, DatabaseName, FieldPath, ForeignKey, \
@@ -31,6 +34,10 @@ class DbBackend(ABC, Defaulter, Validator):
         else:
             return None
 
+    def get_relations(self, names: list[QualifiedName]) -> dict[QualifiedName, Relation | None]:
+        """ Gets several relations at once, backends override this to batch the reads """
+        return {name: self.get_relation(name) for name in names}
+
     def has_schema(self, name: QualifiedName) -> bool:
         return self.get_schema(name) is not None
 
@@ -256,9 +263,16 @@ class MetaBackend(ABC):
     def get_applied_operations(self) -> list[Operation]:
         pass
 
+    def get_inverse_operations(self) -> list[Operation | None]:
+        """ Returns the stored inverse of each applied operation, None where it was not stored """
+        return [None] * len(self.get_applied_operations())
+
     @abstractmethod
-    def apply_operation(self, operation: Operation):
-        """ Add the operation to the metadata """
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        """ Add the operation to the metadata
+
+        The inverse, if provided, is stored alongside it so down migrations do not need to simulate the history.
+        """
         pass
 
     @abstractmethod
@@ -269,20 +283,125 @@ class MetaBackend(ABC):
         """
         pass
 
+    def flush(self):
+        """ Write any buffered metadata changes
+
+        Backends that buffer applied operations must also flush before reading or removing operations.
+        """
+        pass
+
     def get_previous_operations(self) -> list[Operation]:
         return self.get_applied_operations()[:-1]
 
+    def get_applied_digests(self) -> list[str] | None:
+        """ Returns the stored chain digest of each applied prefix, or None if the digests are not stored
+
+        The digest at position i is the chain digest of the first i + 1 applied operations.
+        """
+        return None
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        """ Returns the applied operations from position `start` onward """
+        return self.get_applied_operations()[start:]
+
+    def get_applied_op_data(self) -> list[tuple[str, dict[str, Any]]] | None:
+        """ Returns the stored kind and JSON data of each applied operation, or None if the backend only has operations
+
+        Lets histories without stored digests be compared without building an operation for every row.
+        """
+        return None
+
     def get_migration_plan(self, target: list[Operation]) -> dict[str, list[Operation]]:
-        applied = self.get_applied_operations()
+        applied_digests = self.get_applied_digests()
+
+        if applied_digests is None:
+            applied_op_data = self.get_applied_op_data()
+
+            # the digests of the canonical JSON stand in for the missing digests, equal data gives equal digests while
+            # data written before a field had a default differs, so mismatches are compared as models below
+            if applied_op_data is not None:
+                applied_digests = op_data_prefix_digests(applied_op_data)[1:]
+
+        baseline = target[0] if target and isinstance(target[0], Baseline) else None
         common_operations = 0
 
-        for applied_op, target_op in zip(applied, target):
-            if applied_op == target_op:
-                common_operations += 1
+        if applied_digests is None:
+            applied = self.get_applied_operations()
+
+            # an applied history that is not compacted yet is planned as if it were
+            if baseline is not None and applied[:1] != [baseline]:
+                compacted_operations = find_baseline(prefix_digests(applied)[1:], baseline)
+
+                if compacted_operations is not None:
+                    applied = [baseline, *applied[compacted_operations + 1:]]
+
+            for applied_op, target_op in zip(applied, target):
+                if applied_op == target_op:
+                    common_operations += 1
+                else:
+                    break
+
+            applied_tail = applied[common_operations:]
+        else:
+            compacted_operations = 0
+
+            # the chain digest of a baseline is that of the operations it compacts, so only the position changes
+            if baseline is not None and applied_digests[:1] != [baseline.digest]:
+                compacted_operations = find_baseline(applied_digests, baseline) or 0
+                applied_digests = applied_digests[compacted_operations:]
+
+            # only the operations after the histories diverge need to be fetched
+            for applied_digest, target_digest in zip(applied_digests, prefix_digests(target)[1:]):
+                if applied_digest == target_digest:
+                    common_operations += 1
+                else:
+                    break
+
+            if common_operations < len(applied_digests):
+                applied_tail = self.get_applied_tail(compacted_operations + common_operations)
+
+                equal_operations = 0
+
+                # digests also change when a new model field has a default, so equal models are still common
+                for applied_op, target_op in zip(applied_tail, target[common_operations:]):
+                    if applied_op == target_op:
+                        equal_operations += 1
+                    else:
+                        break
+
+                common_operations += equal_operations
+                applied_tail = applied_tail[equal_operations:]
             else:
-                break
+                applied_tail = []
 
         return {
-            'down': list(reversed(applied[common_operations:])),
+            'down': list(reversed(applied_tail)),
             'up': target[common_operations:],
         }
+
+    def compact(self, baseline: Baseline):
+        """ Replace the operations compacted by the baseline with the baseline
+
+        The baseline must compact a prefix of the applied history. This implementation rewrites the whole history, so
+        backends override it when they can replace the prefix in place.
+        """
+
+        self.flush()
+        applied = self.get_applied_operations()
+        inverses = self.get_inverse_operations()
+        position = find_baseline(prefix_digests(applied)[1:], baseline)
+
+        if position is None:
+            raise ValueError('The baseline does not compact a prefix of the applied history')
+
+        count = position + 1
+
+        for op in reversed(applied):
+            self.unapply_operation(op)
+
+        self.apply_operation(baseline)
+
+        for op, inverse in zip(applied[count:], inverses[count:]):
+            self.apply_operation(op, inverse)
+
+        self.flush()
@@ -1,19 +1,26 @@
+import gzip
 import json
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Iterator
+
+from google.api_core.exceptions import GoogleAPICallError
 
 from liti import bigquery as bq
 from liti.core.backend.base import CreateRelation, DbBackend, MetaBackend
 from liti.core.client.bigquery import BqClient
+from liti.core.client.bigquery_storage import BqAppendStream, BqWriteClient
 from liti.core.context import Context
+from liti.core.digest import chain_digest, EMPTY_DIGEST, operation_digest
 from liti.core.error import Unsupported, UnsupportedError
+from liti.core.mirror import MetaMirror, MirrorRow
 from liti.core.model.v1.datatype import Array, BigNumeric, BOOL, Bytes, Datatype, DATE, Date, DATE_TIME, DateTime, \
     Float, FLOAT64, GEOGRAPHY, Int, INT64, INTERVAL, JSON, Numeric, Range, String, Struct, TIME, TIMESTAMP, Timestamp
 from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
 from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable
 from liti.core.model.v1.operation.data.view import CreateMaterializedView, CreateView
-from liti.core.model.v1.parse import parse_operation
+from liti.core.model.v1.parse import iter_parse_operation_rows, parse_op_data, parse_operation_rows
 from liti.core.model.v1.schema import BigLake, Column, ColumnName, ConstraintName, DatabaseName, FieldPath, ForeignKey, \
     ForeignReference, Identifier, IntervalLiteral, MaterializedView, Partitioning, PrimaryKey, QualifiedName, Relation, \
     RoundingMode, Schema, SchemaName, StorageBilling, Table, View
@@ -30,6 +37,16 @@ ONE_DAY_IN_SECONDS = 24 * ONE_HOUR_IN_SECONDS
 ONE_SECOND_IN_MILLIS = 1000
 ONE_DAY_IN_MILLIS = ONE_DAY_IN_SECONDS * ONE_SECOND_IN_MILLIS
 
+# integer range partitions of the metadata table, BigQuery allows at most 10,000 partitions per table
+META_PARTITION_INTERVAL = 1000
+META_PARTITION_END = 10_000 * META_PARTITION_INTERVAL
+META_PAGE_SIZE = 1000
+
+
+def json_value(value: Any) -> Any:
+    """ Returns the value of a JSON column, which the client library may already have decoded """
+    return json.loads(value) if isinstance(value, str) else value
+
 
 def escape_string(value: str) -> str:
     return value.replace('\\', '\\\\').replace('"', '\\"')
@@ -728,6 +745,17 @@ def to_liti_materialized_view(table: bq.Table) -> MaterializedView:
     )
 
 
+def to_liti_relation(table: bq.Table) -> Relation | None:
+    if table.table_type == 'TABLE':
+        return to_liti_table(table)
+    elif table.table_type == 'VIEW':
+        return to_liti_view(table)
+    elif table.table_type == 'MATERIALIZED_VIEW':
+        return to_liti_materialized_view(table)
+    else:
+        return None
+
+
 def can_coerce_int(to_dt: Any) -> bool:
     return isinstance(to_dt, Numeric | BigNumeric) or to_dt == FLOAT64
 
@@ -793,8 +821,7 @@ class BigQueryDbBackend(DbBackend):
     def scan_schema(self, database: DatabaseName, schema: SchemaName) -> list[Operation]:
         dataset = to_dataset_ref(database, schema)
         schema = self.get_schema(QualifiedName(database=database, schema_name=schema))
-        relation_items = self.client.list_tables(dataset)
-        relations = [self.get_relation(to_qualified_name(item)) for item in relation_items]
+        relations = self.load_relations(dataset)
 
         if schema:
             create_schema = [CreateSchema(schema_object=schema)]
@@ -836,6 +863,40 @@ class BigQueryDbBackend(DbBackend):
         else:
             return None
 
+    def get_relation(self, name: QualifiedName) -> Relation | None:
+        # one lookup instead of one per relation type
+        if name.is_fully_qualified():
+            bq_table = self.client.find_table(to_table_ref(name))
+            return bq_table and to_liti_relation(bq_table)
+        else:
+            return None
+
+    def get_relations(self, names: list[QualifiedName]) -> dict[QualifiedName, Relation | None]:
+        # load the whole catalog of datasets with several of the relations rather than each relation
+        dataset_names: dict[bq.DatasetReference, list[QualifiedName]] = {}
+        relations = {}
+
+        for name in names:
+            if name.is_fully_qualified():
+                dataset_names.setdefault(extract_dataset_ref(name), []).append(name)
+            else:
+                relations[name] = None
+
+        for dataset, dataset_relation_names in dataset_names.items():
+            if len(dataset_relation_names) > 1:
+                catalog = {r.name: r for r in self.load_relations(dataset)}
+                relations.update((name, catalog.get(name)) for name in dataset_relation_names)
+            else:
+                relations.update((name, self.get_relation(name)) for name in dataset_relation_names)
+
+        return relations
+
+    def load_relations(self, dataset: bq.DatasetReference) -> list[Relation]:
+        """ Gets every relation in a dataset from its INFORMATION_SCHEMA catalog """
+
+        relations = (to_liti_relation(bq_table) for bq_table in self.client.load_tables(dataset))
+        return [r for r in relations if r is not None]
+
     def get_schema(self, name: QualifiedName) -> Schema | None:
         if name.is_schema():
             bq_dataset = self.client.get_dataset(extract_dataset_ref(name))
@@ -1081,11 +1142,15 @@ class BigQueryDbBackend(DbBackend):
             f'{options_sql}'
         )
 
+        self.client.set_table_type(to_table_ref(table.name), 'TABLE')
+
     def drop_table(self, name: QualifiedName):
         self.client.delete_table(to_table_ref(name))
 
     def rename_table(self, from_name: QualifiedName, to_name: Identifier):
         self.client.query_and_wait(f'ALTER TABLE `{from_name}` RENAME TO `{to_name}`')
+        self.client.set_table_type(to_table_ref(from_name.with_name(to_name)), 'TABLE')
+        self.client.set_table_type(to_table_ref(from_name), None)
 
     def set_primary_key(self, table_name: QualifiedName, primary_key: PrimaryKey | None):
         if primary_key:
@@ -1346,6 +1411,8 @@ class BigQueryDbBackend(DbBackend):
             f'{view.formatted_select_sql}\n'
         )
 
+        self.client.set_table_type(to_table_ref(view.name), 'VIEW')
+
     def drop_view(self, name: QualifiedName):
         self.drop_table(name)
 
@@ -1410,11 +1477,17 @@ class BigQueryDbBackend(DbBackend):
             f'{materialized_view.formatted_select_sql}\n'
         )
 
+        self.client.set_table_type(to_table_ref(materialized_view.name), 'MATERIALIZED_VIEW')
+
     def drop_materialized_view(self, name: QualifiedName):
         self.drop_table(name)
 
     def execute_sql(self, sql: str):
-        self.client.query_and_wait(sql)
+        try:
+            self.client.query_and_wait(sql)
+        finally:
+            # the SQL may have created or dropped relations in any dataset
+            self.client.clear_table_types()
 
     def execute_bool_value_query(self, sql: str) -> bool:
         row_iter = self.client.query_and_wait(sql)
@@ -1638,62 +1711,744 @@ class BigQueryDbBackend(DbBackend):
 
 
 class BigQueryMetaBackend(MetaBackend):
-    def __init__(self, client: BqClient, table_name: QualifiedName):
+    def __init__(
+        self,
+        client: BqClient,
+        table_name: QualifiedName,
+        batch_size: int | None = 1,
+        mirror: MetaMirror | None = None,
+        partitioned: bool = False,
+        stream: str | None = None,
+        parse_processes: int = 1,
+        write_client: BqWriteClient | None = None,
+        compress: bool = False,
+    ):
+        """
+        :param client: the client to query the metadata table with
+        :param table_name: the fully qualified name of the metadata table
+        :param batch_size: [1] buffered operations that trigger a flush, None only flushes when `flush` is called
+        :param mirror: [None] reads the metadata from a local copy that is validated against the table if provided
+        :param partitioned: [False] True to create the table partitioned by idx ranges and clustered by idx
+        :param stream: [None] the id of the history within a table shared by several histories, each stream has its own
+            idx sequence and the table is clustered by stream, None if the table holds a single history
+        :param parse_processes: [1] processes to parse the rows of large histories with
+        :param write_client: [None] appends rows through the Storage Write API if provided instead of DML inserts
+        :param compress: [False] True to store the operation data of new rows gzipped in a BYTES column, rows of either
+            encoding are read regardless
+        """
+
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f'Batch size must be at least 1: {batch_size}')
+
         self.client = client
         self.table_name = table_name
+        self.batch_size = batch_size
+        self.pending_operations: list[tuple[Operation, Operation | None]] = []
+        # most recent first, a buffer only holds one kind of change since unapplying flushes the applied operations
+        self.pending_unapplied: list[Operation] = []
+        # assigned on the client after a single read so a batch needs a single insert
+        self.next_idx: int | None = None
+        self.last_chain_digest: str | None = None
+        self.mirror = mirror
+        self.mirror_rows: list[MirrorRow] | None = None
+        self.partitioned = partitioned
+        self.stream = stream
+        self.parse_processes = parse_processes
+        self.write_client = write_client
+        self.append_stream: BqAppendStream | None = None
+        self.compress = compress
+        self.zip_column: bool | None = None
+
+    @property
+    def stream_condition(self) -> str:
+        """ SQL condition prefix selecting the rows of the stream, empty if the table holds a single history """
+        return '' if self.stream is None else 'stream = @stream AND '
+
+    @property
+    def stream_parameters(self) -> list[bq.ScalarQueryParameter]:
+        return [] if self.stream is None else [bq.ScalarQueryParameter('stream', 'STRING', self.stream)]
+
+    @staticmethod
+    def create_table_sql(
+        table_name: QualifiedName,
+        partitioned: bool,
+        streamed: bool = False,
+        compressed: bool = False,
+    ) -> str:
+        stream_column = ',\n    stream STRING' if streamed else ''
+        zip_column = ',\n    op_data_zip BYTES' if compressed else ''
+        # each stream reads a contiguous range of the clustered rows
+        clustering = 'CLUSTER BY stream, idx' if streamed else 'CLUSTER BY idx'
+
+        if partitioned:
+            # reads of the tail filter on idx, so they only scan the last partitions
+            layout = (
+                f'\n'
+                f'PARTITION BY RANGE_BUCKET(idx, GENERATE_ARRAY(0, {META_PARTITION_END}, {META_PARTITION_INTERVAL}))\n'
+                f'{clustering}'
+            )
+        elif streamed:
+            layout = f'\n{clustering}'
+        else:
+            layout = ''
+
+        return (
+            f'CREATE TABLE IF NOT EXISTS `{table_name}` (\n'
+            f'    idx INT64 NOT NULL,\n'
+            f'    op_kind STRING NOT NULL,\n'
+            f'    op_data JSON NOT NULL,\n'
+            f'    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP() NOT NULL,\n'
+            f'    inverse_op JSON,\n'
+            f'    op_digest STRING,\n'
+            f'    chain_digest STRING{stream_column}{zip_column}\n'
+            f'){layout}'
+        )
 
     def initialize(self):
         self.client.query_and_wait(
             f'CREATE SCHEMA IF NOT EXISTS `{self.table_name.database}.{self.table_name.schema_name}`;\n'
             f'\n'
-            f'CREATE TABLE IF NOT EXISTS `{self.table_name}` (\n'
-            f'    idx INT64 NOT NULL,\n'
-            f'    op_kind STRING NOT NULL,\n'
-            f'    op_data JSON NOT NULL,\n'
-            f'    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP() NOT NULL\n'
-            f')\n'
+            f'{self.create_table_sql(self.table_name, self.partitioned, self.stream is not None, self.compress)};\n'
+            f'\n'
+            f'{self.add_columns_sql()}'
+        )
+
+        self.client.set_table_type(to_table_ref(self.table_name), 'TABLE')
+
+        # the columns may have changed
+        self.zip_column = None
+
+    def add_columns_sql(self) -> str:
+        # upgrade tables created before inverse operations, digests, streams, and compression were stored
+        stream_column = ',\nADD COLUMN IF NOT EXISTS stream STRING' if self.stream is not None else ''
+        zip_column = ',\nADD COLUMN IF NOT EXISTS op_data_zip BYTES' if self.compress else ''
+
+        return (
+            f'ALTER TABLE `{self.table_name}`\n'
+            f'ADD COLUMN IF NOT EXISTS inverse_op JSON,\n'
+            f'ADD COLUMN IF NOT EXISTS op_digest STRING,\n'
+            f'ADD COLUMN IF NOT EXISTS chain_digest STRING{stream_column}{zip_column};\n'
+        )
+
+    def upgrade_layout(self):
+        """ Rebuild the metadata table partitioned by idx ranges and clustered by idx, or by stream and idx if streamed
+
+        The rows are copied into a staging table that then replaces the original, so the upgrade is not atomic and no
+        migrations should run against the table until it completes.
+        """
+
+        table_ref = to_table_ref(self.table_name)
+        self.partitioned = True
+
+        if not self.client.has_table(table_ref):
+            self.initialize()
+            return
+
+        table = self.client.get_table(table_ref)
+        # tables that gained the stream column later are still clustered by idx alone
+        clustered = self.stream is None or (table.clustering_fields or [])[:1] == ['stream']
+
+        if table.range_partitioning is not None and clustered:
+            log.info(f'Metadata table {self.table_name} is already partitioned')
+            return
+
+        # bring the columns up to date so they can all be copied
+        self.client.query_and_wait(self.add_columns_sql())
+        self.zip_column = None
+
+        staging_name = self.table_name.with_name(Identifier(f'{self.table_name.name}__liti_upgrade'))
+        columns = 'idx, op_kind, op_data, applied_at, inverse_op, op_digest, chain_digest'
+
+        if self.stream is not None:
+            columns += ', stream'
+
+        if self.has_zip_column():
+            columns += ', op_data_zip'
+
+        self.client.query_and_wait(
+            f'DROP TABLE IF EXISTS `{staging_name}`;\n'
+            f'\n'
+            f'{self.create_table_sql(staging_name, True, self.stream is not None, self.has_zip_column())};\n'
+            f'\n'
+            f'INSERT INTO `{staging_name}` ({columns})\n'
+            f'SELECT {columns} FROM `{self.table_name}`;\n'
+            f'\n'
+            f'DROP TABLE `{self.table_name}`;\n'
+            f'\n'
+            f'ALTER TABLE `{staging_name}` RENAME TO `{self.table_name.name}`;\n'
         )
 
+    def read_rows(self, columns: list[str], start: int = 0) -> Iterator[Any]:
+        """ Yields the rows of the metadata table in idx order from `start` onward
+
+        Whole table reads list the rows directly instead of running a query job. Listed rows come in storage order,
+        which is usually idx order, so only rows that arrive early are held until their turn. Reads from a later start
+        run a query so only the tail is read, and so do reads in a session since listing does not see its changes, and
+        reads of a stream since listing cannot filter rows.
+        """
+
+        if start > 0 or self.client.session_id is not None or self.stream is not None:
+            yield from self.client.query_and_wait(
+                f'SELECT {", ".join(columns)} FROM `{self.table_name}` '
+                f'WHERE {self.stream_condition}idx >= @start ORDER BY idx',
+                job_config=bq.QueryJobConfig(
+                    query_parameters=[
+                        *self.stream_parameters,
+                        bq.ScalarQueryParameter('start', 'INT64', start),
+                    ]
+                ),
+            )
+
+            return
+
+        table = self.client.get_table(to_table_ref(self.table_name))
+        fields = [field for field in table.schema if field.name == 'idx' or field.name in columns]
+        early_rows = {}
+        next_idx = 0
+
+        for row in self.client.list_rows(table, selected_fields=fields, page_size=META_PAGE_SIZE):
+            early_rows[row.idx] = row
+
+            while next_idx in early_rows:
+                yield early_rows.pop(next_idx)
+                next_idx += 1
+
+        # only a history with gaps in idx leaves rows behind
+        for idx in sorted(early_rows):
+            yield early_rows[idx]
+
+    def has_zip_column(self) -> bool:
+        """ True if the table may hold rows with compressed operation data, checked once per backend """
+
+        if self.zip_column is None:
+            table_ref = to_table_ref(self.table_name)
+
+            self.zip_column = (
+                self.client.has_table(table_ref)
+                and any(field.name == 'op_data_zip' for field in self.client.get_table(table_ref).schema)
+            )
+
+        return self.zip_column
+
+    @property
+    def op_data_columns(self) -> list[str]:
+        return ['op_data', 'op_data_zip'] if self.has_zip_column() else ['op_data']
+
+    def row_op_data(self, row: Any) -> Any:
+        """ Returns the operation data of a row read with `op_data_columns`, decompressing it if needed """
+
+        if self.has_zip_column() and row.op_data_zip is not None:
+            return gzip.decompress(row.op_data_zip).decode()
+        else:
+            return row.op_data
+
+    def iter_operation_rows(self, start: int = 0) -> Iterator[tuple[str, str | dict[str, Any]]]:
+        """ Yields the unparsed `(op_kind, op_data)` of the applied operations from position `start` onward """
+
+        self.flush()
+        mirror_rows = self.get_mirror_rows()
+
+        if mirror_rows is not None:
+            for row in mirror_rows:
+                if row['idx'] >= start:
+                    yield row['op_kind'], row['op_data']
+        elif self.client.has_table(to_table_ref(self.table_name)):
+            for row in self.read_rows(['op_kind', *self.op_data_columns], start):
+                yield row.op_kind, self.row_op_data(row)
+
+    def iter_applied_operations(self, start: int = 0) -> Iterator[Operation]:
+        """ Yields the applied operations from position `start` onward, reading and parsing the rows in chunks """
+        return iter_parse_operation_rows(self.iter_operation_rows(start), self.parse_processes)
+
     def get_applied_operations(self) -> list[Operation]:
-        if self.client.has_table(to_table_ref(self.table_name)):
-            rows = self.client.query_and_wait(f'SELECT op_kind, op_data FROM `{self.table_name}` ORDER BY idx')
-            return [parse_operation(row.op_kind, json.loads(row.op_data)) for row in rows]
+        return self.get_applied_tail(0)
+
+    def get_inverse_operations(self) -> list[Operation | None]:
+        self.flush()
+        mirror_rows = self.get_mirror_rows()
+        table_ref = to_table_ref(self.table_name)
+
+        if mirror_rows is not None:
+            return [row['inverse_op'] and parse_op_data(json_value(row['inverse_op'])) for row in mirror_rows]
+        elif self.client.has_table(table_ref):
+            if any(field.name == 'inverse_op' for field in self.client.get_table(table_ref).schema):
+                rows = self.read_rows(['inverse_op'])
+                return [row.inverse_op and parse_op_data(json_value(row.inverse_op)) for row in rows]
+            else:
+                return super().get_inverse_operations()
         else:
             return []
 
-    def apply_operation(self, operation: Operation):
-        results = self.client.query_and_wait(
-            f'INSERT INTO `{self.table_name}` (idx, op_kind, op_data)\n'
-            f'VALUES (\n'
-            f'    (SELECT COALESCE(MAX(idx) + 1, 0) FROM `{self.table_name}`),\n'
-            f'    @op_kind,\n'
-            f'    @op_data\n'
-            f')\n',
-            job_config=bq.QueryJobConfig(
-                query_parameters=[
-                    bq.ScalarQueryParameter('op_kind', 'STRING', operation.KIND),
-                    bq.ScalarQueryParameter('op_data', 'JSON', operation.model_dump_json(exclude_none=True)),
-                ]
+    def get_applied_digests(self) -> list[str] | None:
+        self.flush()
+        mirror_rows = self.get_mirror_rows()
+        table_ref = to_table_ref(self.table_name)
+
+        if mirror_rows is not None:
+            digests = [row['chain_digest'] for row in mirror_rows]
+        elif not self.client.has_table(table_ref):
+            return []
+        elif any(field.name == 'chain_digest' for field in self.client.get_table(table_ref).schema):
+            digests = [row.chain_digest for row in self.read_rows(['chain_digest'])]
+        else:
+            return None
+
+        # rows applied before digests were stored cannot be compared by digest
+        if all(digest is not None for digest in digests):
+            return digests
+        else:
+            return None
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        return list(self.iter_applied_operations(start))
+
+    def get_applied_op_data(self) -> list[tuple[str, dict[str, Any]]] | None:
+        return [(op_kind, json_value(op_data)) for op_kind, op_data in self.iter_operation_rows()]
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        self.pending_operations.append((operation, inverse))
+
+        if self.batch_size is not None and len(self.pending_operations) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Delete the buffered unapplied operations with a single delete, then insert the buffered applied operations
+        with a single multi-row insert
+        """
+
+        self.delete_unapplied()
+
+        if not self.pending_operations:
+            return
+
+        if self.next_idx is None:
+            if self.mirror_rows:
+                last_row = self.mirror_rows[-1]
+                self.next_idx, self.last_chain_digest = last_row['idx'] + 1, last_row['chain_digest']
+            elif self.mirror_rows is not None:
+                self.next_idx, self.last_chain_digest = 0, EMPTY_DIGEST
+            else:
+                self.next_idx, self.last_chain_digest = self.read_last_row()
+
+        values = []
+        query_parameters = list(self.stream_parameters)
+        new_rows = []
+        new_mirror_rows = []
+        stream_column, stream_value = (', stream', ', @stream') if self.stream is not None else ('', '')
+        # compressed rows keep a JSON null in the required op_data column
+        data_column, null_column, null_value = ('op_data_zip', ', op_data', ", JSON 'null'") if self.compress else ('op_data', '', '')
+        chain = self.last_chain_digest
+
+        for i, (operation, inverse) in enumerate(self.pending_operations):
+            if inverse is not None:
+                inverse_op = json.dumps(inverse.to_op_data(format='json'))
+            else:
+                inverse_op = None
+
+            chain = chain_digest(chain, operation)
+            op_data = operation.model_dump_json(exclude_none=True)
+
+            if self.compress:
+                data_parameter = bq.ScalarQueryParameter(f'op_data_zip_{i}', 'BYTES', gzip.compress(op_data.encode()))
+            else:
+                data_parameter = bq.ScalarQueryParameter(f'op_data_{i}', 'JSON', op_data)
+
+            row_parameters = [
+                bq.ScalarQueryParameter(f'op_kind_{i}', 'STRING', operation.KIND),
+                data_parameter,
+                bq.ScalarQueryParameter(f'inverse_op_{i}', 'JSON', inverse_op),
+                bq.ScalarQueryParameter(f'op_digest_{i}', 'STRING', operation_digest(operation)),
+                bq.ScalarQueryParameter(f'chain_digest_{i}', 'STRING', chain),
+            ]
+
+            values.append(
+                f'    ({self.next_idx + i}, {", ".join(f"@{p.name}" for p in row_parameters)}{stream_value}{null_value})'
             )
-        )
 
-        assert results.num_dml_affected_rows == 1, f'Expected exactly 1 row inserted: {results.num_dml_affected_rows}'
+            query_parameters.extend(row_parameters)
+
+            new_rows.append({
+                'idx': self.next_idx + i,
+                'op_kind': operation.KIND,
+                'op_data': 'null' if self.compress else op_data,
+                'op_data_zip': data_parameter.value if self.compress else None,
+                'inverse_op': inverse_op,
+                'op_digest': row_parameters[3].value,
+                'chain_digest': chain,
+                'stream': self.stream,
+            })
+
+            new_mirror_rows.append({
+                'idx': self.next_idx + i,
+                'op_kind': operation.KIND,
+                'op_data': op_data,
+                'inverse_op': inverse_op,
+                'chain_digest': chain,
+            })
+
+        values_sql = ',\n'.join(values)
+        count = len(self.pending_operations)
+        append_stream = self.get_append_stream()
+
+        if append_stream is not None:
+            append_stream.append(new_rows)
+        else:
+            results = self.client.query_and_wait(
+                f'INSERT INTO `{self.table_name}` '
+                f'(idx, op_kind, {data_column}, inverse_op, op_digest, chain_digest{stream_column}{null_column})\n'
+                f'VALUES\n'
+                f'{values_sql}\n',
+                job_config=bq.QueryJobConfig(query_parameters=query_parameters),
+            )
+
+            assert results.num_dml_affected_rows == count, f'Expected exactly {count} rows inserted: {results.num_dml_affected_rows}'
+
+        self.next_idx += count
+        self.last_chain_digest = chain
+        self.pending_operations = []
+
+        if self.mirror_rows is not None:
+            self.mirror_rows.extend(new_mirror_rows)
+            self.mirror.save(self.table_name, self.mirror_rows, self.stream)
+
+    def get_append_stream(self) -> BqAppendStream | None:
+        """ Returns the Storage Write API stream to append rows with, or None to insert them with DML
+
+        Rows are inserted with DML in a session since appends are not part of its transaction, and once a stream could
+        not be opened.
+        """
+
+        if self.write_client is None or self.client.session_id is not None:
+            return None
+
+        if self.append_stream is None:
+            columns = {
+                'idx': int,
+                'op_kind': str,
+                'op_data': str,
+                'inverse_op': str,
+                'op_digest': str,
+                'chain_digest': str,
+                **({'stream': str} if self.stream is not None else {}),
+                **({'op_data_zip': bytes} if self.compress else {}),
+            }
+
+            try:
+                self.append_stream = self.write_client.open_stream(to_table_ref(self.table_name), columns)
+            except GoogleAPICallError as e:
+                log.warning(f'Inserting metadata with DML, cannot open a write stream: {e}')
+                self.write_client = None
+
+        return self.append_stream
+
+    def query_last_row(self) -> list[Any]:
+        if self.stream is None:
+            where = ''
+        else:
+            where = 'WHERE stream = @stream '
+
+        return list(self.client.query_and_wait(
+            f'SELECT idx, chain_digest FROM `{self.table_name}` {where}ORDER BY idx DESC LIMIT 1',
+            job_config=bq.QueryJobConfig(query_parameters=self.stream_parameters),
+        ))
+
+    def read_last_row(self) -> tuple[int, str]:
+        """ Returns the next index and the chain digest of the applied history """
+
+        rows = self.query_last_row()
+
+        if not rows:
+            return 0, EMPTY_DIGEST
+        elif rows[0].chain_digest is not None:
+            return rows[0].idx + 1, rows[0].chain_digest
+        else:
+            # the history was applied before digests were stored, so the chain is computed from the operations
+            rows = ((row.op_kind, self.row_op_data(row)) for row in self.read_rows(['op_kind', *self.op_data_columns]))
+            count, digest = 0, EMPTY_DIGEST
+
+            # chained as they are parsed, so the history is never held in memory
+            for operation in iter_parse_operation_rows(rows, self.parse_processes):
+                count, digest = count + 1, chain_digest(digest, operation)
+
+            return count, digest
+
+    def get_mirror_rows(self) -> list[MirrorRow] | None:
+        """ Returns the rows of the metadata table from the mirror, bringing the mirror up to date first
+
+        The mirror is validated once per backend and kept current by the writes afterward. Returns None if there is no
+        mirror or it cannot be validated because the table has rows applied before digests were stored.
+        """
+
+        if self.mirror is not None and self.mirror_rows is None:
+            self.mirror_rows = self.sync_mirror()
+
+        return self.mirror_rows
+
+    def sync_mirror(self) -> list[MirrorRow] | None:
+        table_ref = to_table_ref(self.table_name)
+
+        if not self.client.has_table(table_ref):
+            return []
+
+        if not any(field.name == 'chain_digest' for field in self.client.get_table(table_ref).schema):
+            return None
+
+        rows = self.mirror.load(self.table_name, self.stream)
+        last_rows = self.query_last_row()
+
+        if not last_rows:
+            rows = []
+        elif last_rows[0].chain_digest is None:
+            return None
+        elif rows and rows[-1]['idx'] == last_rows[0].idx and rows[-1]['chain_digest'] == last_rows[0].chain_digest:
+            log.info('Metadata mirror is current')
+            return rows
+        elif rows and rows[-1]['idx'] < last_rows[0].idx:
+            # the mirror is a prefix of the table if its last row is unchanged, so only the new rows are fetched
+            new_rows = self.fetch_mirror_rows(rows[-1]['idx'])
+
+            if new_rows and new_rows[0]['chain_digest'] == rows[-1]['chain_digest']:
+                log.info(f'Fetched {len(new_rows) - 1} new rows into the metadata mirror')
+                rows += new_rows[1:]
+            else:
+                rows = self.fetch_mirror_rows(0)
+        else:
+            rows = self.fetch_mirror_rows(0)
+
+        self.mirror.save(self.table_name, rows, self.stream)
+        return rows
+
+    def fetch_mirror_rows(self, start: int) -> list[MirrorRow]:
+        rows = self.read_rows(['idx', 'op_kind', *self.op_data_columns, 'inverse_op', 'chain_digest'], start)
+
+        return [
+            {
+                'idx': row.idx,
+                'op_kind': row.op_kind,
+                'op_data': self.row_op_data(row),
+                'inverse_op': row.inverse_op,
+                'chain_digest': row.chain_digest,
+            }
+            for row in rows
+        ]
+
+    def op_data_condition(self, suffix: str) -> str:
+        """ SQL condition matching the row of an operation given by `op_data_parameters` """
+
+        # ensure normalized comparison, cannot compare JSON types
+        json_condition = f'TO_JSON_STRING(op_data) = TO_JSON_STRING(@op_data{suffix})'
+
+        if self.has_zip_column():
+            # compressed rows are matched by digest, which every compressed row has
+            return f'(op_digest = @op_digest{suffix} OR {json_condition})'
+        else:
+            return json_condition
+
+    def op_data_parameters(self, operation: Operation, suffix: str) -> list[bq.ScalarQueryParameter]:
+        parameters = [bq.ScalarQueryParameter(f'op_data{suffix}', 'JSON', operation.model_dump_json(exclude_none=True))]
+
+        if self.has_zip_column():
+            parameters.append(bq.ScalarQueryParameter(f'op_digest{suffix}', 'STRING', operation_digest(operation)))
+
+        return parameters
 
     def unapply_operation(self, operation: Operation):
-        results = self.client.query_and_wait(
-            (
+        if self.pending_operations:
+            self.flush()
+
+        self.pending_unapplied.append(operation)
+
+        if self.batch_size is not None and len(self.pending_unapplied) >= self.batch_size:
+            self.delete_unapplied()
+
+    def delete_unapplied(self):
+        """ Delete the buffered unapplied operations, verifying they are the most recent rows in the expected order
+
+        A single operation is deleted with a single statement. Several are deleted with a single statement in a
+        transaction that is rolled back unless every row matched, so a mismatch leaves the metadata unchanged. Rows that
+        do not match are compared as models by `delete_compared_rows`.
+        """
+
+        if not self.pending_unapplied:
+            return
+
+        count = len(self.pending_unapplied)
+        stream_where = '' if self.stream is None else ' WHERE stream = @stream'
+
+        if count == 1:
+            operation = self.pending_unapplied[0]
+
+            results = self.client.query_and_wait(
+                (
+                    f'DELETE FROM `{self.table_name}`\n'
+                    f'WHERE {self.stream_condition}idx = (SELECT MAX(idx) FROM `{self.table_name}`{stream_where})\n'
+                    f'    AND op_kind = @op_kind\n'
+                    f'    AND {self.op_data_condition("")}\n'
+                ),
+                job_config=bq.QueryJobConfig(
+                    query_parameters=[
+                        *self.stream_parameters,
+                        bq.ScalarQueryParameter('op_kind', 'STRING', operation.KIND),
+                        *self.op_data_parameters(operation, ''),
+                    ]
+                )
+            )
+
+            if results.num_dml_affected_rows != 1:
+                self.delete_compared_rows(self.pending_unapplied)
+        else:
+            conditions = []
+            query_parameters = [*self.stream_parameters, bq.ScalarQueryParameter('count', 'INT64', count)]
+
+            for i, operation in enumerate(self.pending_unapplied):
+                conditions.append(f'(idx = last_idx - {i} AND op_kind = @op_kind_{i} AND {self.op_data_condition(f"_{i}")})')
+
+                query_parameters.extend([
+                    bq.ScalarQueryParameter(f'op_kind_{i}', 'STRING', operation.KIND),
+                    *self.op_data_parameters(operation, f'_{i}'),
+                ])
+
+            conditions_sql = '\n    OR '.join(conditions)
+
+            rows = self.client.query_and_wait(
+                f'DECLARE last_idx INT64;\n'
+                f'DECLARE deleted INT64;\n'
+                f'\n'
+                f'BEGIN TRANSACTION;\n'
+                f'\n'
+                f'SET last_idx = (SELECT MAX(idx) FROM `{self.table_name}`{stream_where});\n'
+                f'\n'
                 f'DELETE FROM `{self.table_name}`\n'
-                f'WHERE idx = (SELECT MAX(idx) FROM `{self.table_name}`)\n'
-                f'    AND op_kind = @op_kind\n'
-                # ensure normalized comparison, cannot compare JSON types
-                f'    AND TO_JSON_STRING(op_data) = TO_JSON_STRING(@op_data)\n'
+                f'WHERE {self.stream_condition}(\n'
+                f'    {conditions_sql}\n'
+                f');\n'
+                f'\n'
+                f'SET deleted = @@row_count;\n'
+                f'\n'
+                f'IF deleted = @count THEN\n'
+                f'    COMMIT TRANSACTION;\n'
+                f'ELSE\n'
+                f'    ROLLBACK TRANSACTION;\n'
+                f'END IF;\n'
+                f'\n'
+                f'SELECT deleted;\n',
+                job_config=bq.QueryJobConfig(query_parameters=query_parameters),
+            )
+
+            if next(iter(rows)).deleted != count:
+                self.delete_compared_rows(self.pending_unapplied)
+
+        self.pending_unapplied = []
+
+        # the chain digest of the remaining history is read again on the next flush
+        self.next_idx = None
+
+        if self.mirror_rows is not None:
+            del self.mirror_rows[-count:]
+            self.mirror.save(self.table_name, self.mirror_rows, self.stream)
+
+    def delete_compared_rows(self, operations: list[Operation]):
+        """ Delete the most recent rows by idx after comparing them with the operations, most recent first, as models
+
+        The stored data and digest of a row written before a model field gained a default differ from those of the
+        operation, so the rows the delete statements could not match are parsed and compared instead.
+        """
+
+        stream_where = '' if self.stream is None else ' WHERE stream = @stream'
+        count_parameter = bq.ScalarQueryParameter('count', 'INT64', len(operations))
+
+        rows = list(self.client.query_and_wait(
+            f'SELECT idx, op_kind, {", ".join(self.op_data_columns)} FROM `{self.table_name}`{stream_where} '
+            f'ORDER BY idx DESC LIMIT @count',
+            job_config=bq.QueryJobConfig(query_parameters=[*self.stream_parameters, count_parameter]),
+        ))
+
+        if parse_operation_rows([(row.op_kind, self.row_op_data(row)) for row in rows]) != operations:
+            raise ValueError('Expected the operations to be the most recent ones')
+
+        # rows applied since they were read fail the assert, so only the compared rows are deleted
+        self.client.query_and_wait(
+            f'BEGIN TRANSACTION;\n'
+            f'\n'
+            f'ASSERT (SELECT MAX(idx) FROM `{self.table_name}`{stream_where}) = @last_idx '
+            f'AS \'Expected the operations to be the most recent ones\';\n'
+            f'\n'
+            f'DELETE FROM `{self.table_name}` WHERE {self.stream_condition}idx >= @first_idx;\n'
+            f'\n'
+            f'COMMIT TRANSACTION;\n',
+            job_config=bq.QueryJobConfig(
+                query_parameters=[
+                    *self.stream_parameters,
+                    bq.ScalarQueryParameter('last_idx', 'INT64', rows[0].idx),
+                    bq.ScalarQueryParameter('first_idx', 'INT64', rows[-1].idx),
+                ]
             ),
+        )
+
+    def compact(self, baseline: Baseline):
+        """ Replace the rows compacted by the baseline with a single baseline row in one transaction
+
+        The chain digests of the remaining rows are unchanged, so only their indexes are updated.
+        """
+
+        self.flush()
+        zip_reset = ', op_data_zip = NULL' if self.has_zip_column() else ''
+
+        # the last compacted row is found by digest, its position depends on whether an earlier baseline compacted
+        # the table
+        self.client.query_and_wait(
+            f'DECLARE last_idx INT64;\n'
+            f'\n'
+            f'BEGIN TRANSACTION;\n'
+            f'\n'
+            f'SET last_idx = (\n'
+            f'    SELECT MIN(idx) FROM `{self.table_name}` WHERE {self.stream_condition}chain_digest = @digest\n'
+            f');\n'
+            f'\n'
+            f'ASSERT last_idx IS NOT NULL AS \'The baseline does not compact a prefix of the applied history\';\n'
+            f'\n'
+            f'DELETE FROM `{self.table_name}` WHERE {self.stream_condition}idx < last_idx;\n'
+            f'\n'
+            f'UPDATE `{self.table_name}`\n'
+            f'SET op_kind = @op_kind, op_data = @op_data, inverse_op = NULL, op_digest = @op_digest{zip_reset}\n'
+            f'WHERE {self.stream_condition}idx = last_idx;\n'
+            f'\n'
+            f'UPDATE `{self.table_name}` SET idx = idx - last_idx WHERE {self.stream_condition}TRUE;\n'
+            f'\n'
+            f'COMMIT TRANSACTION;\n',
             job_config=bq.QueryJobConfig(
                 query_parameters=[
-                    bq.ScalarQueryParameter('op_kind', 'STRING', operation.KIND),
-                    bq.ScalarQueryParameter('op_data', 'JSON', operation.model_dump_json(exclude_none=True)),
+                    bq.ScalarQueryParameter('digest', 'STRING', baseline.digest),
+                    bq.ScalarQueryParameter('op_kind', 'STRING', baseline.KIND),
+                    bq.ScalarQueryParameter('op_data', 'JSON', baseline.model_dump_json(exclude_none=True)),
+                    bq.ScalarQueryParameter('op_digest', 'STRING', operation_digest(baseline)),
+                    *self.stream_parameters,
                 ]
-            )
+            ),
+        )
+
+        self.next_idx = None
+
+        # every row moved, so the mirror is fetched again on the next read
+        if self.mirror_rows is not None:
+            self.mirror_rows = None
+            self.mirror.save(self.table_name, [], self.stream)
+
+    def get_stream_tails(self) -> dict[str, tuple[int, str | None]]:
+        """ Returns the operation count and chain digest of every stream in the table with a single query
+
+        Comparing them with the chain digests of the target histories tells which streams have pending migrations
+        without reading each history.
+        """
+
+        if not self.client.has_table(to_table_ref(self.table_name)):
+            return {}
+
+        rows = self.client.query_and_wait(
+            f'SELECT stream, ARRAY_AGG(STRUCT(idx, chain_digest) ORDER BY idx DESC LIMIT 1)[OFFSET(0)] AS tail\n'
+            f'FROM `{self.table_name}`\n'
+            f'WHERE stream IS NOT NULL\n'
+            f'GROUP BY stream\n'
         )
 
-        assert results.num_dml_affected_rows == 1, f'Expected exactly 1 row deleted: {results.num_dml_affected_rows}'
+        return {row.stream: (row.tail['idx'] + 1, row.tail['chain_digest']) for row in rows}
@@ -0,0 +1,88 @@
+from typing import Any
+
+from liti.core.backend.base import MetaBackend
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
+
+
+class CachedMetaBackend(MetaBackend):
+    """ Loads the applied history of another meta backend once and keeps it current through the writes
+
+    Assumes nothing else writes to the metadata while the cache is in use, which `MigrateRunner` ensures by caching
+    for a single run. Reads return copies so callers cannot corrupt the cache.
+    """
+
+    def __init__(self, meta_backend: MetaBackend):
+        self.meta_backend = meta_backend
+        self.applied_operations: list[Operation] | None = None
+        self.inverse_operations: list[Operation | None] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def initialize(self):
+        self.meta_backend.initialize()
+
+    def get_applied_operations(self) -> list[Operation]:
+        if self.applied_operations is None:
+            self.misses += 1
+            self.applied_operations = list(self.meta_backend.get_applied_operations())
+        else:
+            self.hits += 1
+
+        return list(self.applied_operations)
+
+    def get_inverse_operations(self) -> list[Operation | None]:
+        if self.inverse_operations is None:
+            self.misses += 1
+            self.inverse_operations = list(self.meta_backend.get_inverse_operations())
+        else:
+            self.hits += 1
+
+        return list(self.inverse_operations)
+
+    def get_applied_digests(self) -> list[str] | None:
+        return self.meta_backend.get_applied_digests()
+
+    def get_applied_op_data(self) -> list[tuple[str, dict[str, Any]]] | None:
+        # comparing the cached operations is cheaper than reading the stored data
+        if self.applied_operations is None:
+            return self.meta_backend.get_applied_op_data()
+        else:
+            return None
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        # fetching only the tail is cheaper than loading the whole history into the cache
+        if self.applied_operations is None:
+            return self.meta_backend.get_applied_tail(start)
+        else:
+            return self.applied_operations[start:]
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        self.meta_backend.apply_operation(operation, inverse)
+
+        if self.applied_operations is not None:
+            self.applied_operations.append(operation)
+
+        if self.inverse_operations is not None:
+            self.inverse_operations.append(inverse)
+
+    def unapply_operation(self, operation: Operation):
+        self.meta_backend.unapply_operation(operation)
+
+        if self.applied_operations is not None:
+            self.applied_operations.pop()
+
+        if self.inverse_operations is not None:
+            self.inverse_operations.pop()
+
+    def flush(self):
+        self.meta_backend.flush()
+
+    def compact(self, baseline: Baseline):
+        self.meta_backend.compact(baseline)
+        self.invalidate()
+
+    def invalidate(self):
+        """ Forget the cached history so the next read loads it again """
+        self.applied_operations = None
+        self.inverse_operations = None
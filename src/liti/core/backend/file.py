@@ -0,0 +1,173 @@
+import json
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any
+
+from liti.core.backend.base import MetaBackend
+from liti.core.digest import chain_digest, EMPTY_DIGEST
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.parse import parse_op_data, parse_operation, parse_operation_rows
+
+log = logging.getLogger(__name__)
+
+# each index record holds the end offset of a log line and the chain digest of the history up to it
+INDEX_RECORD = struct.Struct('<Q32s')
+
+
+class FileMetaBackend(MetaBackend):
+    """ Stores the applied operations in an append-only JSON lines log with a sidecar offset index
+
+    The index has a fixed size record per applied operation, so the row count, the chain digests, and the location of
+    any row are known without reading the log. Appends write and sync the log before the index, and removals truncate
+    the index before the log, so an interrupted write only ever leaves unindexed bytes at the end of the log, which are
+    discarded the next time the files are opened.
+    """
+
+    def __init__(self, path: Path):
+        """
+        :param path: path of the log, the index is stored next to it with an added `.idx` suffix
+        """
+
+        self.path = path
+        self.index_path = path.with_name(f'{path.name}.idx')
+        self.recovered = False
+
+    def initialize(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+        self.recover()
+
+    def recover(self):
+        """ Discards partially written records left behind by an interrupted write """
+
+        if self.recovered or not self.path.is_file():
+            return
+
+        self.index_path.touch(exist_ok=True)
+        index_size = self.index_path.stat().st_size
+        complete_size = index_size - index_size % INDEX_RECORD.size
+
+        if complete_size < index_size:
+            log.warning(f'Discarding a partial index record of {self.index_path}')
+            truncate(self.index_path, complete_size)
+
+        log_end = self.read_records(self.row_count() - 1)[0][0] if self.row_count() > 0 else 0
+        log_size = self.path.stat().st_size
+
+        if log_size < log_end:
+            raise ValueError(f'Metadata log {self.path} is shorter than its index')
+        elif log_size > log_end:
+            log.warning(f'Discarding {log_size - log_end} unindexed bytes at the end of {self.path}')
+            truncate(self.path, log_end)
+
+        self.recovered = True
+
+    def row_count(self) -> int:
+        if self.index_path.is_file():
+            return self.index_path.stat().st_size // INDEX_RECORD.size
+        else:
+            return 0
+
+    def read_records(self, start: int, end: int | None = None) -> list[tuple[int, str]]:
+        """ Returns the (end offset, chain digest) index records from position `start` up to `end` """
+
+        end = self.row_count() if end is None else end
+
+        if start >= end:
+            return []
+
+        with open(self.index_path, 'rb') as f:
+            f.seek(start * INDEX_RECORD.size)
+            data = f.read((end - start) * INDEX_RECORD.size)
+
+        return [(offset, digest.hex()) for offset, digest in INDEX_RECORD.iter_unpack(data)]
+
+    def row_offset(self, position: int) -> int:
+        """ Returns the offset of the log line of the row at `position` """
+
+        if position == 0:
+            return 0
+        else:
+            return self.read_records(position - 1, position)[0][0]
+
+    def read_rows(self, start: int = 0) -> list[dict[str, Any]]:
+        """ Returns the rows from position `start` onward, reading only that part of the log """
+
+        self.recover()
+        row_count = self.row_count()
+
+        if start >= row_count:
+            return []
+
+        begin = self.row_offset(start)
+        end = self.read_records(row_count - 1)[0][0]
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return [json.loads(line) for line in data[begin:end].splitlines()]
+
+    def get_applied_operations(self) -> list[Operation]:
+        return self.get_applied_tail(0)
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        return parse_operation_rows([(row['op_kind'], row['op_data']) for row in self.read_rows(start)])
+
+    def get_inverse_operations(self) -> list[Operation | None]:
+        return [row['inverse_op'] and parse_op_data(row['inverse_op']) for row in self.read_rows()]
+
+    def get_applied_digests(self) -> list[str] | None:
+        self.recover()
+        return [digest for _, digest in self.read_records(0)]
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        if not self.recovered:
+            self.initialize()
+
+        row_count = self.row_count()
+
+        if row_count > 0:
+            offset, previous_digest = self.read_records(row_count - 1)[0]
+        else:
+            offset, previous_digest = 0, EMPTY_DIGEST
+
+        digest = chain_digest(previous_digest, operation)
+
+        row = {
+            'op_kind': operation.KIND,
+            'op_data': operation.model_dump(mode='json', exclude_none=True),
+            'inverse_op': inverse and inverse.to_op_data(format='json'),
+            'chain_digest': digest,
+        }
+
+        line = f'{json.dumps(row, separators=(",", ":"))}\n'.encode()
+        append(self.path, line)
+        append(self.index_path, INDEX_RECORD.pack(offset + len(line), bytes.fromhex(digest)))
+
+    def unapply_operation(self, operation: Operation):
+        row_count = self.row_count()
+        assert row_count > 0, 'Expected an applied operation to remove'
+
+        rows = self.read_rows(row_count - 1)
+        most_recent = parse_operation(rows[0]['op_kind'], rows[0]['op_data'])
+        assert operation == most_recent, 'Expected the operation to be the most recent one'
+
+        offset = self.row_offset(row_count - 1)
+        truncate(self.index_path, (row_count - 1) * INDEX_RECORD.size)
+        truncate(self.path, offset)
+
+
+def append(path: Path, data: bytes):
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def truncate(path: Path, size: int):
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
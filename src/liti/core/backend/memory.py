@@ -1,21 +1,200 @@
 from datetime import datetime, timedelta
+from typing import Any
 
 from liti.core.backend.base import CreateRelation, DbBackend, MetaBackend
 from liti.core.model.v1.datatype import Datatype
 from liti.core.model.v1.operation.data.base import Operation
 from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable
 from liti.core.model.v1.operation.data.view import CreateMaterializedView, CreateView
-from liti.core.model.v1.schema import Column, ColumnName, ConstraintName, DatabaseName, ForeignKey, Identifier, \
-    IntervalLiteral, MaterializedView, PrimaryKey, QualifiedName, RoundingMode, Schema, SchemaName, StorageBilling, \
-    Table, View
+from liti.core.model.v1.schema import Column, ColumnName, ConstraintName, DatabaseName, FieldPath, ForeignKey, \
+    Identifier, IntervalLiteral, MaterializedView, PrimaryKey, QualifiedName, RoundingMode, Schema, SchemaName, \
+    StorageBilling, Table, View
+
+CATALOGS = ('schemas', 'tables', 'views', 'materialized_views')
 
 
 class MemoryDbBackend(DbBackend):
-    def __init__(self):
+    """ In-memory database with copy-on-write catalogs
+
+    Forks share their catalogs and entities, so mutations copy only the catalog and entity they change. Entities
+    returned by the getters may be shared and must not be mutated.
+
+    When created with `undo=True`, the database records the entities each operation replaces, so it can return its
+    state after any earlier operation by stepping backward instead of replaying from the start. Operations are
+    delimited by `begin_operation`, which `replay` calls before applying each operation.
+    """
+
+    def __init__(self, undo: bool = False):
         self.schemas: dict[QualifiedName, Schema] = {}
         self.tables: dict[QualifiedName, Table] = {}
         self.views: dict[QualifiedName, View] = {}
         self.materialized_views: dict[QualifiedName, MaterializedView] = {}
+        self.shared_catalogs: set[str] = set()
+        # holding the owned objects keeps their ids from being reused while they are tracked
+        self.owned: dict[int, Any] = {}
+        # one list of (catalog, name, previous entity or None) entries per recorded operation
+        self.undo_log: list[list[tuple[str, QualifiedName, Any]]] | None = [] if undo else None
+
+    def fork(self) -> 'MemoryDbBackend':
+        """ Returns an independent copy of the database in constant time
+
+        The fork does not record an undo log.
+        """
+
+        fork = MemoryDbBackend()
+
+        for catalog in CATALOGS:
+            setattr(fork, catalog, getattr(self, catalog))
+
+        # everything is shared now, so neither database can mutate anything in place
+        fork.shared_catalogs = set(CATALOGS)
+        self.shared_catalogs = set(CATALOGS)
+        self.owned = {}
+        return fork
+
+    def own(self, obj: Any) -> Any:
+        self.owned[id(obj)] = obj
+        return obj
+
+    def writable_catalog(self, catalog: str) -> dict[QualifiedName, Any]:
+        if catalog in self.shared_catalogs:
+            setattr(self, catalog, dict(getattr(self, catalog)))
+            self.shared_catalogs.remove(catalog)
+
+        return getattr(self, catalog)
+
+    def writable(self, catalog: str, name: QualifiedName) -> Any:
+        """ Returns the named entity for in place mutation, copying it first if it may be shared """
+
+        entity = getattr(self, catalog)[name]
+
+        if id(entity) not in self.owned:
+            entity = self.own(entity.model_copy())
+            self.replace(catalog, name, entity)
+
+        return entity
+
+    def replace(self, catalog: str, name: QualifiedName, entity: Any | None):
+        """ Sets the named entity, or deletes it if None, recording the previous entity in the undo log """
+
+        entities = self.writable_catalog(catalog)
+
+        # mutations before the first recorded operation are the baseline and cannot be undone
+        if self.undo_log:
+            self.undo_log[-1].append((catalog, name, entities.get(name)))
+
+        if entity is None:
+            del entities[name]
+        else:
+            entities[name] = entity
+
+    def begin_operation(self):
+        """ Starts recording the undo entries of a new operation if the undo log is recorded """
+
+        if self.undo_log is not None:
+            self.undo_log.append([])
+            # the undo entries reference the current entities, so they cannot be mutated in place anymore
+            self.owned = {}
+
+    @property
+    def operation_count(self) -> int:
+        """ The number of operations recorded in the undo log """
+
+        if self.undo_log is None:
+            raise ValueError('The undo log is not recorded')
+
+        return len(self.undo_log)
+
+    def undo(self, count: int = 1):
+        """ Reverts the most recently recorded operations in place """
+
+        if not 0 <= count <= self.operation_count:
+            raise ValueError(f'Cannot undo {count} of {self.operation_count} recorded operations')
+
+        for _ in range(count):
+            for catalog, name, entity in reversed(self.undo_log.pop()):
+                entities = self.writable_catalog(catalog)
+
+                if entity is None:
+                    del entities[name]
+                else:
+                    entities[name] = entity
+
+        self.owned = {}
+
+    def state_at(self, index: int) -> 'MemoryDbBackend':
+        """ Returns a fork of the database as it was after the first `index` recorded operations
+
+        Steps backward from the current state, so the work is proportional to the number of operations undone.
+        """
+
+        if not 0 <= index <= self.operation_count:
+            raise ValueError(f'Index {index} is out of range for {self.operation_count} recorded operations')
+
+        state = self.fork()
+        state.undo_log = self.undo_log[index:]
+        state.undo(len(state.undo_log))
+        state.undo_log = None
+        return state
+
+    def writable_entity(self, name: QualifiedName) -> Schema | Table | View | MaterializedView:
+        for catalog in CATALOGS:
+            if name in getattr(self, catalog):
+                return self.writable(catalog, name)
+
+        raise ValueError(f'Entity {name} does not exist')
+
+    def writable_column(self, table_name: QualifiedName, column_name: ColumnName) -> Column:
+        table = self.writable('tables', table_name)
+        column = table.column_map[column_name]
+
+        if id(column) not in self.owned:
+            if id(table.columns) not in self.owned:
+                table.columns = self.own(list(table.columns))
+
+            index = next(i for i, c in enumerate(table.columns) if c is column)
+            column = table.columns[index] = self.own(column.model_copy())
+
+        return column
+
+    def writable_nested_column(self, table_name: QualifiedName, field_path: FieldPath):
+        # nested fields are mutated in place, so the datatype cannot be shared either
+        column = self.writable_column(table_name, ColumnName(field_path.segments[0]))
+        column.datatype = column.datatype.model_copy(deep=True)
+
+    def dump_catalog(self) -> dict[str, list[dict[str, Any]]]:
+        """ Serializes the catalog to JSON compatible data """
+
+        def dump(entities: dict[QualifiedName, Schema | Table | View | MaterializedView]) -> list[dict[str, Any]]:
+            # entities are stored with their keys since renames do not update the entity names
+            return [
+                {'name': name.model_dump(mode='json'), 'entity': entity.model_dump(mode='json')}
+                for name, entity in entities.items()
+            ]
+
+        return {
+            'schemas': dump(self.schemas),
+            'tables': dump(self.tables),
+            'views': dump(self.views),
+            'materialized_views': dump(self.materialized_views),
+        }
+
+    @classmethod
+    def load_catalog(cls, catalog: dict[str, list[dict[str, Any]]]) -> 'MemoryDbBackend':
+        """ Inverse of `dump_catalog` """
+
+        def load(entity_type: type[Schema | Table | View | MaterializedView], items: list[dict[str, Any]]) -> dict:
+            return {
+                QualifiedName.model_validate(item['name']): entity_type.model_validate(item['entity'])
+                for item in items
+            }
+
+        db_backend = cls()
+        db_backend.schemas = load(Schema, catalog['schemas'])
+        db_backend.tables = load(Table, catalog['tables'])
+        db_backend.views = load(View, catalog['views'])
+        db_backend.materialized_views = load(MaterializedView, catalog['materialized_views'])
+        return db_backend
 
     def scan_schema(self, database: DatabaseName, schema: SchemaName) -> list[Operation]:
         schema = self.get_schema(QualifiedName(database=database, schema_name=schema))
@@ -62,40 +241,40 @@ class MemoryDbBackend(DbBackend):
         if schema.name in self.schemas:
             raise ValueError(f'Schema {schema.name} already exists')
 
-        self.schemas[schema.name] = schema.model_copy(deep=True)
+        self.replace('schemas', schema.name, schema)
 
     def drop_schema(self, name: QualifiedName):
         if name not in self.schemas:
             raise ValueError(f'Schema {name} does not exist')
 
-        del self.schemas[name]
+        self.replace('schemas', name, None)
 
     def set_default_table_expiration(self, schema_name: QualifiedName, expiration: timedelta | None):
-        self.schemas[schema_name].default_table_expiration = expiration
+        self.writable('schemas', schema_name).default_table_expiration = expiration
 
     def set_default_partition_expiration(self, schema_name: QualifiedName, expiration: timedelta | None):
-        self.schemas[schema_name].default_partition_expiration = expiration
+        self.writable('schemas', schema_name).default_partition_expiration = expiration
 
     def set_default_kms_key_name(self, schema_name: QualifiedName, key_name: str | None):
-        self.schemas[schema_name].default_kms_key_name = key_name
+        self.writable('schemas', schema_name).default_kms_key_name = key_name
 
     def set_failover_reservation(self, schema_name: QualifiedName, reservation: str | None):
-        self.schemas[schema_name].failover_reservation = reservation
+        self.writable('schemas', schema_name).failover_reservation = reservation
 
     def set_case_sensitive(self, schema_name: QualifiedName, case_sensitive: bool):
-        self.schemas[schema_name].is_case_sensitive = case_sensitive
+        self.writable('schemas', schema_name).is_case_sensitive = case_sensitive
 
     def set_is_primary_replica(self, schema_name: QualifiedName, is_primary: bool):
-        self.schemas[schema_name].is_primary_replica = is_primary
+        self.writable('schemas', schema_name).is_primary_replica = is_primary
 
     def set_primary_replica(self, schema_name: QualifiedName, replica: str | None):
-        self.schemas[schema_name].primary_replica = replica
+        self.writable('schemas', schema_name).primary_replica = replica
 
     def set_max_time_travel(self, schema_name: QualifiedName, duration: timedelta | None):
-        self.schemas[schema_name].max_time_travel = duration
+        self.writable('schemas', schema_name).max_time_travel = duration
 
     def set_storage_billing(self, schema_name: QualifiedName, storage_billing: StorageBilling):
-        self.schemas[schema_name].storage_billing = storage_billing
+        self.writable('schemas', schema_name).storage_billing = storage_billing
 
     def get_table(self, name: QualifiedName) -> Table | None:
         return self.tables.get(name)
@@ -104,89 +283,92 @@ class MemoryDbBackend(DbBackend):
         if table.name in self.tables:
             raise ValueError(f'Table {table.name} already exists')
 
-        self.tables[table.name] = table.model_copy(deep=True)
+        self.replace('tables', table.name, table)
 
     def drop_table(self, name: QualifiedName):
         if name not in self.tables:
             raise ValueError(f'Table {name} does not exist')
 
-        del self.tables[name]
+        self.replace('tables', name, None)
 
     def rename_table(self, from_name: QualifiedName, to_name: Identifier):
-        self.tables[from_name.with_name(to_name)] = self.tables.pop(from_name)
+        self.replace('tables', from_name.with_name(to_name), self.tables[from_name])
+        self.replace('tables', from_name, None)
 
     def set_primary_key(self, table_name: QualifiedName, primary_key: PrimaryKey | None):
-        self.tables[table_name].primary_key = primary_key
+        self.writable('tables', table_name).primary_key = primary_key
 
     def add_foreign_key(self, table_name: QualifiedName, foreign_key: ForeignKey):
-        self.tables[table_name].add_foreign_key(foreign_key)
+        table = self.writable('tables', table_name)
+        table.foreign_keys = table.foreign_keys and list(table.foreign_keys)
+        table.add_foreign_key(foreign_key)
 
     def drop_constraint(self, table_name: QualifiedName, constraint_name: ConstraintName):
-        self.tables[table_name].drop_constraint(constraint_name)
+        self.writable('tables', table_name).drop_constraint(constraint_name)
 
     def set_partition_expiration(self, table_name: QualifiedName, expiration: timedelta | None):
-        self.tables[table_name].partitioning.expiration = expiration
+        table = self.writable('tables', table_name)
+        table.partitioning = table.partitioning.model_copy(update={'expiration': expiration})
 
     def set_require_partition_filter(self, table_name: QualifiedName, require_filter: bool):
-        self.tables[table_name].partitioning.require_filter = require_filter
+        table = self.writable('tables', table_name)
+        table.partitioning = table.partitioning.model_copy(update={'require_filter': require_filter})
 
     def set_clustering(self, table_name: QualifiedName, column_names: list[ColumnName] | None):
-        self.tables[table_name].clustering = column_names
+        self.writable('tables', table_name).clustering = column_names
 
     def set_friendly_name(self, entity_name: QualifiedName, friendly_name: str | None):
-        self.get_entity(entity_name).friendly_name = friendly_name
+        self.writable_entity(entity_name).friendly_name = friendly_name
 
     def set_description(self, entity_name: QualifiedName, description: str | None):
-        self.get_entity(entity_name).description = description
+        self.writable_entity(entity_name).description = description
 
     def set_labels(self, entity_name: QualifiedName, labels: dict[str, str] | None):
-        self.get_entity(entity_name).labels = labels
+        self.writable_entity(entity_name).labels = labels
 
     def set_tags(self, entity_name: QualifiedName, tags: dict[str, str] | None):
-        self.get_entity(entity_name).tags = tags
+        self.writable_entity(entity_name).tags = tags
 
     def set_expiration_timestamp(self, entity_name: QualifiedName, expiration_timestamp: datetime | None):
-        self.get_entity(entity_name).expiration_timestamp = expiration_timestamp
+        self.writable_entity(entity_name).expiration_timestamp = expiration_timestamp
 
     def set_default_rounding_mode(self, entity_name: QualifiedName, rounding_mode: RoundingMode | None):
-        self.get_entity(entity_name).default_rounding_mode = rounding_mode
+        self.writable_entity(entity_name).default_rounding_mode = rounding_mode
 
     def set_max_staleness(self, entity_name: QualifiedName, max_staleness: IntervalLiteral | None):
-        self.get_entity(entity_name).max_staleness = max_staleness
+        self.writable_entity(entity_name).max_staleness = max_staleness
 
     def set_enable_change_history(self, table_name: QualifiedName, enabled: bool):
-        self.tables[table_name].enable_change_history = enabled
+        self.writable('tables', table_name).enable_change_history = enabled
 
     def set_enable_fine_grained_mutations(self, table_name: QualifiedName, enabled: bool):
-        self.tables[table_name].enable_fine_grained_mutations = enabled
+        self.writable('tables', table_name).enable_fine_grained_mutations = enabled
 
     def set_kms_key_name(self, table_name: QualifiedName, key_name: str | None):
-        self.tables[table_name].kms_key_name = key_name
+        self.writable('tables', table_name).kms_key_name = key_name
 
     def add_column(self, table_name: QualifiedName, column: Column):
-        self.get_table(table_name).columns.append(column.model_copy(deep=True))
+        table = self.writable('tables', table_name)
+        table.columns = self.own((table.columns or []) + [column])
 
     def drop_column(self, table_name: QualifiedName, column_name: ColumnName):
-        table = self.get_table(table_name)
-        table.columns = [col for col in table.columns if col.name != column_name]
+        table = self.writable('tables', table_name)
+        table.columns = self.own([col for col in table.columns if col.name != column_name])
 
     def rename_column(self, table_name: QualifiedName, from_name: ColumnName, to_name: ColumnName):
-        table = self.get_table(table_name)
-        table.columns = [col if col.name != from_name else col.with_name(to_name) for col in table.columns]
+        table = self.writable('tables', table_name)
+        table.columns = self.own([col if col.name != from_name else col.with_name(to_name) for col in table.columns])
 
     def set_column_datatype(self, table_name: QualifiedName, column_name: ColumnName, from_datatype: Datatype, to_datatype: Datatype):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.datatype = to_datatype
 
     def set_column_nullable(self, table_name: QualifiedName, column_name: ColumnName, nullable: bool):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.nullable = nullable
 
     def set_column_description(self, table_name: QualifiedName, column_name: ColumnName, description: str | None):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.description = description
 
     def set_column_rounding_mode(
@@ -195,8 +377,7 @@ class MemoryDbBackend(DbBackend):
         column_name: ColumnName,
         rounding_mode: RoundingMode | None,
     ):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.rounding_mode = rounding_mode
 
     def set_column_data_policies(
@@ -205,8 +386,7 @@ class MemoryDbBackend(DbBackend):
         column_name: ColumnName,
         data_policies: list[str] | None,
     ):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.data_policies = data_policies
 
     def add_column_data_policies(
@@ -215,45 +395,62 @@ class MemoryDbBackend(DbBackend):
         column_name: ColumnName,
         data_policies: list[str],
     ):
-        table = self.get_table(table_name)
-        column = table.column_map[column_name]
+        column = self.writable_column(table_name, column_name)
         column.data_policies = (column.data_policies or []) + data_policies
 
+    def add_column_field(self, table_name: QualifiedName, field_path: FieldPath, datatype: Datatype) -> Table:
+        self.writable_nested_column(table_name, field_path)
+        return super().add_column_field(table_name, field_path, datatype)
+
+    def drop_column_field(self, table_name: QualifiedName, field_path: FieldPath) -> Table:
+        self.writable_nested_column(table_name, field_path)
+        return super().drop_column_field(table_name, field_path)
+
     def get_view(self, name: QualifiedName) -> View | None:
         return self.views.get(name)
 
     def create_view(self, view: View):
-        self.views[view.name] = view.model_copy(deep=True)
+        self.replace('views', view.name, view)
 
     def drop_view(self, name: QualifiedName):
         if name not in self.views:
             raise ValueError(f'View {name} does not exist')
 
-        del self.views[name]
+        self.replace('views', name, None)
 
     def get_materialized_view(self, name: QualifiedName) -> MaterializedView | None:
         return self.materialized_views.get(name)
 
     def create_materialized_view(self, materialized_view: MaterializedView):
-        self.materialized_views[materialized_view.name] = materialized_view.model_copy(deep=True)
+        self.replace('materialized_views', materialized_view.name, materialized_view)
 
     def drop_materialized_view(self, name: QualifiedName):
         if name not in self.materialized_views:
             raise ValueError(f'MaterializedView {name} does not exist')
 
-        del self.materialized_views[name]
+        self.replace('materialized_views', name, None)
 
 
 class MemoryMetaBackend(MetaBackend):
-    def __init__(self, applied_operations: list[Operation] | None = None):
+    def __init__(
+        self,
+        applied_operations: list[Operation] | None = None,
+        inverse_operations: list[Operation | None] | None = None,
+    ):
         self.applied_operations = applied_operations or []
+        self.inverse_operations = inverse_operations or [None] * len(self.applied_operations)
 
     def get_applied_operations(self) -> list[Operation]:
         return self.applied_operations
 
-    def apply_operation(self, operation: Operation):
+    def get_inverse_operations(self) -> list[Operation | None]:
+        return self.inverse_operations
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
         self.applied_operations.append(operation)
+        self.inverse_operations.append(inverse)
 
     def unapply_operation(self, operation: Operation):
         most_recent = self.applied_operations.pop()
+        self.inverse_operations.pop()
         assert operation == most_recent, 'Expected the operation to be the most recent one'
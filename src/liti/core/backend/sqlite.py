@@ -0,0 +1,177 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+from liti.core.backend.base import MetaBackend
+from liti.core.digest import chain_digest, EMPTY_DIGEST, operation_digest
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.parse import parse_op_data, parse_operation_rows
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TABLE_NAME = 'liti_metadata'
+
+
+class SqliteMetaBackend(MetaBackend):
+    """ Stores the applied operations in a SQLite table
+
+    The database uses write-ahead logging so readers do not block the writer. Every write runs in its own transaction
+    that also reads the last row, so concurrent runs cannot interleave their rows.
+    """
+
+    def __init__(self, path: Path, table_name: str = DEFAULT_TABLE_NAME, batch_size: int | None = 1):
+        """
+        :param path: path of the database file, created if it does not exist
+        :param table_name: name of the metadata table
+        :param batch_size: number of applied operations to write per transaction, None to write only on `flush`
+        """
+
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f'Batch size must be positive: {batch_size}')
+
+        self.path = path
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.pending_operations: list[tuple[Operation, Operation | None]] = []
+        self.connection: sqlite3.Connection | None = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            # transactions are managed explicitly
+            self.connection = sqlite3.connect(self.path, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode = WAL')
+
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def initialize(self):
+        connection = self.connect()
+
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.table_name}" (\n'
+            f'    idx INTEGER PRIMARY KEY,\n'
+            f'    op_kind TEXT NOT NULL,\n'
+            f'    op_data TEXT NOT NULL,\n'
+            f'    inverse_op TEXT,\n'
+            f'    op_digest TEXT NOT NULL,\n'
+            f'    chain_digest TEXT NOT NULL,\n'
+            f'    applied_at TEXT NOT NULL\n'
+            f')\n'
+        )
+
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS "{self.table_name}_chain_digest" ON "{self.table_name}" (chain_digest)'
+        )
+
+    def has_table(self) -> bool:
+        rows = self.connect().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (self.table_name,),
+        )
+
+        return rows.fetchone() is not None
+
+    def select(self, columns: str, start: int = 0) -> list[tuple]:
+        self.flush()
+
+        if self.has_table():
+            return self.connect().execute(
+                f'SELECT {columns} FROM "{self.table_name}" WHERE idx >= ? ORDER BY idx',
+                (start,),
+            ).fetchall()
+        else:
+            return []
+
+    def get_applied_operations(self) -> list[Operation]:
+        return self.get_applied_tail(0)
+
+    def get_applied_tail(self, start: int) -> list[Operation]:
+        rows = self.select('op_kind, op_data', start)
+        return parse_operation_rows(rows)
+
+    def get_inverse_operations(self) -> list[Operation | None]:
+        return [inverse_op and parse_op_data(json.loads(inverse_op)) for inverse_op, in self.select('inverse_op')]
+
+    def get_applied_digests(self) -> list[str] | None:
+        return [digest for digest, in self.select('chain_digest')]
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        self.pending_operations.append((operation, inverse))
+
+        if self.batch_size is not None and len(self.pending_operations) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_operations:
+            return
+
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            last_row = connection.execute(
+                f'SELECT idx, chain_digest FROM "{self.table_name}" ORDER BY idx DESC LIMIT 1'
+            ).fetchone()
+
+            next_idx, previous_digest = (last_row[0] + 1, last_row[1]) if last_row else (0, EMPTY_DIGEST)
+            applied_at = datetime.now(timezone.utc).isoformat()
+            rows = []
+
+            for idx, (operation, inverse) in enumerate(self.pending_operations, start=next_idx):
+                previous_digest = chain_digest(previous_digest, operation)
+
+                rows.append((
+                    idx,
+                    operation.KIND,
+                    operation.model_dump_json(exclude_none=True),
+                    inverse and json.dumps(inverse.to_op_data(format='json')),
+                    operation_digest(operation),
+                    previous_digest,
+                    applied_at,
+                ))
+
+            connection.executemany(
+                f'INSERT INTO "{self.table_name}" '
+                f'(idx, op_kind, op_data, inverse_op, op_digest, chain_digest, applied_at) '
+                f'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        self.pending_operations = []
+
+    def unapply_operation(self, operation: Operation):
+        self.flush()
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            last_row = connection.execute(
+                f'SELECT idx, op_kind, op_data, op_digest FROM "{self.table_name}" ORDER BY idx DESC LIMIT 1'
+            ).fetchone()
+
+            # digests also change when a model field gains a default, so a stored row with another digest is compared
+            # as a model
+            if last_row is None or (
+                last_row[3] != operation_digest(operation)
+                and parse_operation_rows([(last_row[1], last_row[2])]) != [operation]
+            ):
+                raise ValueError('Expected the operation to be the most recent one')
+
+            connection.execute(f'DELETE FROM "{self.table_name}" WHERE idx = ?', (last_row[0],))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
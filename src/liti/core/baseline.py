@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from liti.core.backend.memory import MemoryDbBackend
+from liti.core.digest import prefix_digests
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable
+from liti.core.model.v1.operation.data.view import CreateMaterializedView, CreateView
+from liti.core.model.v1.operation.ops.base import OperationOps
+
+if TYPE_CHECKING:
+    from liti.core.checkpoint import SimulationCheckpoints
+
+
+def build_baseline(operations: list[Operation], checkpoints: Optional['SimulationCheckpoints'] = None) -> Baseline:
+    """ Compacts the operations into a baseline
+
+    :param operations: the operations to compact, which may start with an earlier baseline
+    :param checkpoints: [None] resumes from and saves simulation checkpoints if provided
+    """
+
+    sim_db = OperationOps.simulate(operations, checkpoints)
+
+    # an earlier baseline counts the operations it compacted, so the count matches uncompacted histories
+    if operations and isinstance(operations[0], Baseline):
+        operation_count = operations[0].operation_count + len(operations) - 1
+    else:
+        operation_count = len(operations)
+
+    return Baseline(
+        operation_count=operation_count,
+        digest=prefix_digests(operations)[-1],
+        catalog=sim_db.dump_catalog(),
+    )
+
+
+def create_operations(baseline: Baseline) -> list[Operation]:
+    """ Returns the operations that create the entities of the baseline in a valid application order """
+
+    # circular imports
+    from liti.core.runner import sort_operations
+
+    db_backend = MemoryDbBackend.load_catalog(baseline.catalog)
+
+    # entities keep their names from before any rename, the catalog keys are their current names
+    return [
+        *sort_operations([
+            *(CreateSchema(schema_object=schema) for schema in db_backend.schemas.values()),
+            *(
+                CreateTable(table=table.model_copy(update={'name': name}))
+                for name, table in db_backend.tables.items()
+            ),
+        ]),
+        *(
+            CreateMaterializedView(materialized_view=view.model_copy(update={'name': name}))
+            for name, view in db_backend.materialized_views.items()
+        ),
+        *(CreateView(view=view.model_copy(update={'name': name})) for name, view in db_backend.views.items()),
+    ]
+
+
+def write_baseline_file(path: Path, baseline: Baseline):
+    """ Inverse of `parse_baseline_file` """
+
+    with open(path, 'w') as f:
+        json.dump({'version': 1, 'baseline': baseline.model_dump(mode='json')}, f, indent=4)
+        f.write('\n')
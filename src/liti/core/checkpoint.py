@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+from liti.core.backend.memory import MemoryDbBackend
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 100
+
+
+class SimulationCheckpoints:
+    """ On-disk cache of simulated databases
+
+    A checkpoint is written every `interval` operations and is keyed by the chained digest of the operations that
+    produced it, so a simulation of the same history can resume from the longest cached prefix.
+    """
+
+    def __init__(self, directory: Path, interval: int | None = None):
+        """
+        :param directory: directory to store the checkpoints in, created if it does not exist
+        :param interval: [100] number of operations between checkpoints
+        """
+
+        self.directory = directory
+        self.interval = interval if interval is not None else DEFAULT_INTERVAL
+
+        if self.interval < 1:
+            raise ValueError(f'Checkpoint interval must be positive: {self.interval}')
+
+    def path(self, digest: str) -> Path:
+        return self.directory / f'{digest}.json'
+
+    def counts(self, start: int, end: int) -> range:
+        """ Returns the operation counts in (start, end] that are checkpointed """
+        return range(start - start % self.interval + self.interval, end + 1, self.interval)
+
+    def load(self, digest: str) -> MemoryDbBackend | None:
+        path = self.path(digest)
+
+        if not path.is_file():
+            return None
+
+        try:
+            with open(path) as f:
+                return MemoryDbBackend.load_catalog(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # a checkpoint is only a cache, so an unreadable one is simulated again
+            log.warning(f'Ignoring unreadable simulation checkpoint {path}: {e}')
+            return None
+
+    def save(self, digest: str, db_backend: MemoryDbBackend):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(digest)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+
+        with open(tmp_path, 'w') as f:
+            json.dump(db_backend.dump_catalog(), f)
+
+        # replace atomically so concurrent runs never read a partial checkpoint
+        os.replace(tmp_path, path)
+
+    def restore(self, digests: list[str]) -> tuple[int, MemoryDbBackend]:
+        """ Returns the longest checkpointed prefix length and its simulated database
+
+        :param digests: the chained digest of every prefix of the operations, starting with the empty prefix
+        """
+
+        for count in reversed(self.counts(0, len(digests) - 1)):
+            db_backend = self.load(digests[count])
+
+            if db_backend is not None:
+                log.info(f'Restored simulation checkpoint after {count} operations')
+                return count, db_backend
+
+        return 0, MemoryDbBackend()
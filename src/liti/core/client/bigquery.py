@@ -1,9 +1,8 @@
 import logging
-from typing import Iterable
-
 from google.api_core.exceptions import NotFound
 
 from liti import bigquery as bq
+from liti.core.client.bigquery_catalog import catalog_queries, TABLE_TYPES, to_table_resources
 
 log = logging.getLogger(__name__)
 
@@ -12,11 +11,15 @@ class BqClient:
     """ Big Query client that lives in terms of google.cloud.bigquery
 
     Can be used as a context manager to run queries within a transaction.
+
+    The relation types of listed datasets are cached for the life of the client so existence checks do not call the
+    API. Relations created, dropped, or renamed with DDL must be reported with `set_table_type` to keep it current.
     """
 
     def __init__(self, client: bq.Client):
         self.client = client
         self.session_id: str | None = None
+        self.table_types: dict[tuple[str, str], dict[str, str]] = {}
 
     def __enter__(self):
         if self.session_id is not None:
@@ -31,6 +34,8 @@ class BqClient:
             job = self.query('COMMIT TRANSACTION', job_config=bq.QueryJobConfig(session_id=self.session_id))
         else:
             job = self.query('ROLLBACK TRANSACTION', job_config=bq.QueryJobConfig(session_id=self.session_id))
+            # the rolled back statements may have changed the cached listings
+            self.clear_table_types()
 
         job.result()
 
@@ -59,37 +64,110 @@ class BqClient:
 
     def delete_dataset(self, dataset_ref: bq.DatasetReference):
         self.client.delete_dataset(dataset_ref)
+        self.table_types.pop(self.dataset_key(dataset_ref), None)
+
+    def dataset_key(self, ref: bq.DatasetReference | bq.TableReference) -> tuple[str, str]:
+        return ref.project, ref.dataset_id
+
+    def set_table_type(self, table_ref: bq.TableReference, table_type: str | None):
+        """ Keeps the listing of a cached dataset current after a relation is created or dropped (None) """
+
+        table_types = self.table_types.get(self.dataset_key(table_ref))
+
+        if table_types is not None:
+            if table_type is None:
+                table_types.pop(table_ref.table_id, None)
+            else:
+                table_types[table_ref.table_id] = table_type
+
+    def clear_table_types(self):
+        """ Forgets every cached listing, for changes to relations that cannot be tracked one by one """
+        self.table_types.clear()
+
+    def find_table(self, table_ref: bq.TableReference) -> bq.Table | None:
+        """ Gets a table, view, or materialized view, None if it does not exist """
+
+        table_types = self.table_types.get(self.dataset_key(table_ref))
+
+        if table_types is not None and table_ref.table_id not in table_types:
+            return None
+
+        try:
+            return self.client.get_table(table_ref)
+        except NotFound:
+            self.set_table_type(table_ref, None)
+            return None
 
-    def get_table_item(self, table_ref: bq.TableReference) -> bq.TableListItem | None:
-        for table_item in self.client.list_tables(f'{table_ref.project}.{table_ref.dataset_id}'):
-            if table_item.table_id == table_ref.table_id:
-                return table_item
+    def get_table_type(self, table_ref: bq.TableReference) -> str | None:
+        table_types = self.table_types.get(self.dataset_key(table_ref))
 
-        return None
+        if table_types is not None:
+            return table_types.get(table_ref.table_id)
+
+        bq_table = self.find_table(table_ref)
+        return bq_table and bq_table.table_type
 
     def has_table(self, table_ref: bq.TableReference) -> bool:
-        item = self.get_table_item(table_ref)
-        return item is not None and item.table_type == 'TABLE'
+        return self.get_table_type(table_ref) == 'TABLE'
 
     def has_view(self, table_ref: bq.TableReference) -> bool:
-        item = self.get_table_item(table_ref)
-        return item is not None and item.table_type == 'VIEW'
+        return self.get_table_type(table_ref) == 'VIEW'
 
     def has_materialized_view(self, table_ref: bq.TableReference) -> bool:
-        item = self.get_table_item(table_ref)
-        return item is not None and item.table_type == 'MATERIALIZED_VIEW'
+        return self.get_table_type(table_ref) == 'MATERIALIZED_VIEW'
 
     def get_table(self, table_ref: bq.TableReference) -> bq.Table:
         return self.client.get_table(table_ref)
 
-    def list_tables(self, dataset_ref: bq.DatasetReference) -> Iterable[bq.TableListItem]:
-        return self.client.list_tables(dataset_ref)
+    def list_rows(
+        self,
+        table: bq.Table,
+        selected_fields: list[bq.SchemaField] | None = None,
+        page_size: int | None = None,
+    ) -> bq.RowIterator:
+        log.info(f'list_rows: {table.reference}')
+        return self.client.list_rows(table, selected_fields=selected_fields, page_size=page_size)
+
+    def list_tables(self, dataset_ref: bq.DatasetReference) -> list[bq.TableListItem]:
+        """ Lists the relations in a dataset and caches their types to answer existence checks for the run """
+
+        table_items = list(self.client.list_tables(dataset_ref))
+        self.cache_table_types(dataset_ref, {item.table_id: item.table_type for item in table_items})
+        return table_items
+
+    def cache_table_types(self, dataset_ref: bq.DatasetReference, table_types: dict[str, str]):
+        """ Caches the types of every relation in a dataset by table id """
+        self.table_types[self.dataset_key(dataset_ref)] = table_types
+
+    def load_tables(self, dataset_ref: bq.DatasetReference) -> list[bq.Table]:
+        """ Gets every table, view, and materialized view in a dataset with a few INFORMATION_SCHEMA queries
+
+        Relations the catalog cannot fully describe, like materialized views, are fetched one at a time. Returns an
+        empty list if the dataset does not exist.
+        """
+
+        try:
+            rows = {name: list(self.query_and_wait(sql)) for name, sql in catalog_queries(dataset_ref).items()}
+        except NotFound:
+            return []
+
+        self.cache_table_types(
+            dataset_ref,
+            {row.table_name: TABLE_TYPES.get(row.table_type, row.table_type) for row in rows['relations']},
+        )
+
+        return [
+            bq.Table.from_api_repr(resource) if resource else self.client.get_table(dataset_ref.table(table_id))
+            for table_id, resource in sorted(to_table_resources(dataset_ref, **rows).items())
+        ]
 
     def create_table(self, bq_table: bq.Table):
-        self.client.create_table(bq_table)
+        bq_table = self.client.create_table(bq_table)
+        self.set_table_type(bq_table.reference, bq_table.table_type)
 
     def delete_table(self, table_ref: bq.TableReference):
         self.client.delete_table(table_ref)
+        self.set_table_type(table_ref, None)
 
     def update_table(self, table: bq.Table, fields: list[str]) -> bq.Table:
         return self.client.update_table(table, fields)
@@ -0,0 +1,354 @@
+import re
+from datetime import datetime
+from typing import Any, Iterable
+
+from liti import bigquery as bq
+
+ONE_DAY_IN_MILLIS = 24 * 60 * 60 * 1000
+
+# INFORMATION_SCHEMA table types and the types of their table resources
+TABLE_TYPES = {
+    'BASE TABLE': 'TABLE',
+    'CLONE': 'TABLE',
+    'VIEW': 'VIEW',
+    'MATERIALIZED VIEW': 'MATERIALIZED_VIEW',
+}
+
+# options only set on BigLake tables, their connection is not in the catalog
+BIG_LAKE_OPTIONS = {'storage_uri', 'file_format', 'table_format'}
+
+DATATYPE_TOKEN = re.compile(r'`[^`]*`|\w+|[<>(),]')
+SQL_STRING = r'"((?:[^"\\]|\\.)*)"'
+SQL_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def catalog_queries(dataset_ref: bq.DatasetReference) -> dict[str, str]:
+    """ Returns the queries that read the catalog of a dataset by the name of their rows """
+
+    schema = f'`{dataset_ref.project}.{dataset_ref.dataset_id}.INFORMATION_SCHEMA'
+
+    return {
+        'relations': (
+            f'SELECT\n'
+            f'    t.table_name,\n'
+            f'    t.table_type,\n'
+            f'    REGEXP_EXTRACT(t.ddl, r\'\\nPARTITION BY ([^\\n;]*)\') AS partition_by,\n'
+            f'    v.view_definition\n'
+            f'FROM {schema}.TABLES` AS t\n'
+            f'LEFT JOIN {schema}.VIEWS` AS v USING (table_name)\n'
+        ),
+        'columns': (
+            f'SELECT\n'
+            f'    c.table_name,\n'
+            f'    c.column_name,\n'
+            f'    c.data_type,\n'
+            f'    c.is_nullable,\n'
+            f'    c.column_default,\n'
+            f'    c.rounding_mode,\n'
+            f'    c.clustering_ordinal_position,\n'
+            f'    f.description\n'
+            f'FROM {schema}.COLUMNS` AS c\n'
+            f'LEFT JOIN {schema}.COLUMN_FIELD_PATHS` AS f\n'
+            f'    ON f.table_name = c.table_name AND f.field_path = c.column_name\n'
+            f'WHERE c.is_system_defined = \'NO\'\n'
+            f'ORDER BY c.table_name, c.ordinal_position\n'
+        ),
+        'options': (
+            f'SELECT table_name, option_name, option_value\n'
+            f'FROM {schema}.TABLE_OPTIONS`\n'
+        ),
+        'constraints': (
+            f'SELECT k.table_name, c.constraint_type, k.column_name\n'
+            f'FROM {schema}.TABLE_CONSTRAINTS` AS c\n'
+            f'JOIN {schema}.KEY_COLUMN_USAGE` AS k USING (table_name, constraint_name)\n'
+            f'ORDER BY k.table_name, k.constraint_name, k.ordinal_position\n'
+        ),
+    }
+
+
+def expect_token(tokens: list[str], i: int, token: str) -> int:
+    if tokens[i] != token:
+        raise ValueError(f'Expected {token} in data type, got {tokens[i]}')
+
+    return i + 1
+
+
+def parse_field_type(tokens: list[str], i: int) -> tuple[dict[str, Any], int]:
+    """ Parses the data type starting at tokens[i] into a schema field resource without its name """
+
+    type_name = tokens[i].upper()
+    i += 1
+
+    if type_name == 'ARRAY':
+        field, i = parse_field_type(tokens, expect_token(tokens, i, '<'))
+        field['mode'] = 'REPEATED'
+        return field, expect_token(tokens, i, '>')
+    elif type_name == 'STRUCT':
+        i = expect_token(tokens, i, '<')
+        fields = []
+
+        while True:
+            name = tokens[i].strip('`')
+            field, i = parse_field_type(tokens, i + 1)
+
+            if [t.upper() for t in tokens[i:i + 2]] == ['NOT', 'NULL']:
+                field['mode'] = 'REQUIRED'
+                i += 2
+
+            fields.append({'name': name, **field})
+
+            if tokens[i] != ',':
+                break
+
+            i += 1
+
+        return {'type': 'RECORD', 'fields': fields}, expect_token(tokens, i, '>')
+    elif type_name == 'RANGE':
+        element_type = tokens[expect_token(tokens, i, '<')].upper()
+        return {'type': 'RANGE', 'rangeElementType': {'type': element_type}}, expect_token(tokens, i + 2, '>')
+
+    field = {'type': type_name}
+    params = []
+
+    if i < len(tokens) and tokens[i] == '(':
+        i += 1
+
+        while tokens[i] != ')':
+            params.append(tokens[i])
+            i += 1
+
+            if tokens[i] == ',':
+                i += 1
+
+        i += 1
+
+    if type_name in ('NUMERIC', 'BIGNUMERIC') and len(params) <= 2:
+        field.update(zip(('precision', 'scale'), params))
+    elif type_name in ('STRING', 'BYTES') and len(params) <= 1:
+        field.update(zip(('maxLength',), params))
+    elif params:
+        raise ValueError(f'Unexpected parameters for {type_name}: {params}')
+
+    return field, i
+
+
+def to_field_resource(column_name: str, data_type: str) -> dict[str, Any]:
+    """ Inverse of the data types INFORMATION_SCHEMA reports, e.g. ARRAY<STRUCT<a NUMERIC(10, 2) NOT NULL>> """
+
+    tokens = DATATYPE_TOKEN.findall(data_type)
+
+    if re.sub(r'\s', '', ''.join(tokens)) != re.sub(r'\s', '', data_type):
+        raise ValueError(f'Unrecognized data type: {data_type}')
+
+    try:
+        field, i = parse_field_type(tokens, 0)
+    except IndexError:
+        raise ValueError(f'Incomplete data type: {data_type}')
+
+    if i != len(tokens):
+        raise ValueError(f'Unrecognized data type: {data_type}')
+
+    return {'name': column_name, **field}
+
+
+def sql_string_value(escaped: str) -> str:
+    return re.sub(r'\\(.)', lambda m: SQL_ESCAPES.get(m[1], m[1]), escaped)
+
+
+def option_value(value: str) -> Any:
+    """ Parses the SQL literal of a TABLE_OPTIONS value """
+
+    value = value.strip()
+
+    if match := re.fullmatch(SQL_STRING, value):
+        return sql_string_value(match[1])
+    elif value.startswith('['):
+        return {
+            sql_string_value(k): sql_string_value(v)
+            for k, v in re.findall(rf'STRUCT\({SQL_STRING}, {SQL_STRING}\)', value)
+        }
+    elif match := re.fullmatch(rf'TIMESTAMP {SQL_STRING}', value):
+        timestamp = match[1].replace(' ', 'T').replace('Z', '+00:00')
+        return datetime.fromisoformat(re.sub(r'([+-]\d\d)$', r'\1:00', timestamp))
+    elif value.upper() in ('TRUE', 'FALSE'):
+        return value.upper() == 'TRUE'
+    else:
+        return float(value)
+
+
+def set_partitioning(resource: dict[str, Any], partition_by: str, expiration_days: float | None):
+    """ Sets the partitioning of a table resource from the PARTITION BY clause of its DDL """
+
+    partition_by = partition_by.strip()
+
+    if match := re.fullmatch(
+        r'RANGE_BUCKET\(`?(\w+)`?, GENERATE_ARRAY\((-?\d+), (-?\d+), (-?\d+)\)\)',
+        partition_by,
+        re.IGNORECASE,
+    ):
+        resource['rangePartitioning'] = {
+            'field': match[1],
+            'range': {'start': match[2], 'end': match[3], 'interval': match[4]},
+        }
+
+        return
+
+    if match := re.fullmatch(r'(?:DATE|DATETIME|TIMESTAMP)_TRUNC\(`?(\w+)`?, (\w+)\)', partition_by, re.IGNORECASE):
+        column, time_unit = match[1], match[2].upper()
+    elif match := re.fullmatch(r'DATE\(`?(\w+)`?\)', partition_by, re.IGNORECASE):
+        column, time_unit = match[1], 'DAY'
+    elif match := re.fullmatch(r'`?(\w+)`?', partition_by):
+        column, time_unit = match[1], 'DAY'
+    else:
+        raise ValueError(f'Unrecognized partitioning: {partition_by}')
+
+    time_partitioning = {'type': time_unit}
+
+    # ingestion time partitioned tables have no partitioning column
+    if column.upper() not in ('_PARTITIONTIME', '_PARTITIONDATE'):
+        time_partitioning['field'] = column
+
+    if expiration_days is not None:
+        time_partitioning['expirationMs'] = str(round(expiration_days * ONE_DAY_IN_MILLIS))
+
+    resource['timePartitioning'] = time_partitioning
+
+
+def to_table_resource(
+    dataset_ref: bq.DatasetReference,
+    relation: Any,
+    columns: list[Any],
+    options: dict[str, str],
+    constraints: list[Any],
+) -> dict[str, Any]:
+    """ Builds the resource the tables API returns for a relation from its catalog rows
+
+    Raises a ValueError for relations the catalog cannot fully describe so they can be fetched with the API instead.
+    """
+
+    table_type = TABLE_TYPES[relation.table_type]
+
+    if table_type == 'MATERIALIZED_VIEW':
+        raise ValueError('The catalog does not hold the definition of materialized views')
+
+    if BIG_LAKE_OPTIONS & options.keys():
+        raise ValueError('The catalog does not hold the connection of BigLake tables')
+
+    resource = {
+        'tableReference': {
+            'projectId': dataset_ref.project,
+            'datasetId': dataset_ref.dataset_id,
+            'tableId': relation.table_name,
+        },
+        'type': table_type,
+        'schema': {'fields': []},
+    }
+
+    for column in columns:
+        field = to_field_resource(column.column_name, column.data_type)
+
+        if field.get('mode') != 'REPEATED':
+            field['mode'] = 'NULLABLE' if column.is_nullable == 'YES' else 'REQUIRED'
+
+        if column.description is not None:
+            field['description'] = column.description
+
+        if column.column_default not in (None, 'NULL'):
+            field['defaultValueExpression'] = column.column_default
+
+        if column.rounding_mode is not None:
+            field['roundingMode'] = column.rounding_mode
+
+        resource['schema']['fields'].append(field)
+
+    clustering = sorted(
+        (c.clustering_ordinal_position, c.column_name)
+        for c in columns
+        if c.clustering_ordinal_position is not None
+    )
+
+    if clustering:
+        resource['clustering'] = {'fields': [name for _, name in clustering]}
+
+    if 'friendly_name' in options:
+        resource['friendlyName'] = option_value(options['friendly_name'])
+
+    if 'description' in options:
+        resource['description'] = option_value(options['description'])
+
+    if 'labels' in options:
+        resource['labels'] = option_value(options['labels'])
+
+    if 'tags' in options:
+        resource['resourceTags'] = option_value(options['tags'])
+
+    if 'expiration_timestamp' in options:
+        expires = option_value(options['expiration_timestamp'])
+        resource['expirationTime'] = str(round(expires.timestamp() * 1000))
+
+    if 'require_partition_filter' in options:
+        resource['requirePartitionFilter'] = option_value(options['require_partition_filter'])
+
+    if relation.partition_by:
+        expiration = options.get('partition_expiration_days')
+        set_partitioning(resource, relation.partition_by, expiration and option_value(expiration))
+
+    for constraint in constraints:
+        if constraint.constraint_type == 'PRIMARY KEY':
+            primary_key = resource.setdefault('tableConstraints', {}).setdefault('primaryKey', {'columns': []})
+            primary_key['columns'].append(constraint.column_name)
+        else:
+            raise ValueError(f'The catalog does not hold the references of {constraint.constraint_type} constraints')
+
+    if table_type == 'VIEW':
+        resource['view'] = {'query': relation.view_definition, 'useLegacySql': False}
+
+    return resource
+
+
+def group_rows(rows: Iterable[Any]) -> dict[str, list[Any]]:
+    grouped = {}
+
+    for row in rows:
+        grouped.setdefault(row.table_name, []).append(row)
+
+    return grouped
+
+
+def to_table_resources(
+    dataset_ref: bq.DatasetReference,
+    relations: Iterable[Any],
+    columns: Iterable[Any],
+    options: Iterable[Any],
+    constraints: Iterable[Any],
+) -> dict[str, dict[str, Any] | None]:
+    """ Builds the table resources of a dataset from the rows of its `catalog_queries`
+
+    Returns the resources by table id, None for the relations that must be fetched with the API. Relations without a
+    liti model, like external tables and snapshots, are left out.
+    """
+
+    columns = group_rows(columns)
+    options = {
+        table_name: {row.option_name: row.option_value for row in rows}
+        for table_name, rows in group_rows(options).items()
+    }
+    constraints = group_rows(constraints)
+    resources = {}
+
+    for relation in relations:
+        if relation.table_type not in TABLE_TYPES:
+            continue
+
+        try:
+            resources[relation.table_name] = to_table_resource(
+                dataset_ref,
+                relation,
+                columns.get(relation.table_name, []),
+                options.get(relation.table_name, {}),
+                constraints.get(relation.table_name, []),
+            )
+        except ValueError:
+            resources[relation.table_name] = None
+
+    return resources
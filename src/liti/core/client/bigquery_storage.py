@@ -0,0 +1,120 @@
+import logging
+from typing import Any
+
+from google.api_core.exceptions import AlreadyExists, DeadlineExceeded, ServiceUnavailable
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+from liti import bigquery as bq
+
+try:
+    from google.cloud import bigquery_storage_v1 as bqs
+except ImportError:  # the Storage Write API is an optional extra
+    bqs = None
+
+log = logging.getLogger(__name__)
+
+# google.rpc.Code of an append whose offset was already written
+ALREADY_EXISTS_CODE = 6
+APPEND_ATTEMPTS = 3
+
+# proto types of the appended columns, JSON columns are written as strings
+PROTO_TYPES = {
+    int: descriptor_pb2.FieldDescriptorProto.TYPE_INT64,
+    str: descriptor_pb2.FieldDescriptorProto.TYPE_STRING,
+    bytes: descriptor_pb2.FieldDescriptorProto.TYPE_BYTES,
+}
+
+
+def is_available() -> bool:
+    return bqs is not None
+
+
+def build_row_message(columns: dict[str, type]) -> tuple[descriptor_pb2.DescriptorProto, type]:
+    """ Builds the proto descriptor and message class of a row with the given columns """
+
+    file_proto = descriptor_pb2.FileDescriptorProto(name='liti_row.proto', package='liti', syntax='proto2')
+    message_proto = file_proto.message_type.add(name='Row')
+
+    for number, (name, python_type) in enumerate(columns.items(), start=1):
+        message_proto.field.add(
+            name=name,
+            number=number,
+            type=PROTO_TYPES[python_type],
+            label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+        )
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    return message_proto, message_factory.GetMessageClass(pool.FindMessageTypeByName('liti.Row'))
+
+
+class BqAppendStream:
+    """ Appends rows to a table through a committed Storage Write API stream
+
+    Rows are visible as soon as their append returns. Each append names the offset of its first row in the stream, so
+    an append that is retried after it was already written fails with ALREADY_EXISTS instead of writing duplicates.
+    """
+
+    def __init__(self, client: Any, stream_name: str, columns: dict[str, type]):
+        self.client = client
+        self.stream_name = stream_name
+        self.descriptor, self.message_class = build_row_message(columns)
+        self.offset = 0
+
+    def append(self, rows: list[dict[str, Any]]):
+        serialized_rows = [
+            self.message_class(**{k: v for k, v in row.items() if v is not None}).SerializeToString()
+            for row in rows
+        ]
+
+        request = bqs.types.AppendRowsRequest(
+            write_stream=self.stream_name,
+            offset=self.offset,
+            proto_rows=bqs.types.AppendRowsRequest.ProtoData(
+                writer_schema=bqs.types.ProtoSchema(proto_descriptor=self.descriptor),
+                rows=bqs.types.ProtoRows(serialized_rows=serialized_rows),
+            ),
+            # columns without a value get their default, like applied_at
+            default_missing_value_interpretation=bqs.types.AppendRowsRequest.MissingValueInterpretation.DEFAULT_VALUE,
+        )
+
+        for attempt in range(1, APPEND_ATTEMPTS + 1):
+            try:
+                response = next(iter(self.client.append_rows(iter([request]))))
+
+                if response.error.code not in (0, ALREADY_EXISTS_CODE):
+                    raise RuntimeError(f'Failed to append rows at offset {self.offset}: {response.error.message}')
+
+                break
+            except AlreadyExists:
+                break
+            except (DeadlineExceeded, ServiceUnavailable):
+                # the same offset makes the retry a no-op if the rows were written
+                if attempt == APPEND_ATTEMPTS:
+                    raise
+
+                log.warning(f'Retrying append at offset {self.offset}')
+
+        self.offset += len(rows)
+
+
+class BqWriteClient:
+    """ Big Query Storage Write API client that lives in terms of google.cloud.bigquery """
+
+    def __init__(self, client: Any = None):
+        """
+        :param client: [None] a BigQueryWriteClient, None to create one with the default credentials
+        """
+
+        if not is_available():
+            raise ImportError('google-cloud-bigquery-storage is required for the Storage Write API')
+
+        self.client = client or bqs.BigQueryWriteClient()
+
+    def open_stream(self, table_ref: bq.TableReference, columns: dict[str, type]) -> BqAppendStream:
+        write_stream = self.client.create_write_stream(
+            parent=self.client.table_path(table_ref.project, table_ref.dataset_id, table_ref.table_id),
+            write_stream=bqs.types.WriteStream(type_=bqs.types.WriteStream.Type.COMMITTED),
+        )
+
+        return BqAppendStream(self.client, write_stream.name, columns)
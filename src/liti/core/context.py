@@ -8,6 +8,7 @@ if TYPE_CHECKING:
     from liti.core.model.v1.operation.data.base import Operation
     from liti.core.model.v1.template import Template
     from liti.core.backend.base import DbBackend, MetaBackend
+    from liti.core.checkpoint import SimulationCheckpoints
 
 
 # I was unable to instantiate the Context in some cases when using the types normally, so
@@ -22,6 +23,8 @@ class Context(BaseModel):
     template_files: list[Path] | None = None
     templates_: Any | None
     target_operations_: Any = None
+    previous_db_backend_: Any = None
+    checkpoints_: Any = None
 
     def __init__(
         self,
@@ -34,6 +37,8 @@ class Context(BaseModel):
         template_files: list[Path] | None = None,
         templates: Any = None,
         target_operations: Any = None,
+        previous_db_backend: Any = None,
+        checkpoints: Any = None,
     ):
         """ Allows instantiation with expected field names without trailing underscores """
 
@@ -46,6 +51,8 @@ class Context(BaseModel):
             template_files=template_files,
             templates_=templates,
             target_operations_=target_operations,
+            previous_db_backend_=previous_db_backend,
+            checkpoints_=checkpoints,
         )
 
     @property
@@ -87,3 +94,19 @@ class Context(BaseModel):
     @target_operations.setter
     def target_operations(self, value: list['Operation'] | None):
         self.target_operations_ = value
+
+    @property
+    def previous_db_backend(self) -> Optional['DbBackend']:
+        return self.previous_db_backend_
+
+    @previous_db_backend.setter
+    def previous_db_backend(self, value: Optional['DbBackend']):
+        self.previous_db_backend_ = value
+
+    @property
+    def checkpoints(self) -> Optional['SimulationCheckpoints']:
+        return self.checkpoints_
+
+    @checkpoints.setter
+    def checkpoints(self, value: Optional['SimulationCheckpoints']):
+        self.checkpoints_ = value
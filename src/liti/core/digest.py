@@ -0,0 +1,72 @@
+import json
+from hashlib import sha256
+from typing import Any
+
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
+
+EMPTY_DIGEST = sha256(b'').hexdigest()
+
+
+def canonical_op_data(op_data: dict[str, Any]) -> str:
+    """ Serializes JSON operation data with sorted keys and no whitespace so equal data serializes equally """
+    return json.dumps(op_data, sort_keys=True, separators=(',', ':'))
+
+
+def canonical_json(operation: Operation) -> str:
+    return canonical_op_data(operation.model_dump(mode='json', exclude_none=True))
+
+
+def op_data_digest(op_kind: str, op_data: dict[str, Any]) -> str:
+    """ Same as `operation_digest` but from the stored kind and data without building the operation """
+    return sha256(f'{op_kind}\n{canonical_op_data(op_data)}'.encode()).hexdigest()
+
+
+def operation_digest(operation: Operation) -> str:
+    return sha256(f'{operation.KIND}\n{canonical_json(operation)}'.encode()).hexdigest()
+
+
+def chain_digest(previous: str, operation: Operation) -> str:
+    """ Digest of a history given the digest of the history before its last operation """
+
+    # a baseline stands in for the operations it compacts
+    if isinstance(operation, Baseline):
+        return operation.digest
+
+    return sha256(f'{previous}\n{operation_digest(operation)}'.encode()).hexdigest()
+
+
+def prefix_digests(operations: list[Operation]) -> list[str]:
+    """ Returns the chained digest of every prefix of the operations, starting with the empty prefix """
+    digests = [EMPTY_DIGEST]
+
+    for op in operations:
+        digests.append(chain_digest(digests[-1], op))
+
+    return digests
+
+
+def find_baseline(digests: list[str], baseline: Baseline) -> int | None:
+    """ Returns the position of the last operation compacted by the baseline given the chain digests of a history
+
+    The position depends on whether the history was compacted by an earlier baseline, so the baseline is found by its
+    digest. Returns None if the history does not contain the compacted operations.
+    """
+
+    try:
+        return digests.index(baseline.digest)
+    except ValueError:
+        return None
+
+
+def op_data_prefix_digests(rows: list[tuple[str, dict[str, Any]]]) -> list[str]:
+    """ Same as `prefix_digests` but from the stored `(op_kind, op_data)` of each operation """
+    digests = [EMPTY_DIGEST]
+
+    for op_kind, op_data in rows:
+        if op_kind == Baseline.KIND:
+            digests.append(op_data['digest'])
+        else:
+            digests.append(sha256(f'{digests[-1]}\n{op_data_digest(op_kind, op_data)}'.encode()).hexdigest())
+
+    return digests
@@ -1,5 +1,7 @@
 from typing import Any, Iterator
 
+from liti.core.backend.base import DbBackend
+from liti.core.backend.memory import MemoryDbBackend
 from liti.core.context import Context
 from liti.core.model.v1.datatype import Array, Datatype, Struct
 from liti.core.model.v1.operation.data.base import Operation
@@ -36,3 +38,19 @@ def extract_nested_datatype(table: Table, field_path: FieldPath) -> Datatype:
 
 def attach_ops(operation: Operation, context: Context) -> OperationOps:
     return OperationOps.get_attachment(operation)(operation, context)
+
+
+def replay(db_backend: DbBackend, operations: list[Operation]):
+    """ Apply already validated operations directly to the database
+
+    Unlike `MigrateRunner`, this does not set defaults, validate, check `is_up`, log, or update the metadata, so it is
+    only suitable for simulating operations that were validated when they were applied.
+    """
+
+    context = Context(db_backend=db_backend, silent=True)
+
+    for op in operations:
+        if isinstance(db_backend, MemoryDbBackend):
+            db_backend.begin_operation()
+
+        attach_ops(op, context).up()
@@ -0,0 +1,78 @@
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, RenameTable
+from liti.core.model.v1.operation.data.view import CreateMaterializedView, CreateView
+from liti.core.model.v1.schema import QualifiedName
+
+ENTITY_NAME_FIELDS = (
+    'table_name',
+    'schema_name',
+    'entity_name',
+    'view_name',
+    'materialized_view_name',
+)
+
+
+def affected_name(operation: Operation) -> QualifiedName | None:
+    """ Returns the name of the entity the operation mutates, or None if it is not known
+
+    Renames affect the entity under its name from before the rename.
+    Foreign keys are stored on the referencing table, so they only affect the referencing table.
+    """
+
+    if isinstance(operation, CreateSchema):
+        return operation.schema_object.name
+    elif isinstance(operation, CreateTable):
+        return operation.table.name
+    elif isinstance(operation, CreateView):
+        return operation.view.name
+    elif isinstance(operation, CreateMaterializedView):
+        return operation.materialized_view.name
+    elif isinstance(operation, RenameTable):
+        return operation.from_name
+
+    for field in ENTITY_NAME_FIELDS:
+        name = getattr(operation, field, None)
+
+        if isinstance(name, QualifiedName):
+            return name
+
+    return None
+
+
+class EntityHistoryIndex:
+    """ Maps each entity to the positions of the operations that affect it
+
+    Entities are indexed by their names at the end of the history, and a rename carries the positions from before the
+    rename over to the new name. Operations affecting unknown entities, like `ExecuteSql`, are part of every selection
+    since they could affect any entity.
+    """
+
+    def __init__(self, operations: list[Operation]):
+        self.operations = operations
+        self.entity_positions: dict[QualifiedName, list[int]] = {}
+        self.unscoped_positions: list[int] = []
+
+        for position, op in enumerate(operations):
+            name = affected_name(op)
+
+            if name is None:
+                self.unscoped_positions.append(position)
+            elif isinstance(op, RenameTable):
+                positions = self.entity_positions.pop(name, [])
+                positions.append(position)
+                self.entity_positions[name.with_name(op.to_name)] = positions
+            else:
+                self.entity_positions.setdefault(name, []).append(position)
+
+    def positions(self, names: set[QualifiedName]) -> list[int]:
+        """ Returns the positions of the operations affecting any of the named entities, in history order """
+        positions = set(self.unscoped_positions)
+
+        for name in names:
+            positions.update(self.entity_positions.get(name, []))
+
+        return sorted(positions)
+
+    def select(self, names: set[QualifiedName]) -> list[Operation]:
+        """ Returns the subset of the history needed to simulate the named entities """
+        return [self.operations[position] for position in self.positions(names)]
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from liti.core.model.v1.schema import QualifiedName
+
+log = logging.getLogger(__name__)
+
+MirrorRow = dict[str, Any]
+
+MIRROR_COLUMNS = {'idx', 'op_kind', 'op_data', 'inverse_op', 'chain_digest'}
+
+
+class MetaMirror:
+    """ Local JSON lines copies of metadata tables
+
+    Each row holds the `idx`, `op_kind`, `op_data`, `inverse_op` and `chain_digest` columns of the table, with the JSON
+    columns kept as strings. Since every row carries the chain digest of the history up to it, comparing the last row
+    with the remote table is enough to tell whether the whole copy is current.
+    """
+
+    def __init__(self, directory: Path):
+        """
+        :param directory: directory to store the copies in, created if it does not exist
+        """
+
+        self.directory = directory
+
+    def path(self, table_name: QualifiedName, stream: str | None = None) -> Path:
+        if stream is None:
+            return self.directory / f'{table_name}.jsonl'
+        else:
+            return self.directory / f'{table_name}.{stream}.jsonl'
+
+    def load(self, table_name: QualifiedName, stream: str | None = None) -> list[MirrorRow]:
+        path = self.path(table_name, stream)
+
+        if not path.is_file():
+            return []
+
+        try:
+            with open(path) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+
+            if not all(isinstance(row, dict) and MIRROR_COLUMNS <= row.keys() for row in rows):
+                raise ValueError('a row is missing columns')
+
+            return rows
+        except (OSError, ValueError) as e:
+            # a mirror is only a cache, so an unreadable one is fetched again from the table
+            log.warning(f'Ignoring unreadable metadata mirror {path}: {e}')
+            return []
+
+    def save(self, table_name: QualifiedName, rows: list[MirrorRow], stream: str | None = None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(table_name, stream)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+
+        with open(tmp_path, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row, separators=(',', ':')))
+                f.write('\n')
+
+        # replace atomically so concurrent runs never read a partial copy
+        os.replace(tmp_path, path)
@@ -6,3 +6,4 @@ from pydantic import BaseModel
 class Manifest(BaseModel):
     version: int
     operation_files: list[Path]
+    baseline: Path | None = None
@@ -0,0 +1,22 @@
+from typing import Any, ClassVar
+
+from liti.core.model.v1.operation.data.base import Operation
+
+
+class Baseline(Operation):
+    """ The state of the database after a compacted prefix of the history
+
+    A baseline replaces the operations it compacts, in the manifest and in the metadata, so runs never parse or
+    simulate them. It can only be the first operation of a history, and it cannot be rolled back. Its chain digest is
+    the chain digest of the compacted operations, so compacting a history does not change the digests after it.
+
+    :param operation_count: the number of compacted operations, including those compacted by an earlier baseline
+    :param digest: the chain digest of the compacted operations
+    :param catalog: the entities after the compacted operations, as dumped by `MemoryDbBackend.dump_catalog`
+    """
+
+    operation_count: int
+    digest: str
+    catalog: dict[str, list[dict[str, Any]]]
+
+    KIND: ClassVar[str] = 'baseline'
@@ -1,2 +1,2 @@
 # noinspection PyUnresolvedReferences
-from . import column, sql, table, view
+from . import baseline, column, sql, table, view
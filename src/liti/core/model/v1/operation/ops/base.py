@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
+from functools import cache
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
 
 from liti.core.backend.base import DbBackend, MetaBackend
 from liti.core.context import Context
@@ -7,6 +9,9 @@ from liti.core.model.v1.operation.data.base import Operation
 from liti.core.model.v1.schema import MaterializedView, QualifiedName, Schema, Table, View
 from liti.core.reflect import recursive_subclasses
 
+if TYPE_CHECKING:
+    from liti.core.checkpoint import SimulationCheckpoints
+
 
 class OperationOps(ABC):
     op: Operation
@@ -25,31 +30,58 @@ class OperationOps(ABC):
         return self.context.target_dir
 
     @staticmethod
-    def simulate(operations: list[Operation]) -> DbBackend:
+    def simulate(operations: list[Operation], checkpoints: Optional['SimulationCheckpoints'] = None) -> DbBackend:
+        """ Simulate the database after applying the operations
+
+        :param operations: the operations to apply to an empty database
+        :param checkpoints: [None] resumes from and saves simulation checkpoints if provided
+        """
+
         # circular imports
-        from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
-        from liti.core.runner import MigrateRunner
+        from liti.core.backend.memory import MemoryDbBackend
+        from liti.core.digest import prefix_digests
+        from liti.core.function import replay
+
+        if checkpoints is None:
+            sim_db = MemoryDbBackend()
+            replay(sim_db, operations)
+            return sim_db
 
-        sim_context = Context(
-            db_backend=MemoryDbBackend(),
-            meta_backend=MemoryMetaBackend(),
-            target_operations=operations,
-            silent=True,
-        )
+        digests = prefix_digests(operations)
+        start, sim_db = checkpoints.restore(digests)
 
-        MigrateRunner(context=sim_context).run(wet_run=True)
-        return sim_context.db_backend
+        for end in checkpoints.counts(start, len(operations)):
+            replay(sim_db, operations[start:end])
+            checkpoints.save(digests[end], sim_db)
+            start = end
+
+        replay(sim_db, operations[start:])
+        return sim_db
+
+    def simulate_previous(self) -> DbBackend:
+        """ Simulate the database from just before this operation was applied
+
+        Uses the state provided by the runner when planning down migrations, otherwise simulates only the part of the
+        applied history that affects the entity of this operation.
+        """
+
+        # circular imports
+        from liti.core.history import affected_name, EntityHistoryIndex
+
+        if self.context.previous_db_backend is not None:
+            return self.context.previous_db_backend
+
+        operations = self.meta_backend.get_previous_operations()
+        name = affected_name(self.op)
+
+        if name is not None:
+            operations = EntityHistoryIndex(operations).select({name})
+
+        return self.simulate(operations, self.context.checkpoints)
 
     @classmethod
     def get_attachment(cls, op: Operation) -> type['OperationOps']:
-        # ensure OperationOps subclasses are imported first
-        # noinspection PyUnresolvedReferences
-        import liti.core.model.v1.operation.ops.subclasses
-
-        return {
-            getattr(subclass, '__annotations__')['op']: subclass
-            for subclass in recursive_subclasses(OperationOps)
-        }[type(op)]
+        return get_attachments()[type(op)]
 
     @abstractmethod
     def up(self):
@@ -94,3 +126,15 @@ class OperationOps(ABC):
                 return entity
 
         return None
+
+
+@cache
+def get_attachments() -> dict[type[Operation], type[OperationOps]]:
+    # ensure OperationOps subclasses are imported first
+    # noinspection PyUnresolvedReferences
+    import liti.core.model.v1.operation.ops.subclasses
+
+    return {
+        getattr(subclass, '__annotations__')['op']: subclass
+        for subclass in recursive_subclasses(OperationOps)
+    }
@@ -0,0 +1,40 @@
+from liti.core.context import Context
+from liti.core.model.v1.operation.data.baseline import Baseline
+from liti.core.model.v1.operation.data.table import CreateTable
+from liti.core.model.v1.operation.ops.base import OperationOps
+from liti.core.model.v1.schema import Table
+
+
+class BaselineOps(OperationOps):
+    op: Baseline
+
+    def __init__(self, op: Baseline, context: Context):
+        self.op = op
+        self.context = context
+
+    def up(self):
+        # circular imports
+        from liti.core.baseline import create_operations
+
+        for op in create_operations(self.op):
+            self.get_attachment(op)(op, self.context).up()
+
+    def down(self) -> Baseline:
+        raise ValueError('Baselines cannot be rolled back')
+
+    def is_up(self) -> bool:
+        # circular imports
+        from liti.core.baseline import create_operations
+
+        operations = create_operations(self.op)
+
+        # read the tables at once rather than checking each, the backend can batch them
+        table_names = [op.table.name for op in operations if isinstance(op, CreateTable)]
+        tables = self.db_backend.get_relations(table_names)
+
+        return all(
+            isinstance(tables[op.table.name], Table)
+            if isinstance(op, CreateTable)
+            else self.get_attachment(op)(op, self.context).is_up()
+            for op in operations
+        )
@@ -34,7 +34,7 @@ class DropColumnOps(OperationOps):
         self.db_backend.drop_column(self.op.table_name, self.op.column_name)
 
     def down(self) -> AddColumn:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
         return AddColumn(table_name=self.op.table_name, column=sim_column)
 
@@ -81,7 +81,7 @@ class SetColumnDatatypeOps(OperationOps):
         )
 
     def down(self) -> SetColumnDatatype:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
 
         return SetColumnDatatype(
@@ -139,7 +139,7 @@ class DropColumnFieldOps(OperationOps):
         )
 
     def down(self) -> AddColumnField:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         sim_datatype = extract_nested_datatype(sim_table, self.op.field_path)
 
@@ -170,7 +170,7 @@ class SetColumnNullableOps(OperationOps):
         self.db_backend.set_column_nullable(self.op.table_name, self.op.column_name, self.op.nullable)
 
     def down(self) -> SetColumnNullable:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
 
         return SetColumnNullable(
@@ -195,7 +195,7 @@ class SetColumnDescriptionOps(OperationOps):
         self.db_backend.set_column_description(self.op.table_name, self.op.column_name, self.op.description)
 
     def down(self) -> SetColumnDescription:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
 
         return SetColumnDescription(
@@ -220,7 +220,7 @@ class SetColumnRoundingModeOps(OperationOps):
         self.db_backend.set_column_rounding_mode(self.op.table_name, self.op.column_name, self.op.rounding_mode)
 
     def down(self) -> SetColumnRoundingMode:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
 
         return SetColumnRoundingMode(
@@ -245,7 +245,7 @@ class SetColumnDataPoliciesOps(OperationOps):
         self.db_backend.set_column_data_policies(self.op.table_name, self.op.column_name, self.op.data_policies)
 
     def down(self) -> SetColumnDataPolicies:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_column = sim_db.get_table(self.op.table_name).column_map[self.op.column_name]
 
         return SetColumnDataPolicies(
@@ -32,7 +32,7 @@ class DropSchemaOps(OperationOps):
 
     # TODO: figure out how to recreate the resources within the schema when it was dropped
     def down(self) -> d.CreateSchema:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.CreateSchema(schema_object=sim_schema)
 
@@ -51,7 +51,7 @@ class SetDefaultTableExpirationOps(OperationOps):
         self.db_backend.set_default_table_expiration(self.op.schema_name, self.op.expiration)
 
     def down(self) -> d.SetDefaultTableExpiration:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
 
         return d.SetDefaultTableExpiration(
@@ -74,7 +74,7 @@ class SetDefaultPartitionExpirationOps(OperationOps):
         self.db_backend.set_default_partition_expiration(self.op.schema_name, self.op.expiration)
 
     def down(self) -> d.SetDefaultPartitionExpiration:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
 
         return d.SetDefaultPartitionExpiration(
@@ -97,7 +97,7 @@ class SetDefaultKmsKeyNameOps(OperationOps):
         self.db_backend.set_default_kms_key_name(self.op.schema_name, self.op.key_name)
 
     def down(self) -> d.SetDefaultKmsKeyName:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetDefaultKmsKeyName(schema_name=self.op.schema_name, key_name=sim_schema.default_kms_key_name)
 
@@ -116,7 +116,7 @@ class SetFailoverReservationOps(OperationOps):
         self.db_backend.set_failover_reservation(self.op.schema_name, self.op.reservation)
 
     def down(self) -> d.SetFailoverReservation:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetFailoverReservation(schema_name=self.op.schema_name, reservation=sim_schema.failover_reservation)
 
@@ -142,7 +142,7 @@ class SetCaseSensitiveOps(OperationOps):
         self.db_backend.set_case_sensitive(self.op.schema_name, self.op.case_sensitive)
 
     def down(self) -> d.SetCaseSensitive:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetCaseSensitive(schema_name=self.op.schema_name, case_sensitive=sim_schema.is_case_sensitive)
 
@@ -161,7 +161,7 @@ class SetIsPrimaryReplicaOps(OperationOps):
         self.db_backend.set_is_primary_replica(self.op.schema_name, self.op.is_primary)
 
     def down(self) -> d.SetIsPrimaryReplica:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetIsPrimaryReplica(schema_name=self.op.schema_name, is_primary=sim_schema.is_primary_replica)
 
@@ -187,7 +187,7 @@ class SetPrimaryReplicaOps(OperationOps):
         self.db_backend.set_primary_replica(self.op.schema_name, self.op.replica)
 
     def down(self) -> d.SetPrimaryReplica:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetPrimaryReplica(schema_name=self.op.schema_name, replica=sim_schema.primary_replica)
 
@@ -213,7 +213,7 @@ class SetMaxTimeTravelOps(OperationOps):
         self.db_backend.set_max_time_travel(self.op.schema_name, self.op.duration)
 
     def down(self) -> d.SetMaxTimeTravel:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetMaxTimeTravel(schema_name=self.op.schema_name, duration=sim_schema.max_time_travel)
 
@@ -232,7 +232,7 @@ class SetStorageBillingOps(OperationOps):
         self.db_backend.set_storage_billing(self.op.schema_name, self.op.storage_billing)
 
     def down(self) -> d.SetStorageBilling:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_schema = sim_db.get_schema(self.op.schema_name)
         return d.SetStorageBilling(schema_name=self.op.schema_name, storage_billing=sim_schema.storage_billing)
 
@@ -268,7 +268,7 @@ class DropTableOps(OperationOps):
         self.db_backend.drop_table(self.op.table_name)
 
     def down(self) -> d.CreateTable:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         return d.CreateTable(table=sim_table)
 
@@ -308,7 +308,7 @@ class SetPrimaryKeyOps(OperationOps):
         self.db_backend.set_primary_key(self.op.table_name, self.op.primary_key)
 
     def down(self) -> d.SetPrimaryKey:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         return d.SetPrimaryKey(table_name=self.op.table_name, primary_key=sim_table.primary_key)
 
@@ -345,7 +345,7 @@ class DropConstraintOps(OperationOps):
         self.db_backend.drop_constraint(self.op.table_name, self.op.constraint_name)
 
     def down(self) -> d.AddForeignKey:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
 
         return d.AddForeignKey(
@@ -368,7 +368,7 @@ class SetPartitionExpirationOps(OperationOps):
         self.db_backend.set_partition_expiration(self.op.table_name, self.op.expiration)
 
     def down(self) -> d.SetPartitionExpiration:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
 
         return d.SetPartitionExpiration(
@@ -392,7 +392,7 @@ class SetRequirePartitionFilterOps(OperationOps):
         self.db_backend.set_require_partition_filter(self.op.table_name, self.op.require_filter)
 
     def down(self) -> d.SetRequirePartitionFilter:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
 
         return d.SetRequirePartitionFilter(
@@ -416,7 +416,7 @@ class SetClusteringOps(OperationOps):
         self.db_backend.set_clustering(self.op.table_name, self.op.column_names)
 
     def down(self) -> d.SetClustering:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         return d.SetClustering(table_name=self.op.table_name, column_names=sim_table.clustering)
 
@@ -435,7 +435,7 @@ class SetFriendlyNameOps(OperationOps):
         self.db_backend.set_friendly_name(self.op.entity_name, self.op.friendly_name)
 
     def down(self) -> d.SetFriendlyName:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -459,7 +459,7 @@ class SetDescriptionOps(OperationOps):
         self.db_backend.set_description(self.op.entity_name, self.op.description)
 
     def down(self) -> d.SetDescription:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -483,7 +483,7 @@ class SetLabelsOps(OperationOps):
         self.db_backend.set_labels(self.op.entity_name, self.op.labels)
 
     def down(self) -> d.SetLabels:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -507,7 +507,7 @@ class SetTagsOps(OperationOps):
         self.db_backend.set_tags(self.op.entity_name, self.op.tags)
 
     def down(self) -> d.SetTags:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -531,7 +531,7 @@ class SetExpirationTimestampOps(OperationOps):
         self.db_backend.set_expiration_timestamp(self.op.entity_name, self.op.expiration_timestamp)
 
     def down(self) -> d.SetExpirationTimestamp:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -558,7 +558,7 @@ class SetDefaultRoundingModeOps(OperationOps):
         self.db_backend.set_default_rounding_mode(self.op.entity_name, self.op.rounding_mode)
 
     def down(self) -> d.SetDefaultRoundingMode:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -592,7 +592,7 @@ class SetMaxStalenessOps(OperationOps):
         self.db_backend.set_max_staleness(self.op.entity_name, self.op.max_staleness)
 
     def down(self) -> d.SetMaxStaleness:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_entity = self.get_entity(self.op.entity_name, sim_db)
 
         if sim_entity is not None:
@@ -624,7 +624,7 @@ class SetEnableChangeHistoryOps(OperationOps):
         self.db_backend.set_enable_change_history(self.op.table_name, self.op.enabled)
 
     def down(self) -> d.SetEnableChangeHistory:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         return d.SetEnableChangeHistory(table_name=self.op.table_name, enabled=sim_table.enable_change_history)
 
@@ -650,7 +650,7 @@ class SetEnableFineGrainedMutationsOps(OperationOps):
         self.db_backend.set_enable_fine_grained_mutations(self.op.table_name, self.op.enabled)
 
     def down(self) -> d.SetEnableFineGrainedMutations:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
 
         return d.SetEnableFineGrainedMutations(
@@ -680,7 +680,7 @@ class SetKmsKeyNameOps(OperationOps):
         self.db_backend.set_kms_key_name(self.op.table_name, self.op.key_name)
 
     def down(self) -> d.SetKmsKeyName:
-        sim_db = self.simulate(self.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_table = sim_db.get_table(self.op.table_name)
         return d.SetKmsKeyName(table_name=self.op.table_name, key_name=sim_table.kms_key_name)
 
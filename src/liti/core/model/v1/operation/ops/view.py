@@ -15,7 +15,7 @@ class CreateViewOps(OperationOps):
         self.context.db_backend.create_view(self.op.view)
 
     def down(self) -> CreateView | DropView:
-        sim_db = self.simulate(self.context.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_view = sim_db.get_view(self.op.view.name)
 
         if sim_view:
@@ -38,7 +38,7 @@ class DropViewOps(OperationOps):
         self.context.db_backend.drop_view(self.op.view_name)
 
     def down(self) -> CreateView:
-        sim_db = self.simulate(self.context.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_view = sim_db.get_view(self.op.view_name)
         return CreateView(view=sim_view)
 
@@ -57,7 +57,7 @@ class CreateMaterializedViewOps(OperationOps):
         self.context.db_backend.create_materialized_view(self.op.materialized_view)
 
     def down(self) -> CreateMaterializedView | DropMaterializedView:
-        sim_db = self.simulate(self.context.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_materialized_view = sim_db.get_materialized_view(self.op.materialized_view.name)
 
         if sim_materialized_view:
@@ -80,7 +80,7 @@ class DropMaterializedViewOps(OperationOps):
         self.context.db_backend.drop_materialized_view(self.op.materialized_view_name)
 
     def down(self) -> CreateMaterializedView:
-        sim_db = self.simulate(self.context.meta_backend.get_previous_operations())
+        sim_db = self.simulate_previous()
         sim_materialized_view = sim_db.get_materialized_view(self.op.materialized_view_name)
         return CreateMaterializedView(materialized_view=sim_materialized_view)
 
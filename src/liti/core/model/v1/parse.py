@@ -1,11 +1,23 @@
+import json
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
 from pathlib import Path
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from pydantic import TypeAdapter
 
 from liti.core.base import LitiModel, STAR
 from liti.core.file import parse_json_or_yaml_file
 from liti.core.model.v1.manifest import Manifest
 from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
 from liti.core.model.v1.template import Template, TemplateFile
 
+# rows per process when parsing in parallel, smaller chunks cost more to send between processes than they save
+PARSE_CHUNK_SIZE = 5000
+
 
 def parse_manifest(path: Path) -> Manifest:
     obj = parse_json_or_yaml_file(path)
@@ -13,6 +25,7 @@ def parse_manifest(path: Path) -> Manifest:
     return Manifest(
         version=obj['version'],
         operation_files=[Path(filename) for filename in obj['operation_files']],
+        baseline=obj.get('baseline') and Path(obj['baseline']),
     )
 
 
@@ -41,9 +54,78 @@ def parse_operation(op_kind: str, op_data: dict) -> Operation:
     return Operation.by_kind(op_kind)(**op_data)
 
 
+@cache
+def operation_list_adapter(op_kind: str) -> TypeAdapter:
+    return TypeAdapter(list[Operation.by_kind(op_kind)])
+
+
+def parse_operation_rows(rows: list[tuple[str, str | dict[str, Any]]], processes: int = 1) -> list[Operation]:
+    """ Bulk version of `parse_operation` for `(op_kind, op_data)` rows, `op_data` either a JSON string or decoded
+
+    Rows are grouped by kind and each group is validated in a single call, JSON strings without decoding them in Python
+    first. With more than one process, inputs larger than a chunk are split into chunks parsed in a process pool.
+    """
+
+    if processes > 1 and len(rows) > PARSE_CHUNK_SIZE:
+        chunks = [rows[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(rows), PARSE_CHUNK_SIZE)]
+
+        with ProcessPoolExecutor(processes) as executor:
+            return [operation for operations in executor.map(parse_operation_rows, chunks) for operation in operations]
+
+    positions_by_kind: dict[str, list[int]] = defaultdict(list)
+
+    for position, (op_kind, _) in enumerate(rows):
+        positions_by_kind[op_kind].append(position)
+
+    operations: list[Operation | None] = [None] * len(rows)
+
+    for op_kind, positions in positions_by_kind.items():
+        adapter = operation_list_adapter(op_kind)
+        op_datas = [rows[position][1] for position in positions]
+
+        if all(isinstance(op_data, str) for op_data in op_datas):
+            parsed = adapter.validate_json(f'[{",".join(op_datas)}]')
+        else:
+            parsed = adapter.validate_python([
+                json.loads(op_data) if isinstance(op_data, str) else op_data
+                for op_data in op_datas
+            ])
+
+        for position, operation in zip(positions, parsed):
+            operations[position] = operation
+
+    return operations
+
+
+def iter_parse_operation_rows(
+    rows: Iterable[tuple[str, str | dict[str, Any]]],
+    processes: int = 1,
+) -> Iterator[Operation]:
+    """ Streaming version of `parse_operation_rows` that parses the rows one chunk per process at a time
+
+    Only a bounded number of unparsed rows is held at once, and rows after a chunk are not read until the operations of
+    the chunk are consumed.
+    """
+
+    rows = iter(rows)
+
+    while chunk := list(islice(rows, PARSE_CHUNK_SIZE * processes)):
+        yield from parse_operation_rows(chunk, processes)
+
+
+def parse_op_data(op_data: dict) -> Operation:
+    """ Inverse of `Operation.to_op_data` """
+    return parse_operation(op_data['kind'], op_data['data'])
+
+
 def parse_operation_file(path: Path) -> list[Operation]:
     obj = parse_json_or_yaml_file(path)
-    return [parse_operation(op['kind'], op['data']) for op in obj['operations']]
+    return [parse_op_data(op) for op in obj['operations']]
+
+
+def parse_baseline_file(path: Path) -> Baseline:
+    obj = parse_json_or_yaml_file(path)
+    return Baseline(**obj['baseline'])
 
 
 def parse_operations(operation_files: list[Path], target_dir: Path) -> list[tuple[Path, list[Operation]]]:
@@ -106,7 +106,7 @@ class ValidatedString(LitiModel):
         return self.string
 
     def model_post_init(self, context: Any):
-        if any(c not in self.VALID_CHARS for c in self.string):
+        if not self.VALID_CHARS.issuperset(self.string):
             raise ValueError(f'Invalid {self.__class__.__name__}: {self.string}')
 
     @model_validator(mode='before')
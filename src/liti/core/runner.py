@@ -6,15 +6,21 @@ from typing import Literal
 import yaml
 from devtools import pformat
 
+from liti.core.backend.background import BackgroundMetaBackend
 from liti.core.backend.base import DbBackend, MetaBackend
+from liti.core.backend.cache import CachedMetaBackend
+from liti.core.backend.memory import MemoryDbBackend
 from liti.core.context import Context
 from liti.core.file import get_manifest_path
-from liti.core.function import attach_ops
+from liti.core.function import attach_ops, replay
+from liti.core.history import affected_name, EntityHistoryIndex
 from liti.core.logger import NoOpLogger
 from liti.core.model.v1.manifest import Manifest
 from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
 from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable
-from liti.core.model.v1.parse import parse_manifest, parse_operations, parse_templates
+from liti.core.model.v1.operation.ops.base import OperationOps
+from liti.core.model.v1.parse import parse_baseline_file, parse_manifest, parse_operations, parse_templates
 from liti.core.model.v1.schema import DatabaseName, Identifier, QualifiedName, SchemaName
 from liti.core.model.v1.template import Template
 from liti.core.observe import set_defaults, validate_model
@@ -49,6 +55,8 @@ def apply_templates(file_operations: list[tuple[Path, list[Operation]]], templat
 class MigrateRunner:
     def __init__(self, context: Context):
         self.context = context
+        self.meta_cache: CachedMetaBackend | None = None
+        self.history_simulation: tuple[tuple[int, frozenset[QualifiedName] | None], MemoryDbBackend] | None = None
 
     @property
     def db_backend(self) -> DbBackend:
@@ -89,65 +97,232 @@ class MigrateRunner:
             if self.templates:
                 apply_templates(file_operations, self.templates)
 
-            self.context.target_operations = [op for _, ops in file_operations for op in ops]
+            operations = [op for _, ops in file_operations for op in ops]
+
+            if manifest.baseline is not None:
+                operations.insert(0, parse_baseline_file(self.target_dir.joinpath(manifest.baseline)))
+
+            self.context.target_operations = operations
 
         return self.context.target_operations
 
+    def prepare_target_operations(self) -> list[Operation]:
+        """ Sets the database backend defaults on the target operations and validates them, as they are applied """
+
+        for op in self.target_operations:
+            set_defaults(op, self.db_backend, self.context)
+            validate_model(op, self.db_backend, self.context)
+
+        return self.target_operations
+
     def run(
         self,
         wet_run: bool | None = None,
         allow_down: bool | None = None,
+        store_inverses: bool | None = None,
+        background_meta: bool | None = None,
     ):
         """
         :param wet_run: [False] True to run the migrations, False to simulate them
         :param allow_down: [False] True to allow down migrations, False will raise if down migrations are required
+        :param store_inverses: [True] True to store the inverse of each applied operation in the metadata
+        :param background_meta: [False] True to write the metadata from a background thread while the next operations
+            are applied
         """
 
         wet_run = wet_run if wet_run is not None else False
         allow_down = allow_down if allow_down is not None else False
+        store_inverses = store_inverses if store_inverses is not None else True
+        background_meta = background_meta if background_meta is not None else False
         logger = NoOpLogger() if self.context.silent else log
+        self.history_simulation = None
+
+        # the history is loaded at most once per run, the cache is kept current by the metadata writes
+        meta_backend = self.meta_backend
+        background = BackgroundMetaBackend(meta_backend) if background_meta else None
+        self.meta_cache = CachedMetaBackend(background or meta_backend)
+        self.context.meta_backend = self.meta_cache
+
+        try:
+            self.prepare_target_operations()
+
+            if wet_run:
+                self.meta_backend.initialize()
+
+            migration_plan = self.meta_backend.get_migration_plan(self.target_operations)
+
+            if not allow_down and migration_plan['down']:
+                raise RuntimeError('Down migrations required but not allowed. Use --down')
+
+            def apply_operations(
+                operations: list[Operation],
+                up_operations: list[Operation],
+                inverse_operations: list[Operation | None],
+                up: bool,
+            ):
+                try:
+                    for op, up_op, inverse in zip(operations, up_operations, inverse_operations):
+                        up_ops = attach_ops(up_op, self.context)
+
+                        # Apply only if not applied already
+                        if not up_ops.is_up():
+                            logger.info(pformat(up_op, highlight=True))
+
+                            if wet_run:
+                                up_ops.up()
+
+                        # Update the metadata
+                        if wet_run:
+                            if up:
+                                self.meta_backend.apply_operation(op, inverse)
+                            else:
+                                self.meta_backend.unapply_operation(op)
+                finally:
+                    # each phase ends with its metadata written, even if an operation failed
+                    if wet_run:
+                        self.meta_backend.flush()
 
-        for op in self.target_operations:
-            set_defaults(op, self.db_backend, self.context)
-            validate_model(op, self.db_backend, self.context)
+            down_operations = migration_plan['down']
+            up_operations = migration_plan['up']
 
-        if wet_run:
-            self.meta_backend.initialize()
+            logger.info('Down')
+            # Down migrations apply the inverse operation
+            apply_operations(down_operations, self.plan_down(down_operations), [None] * len(down_operations), False)
+            logger.info('Up')
 
-        migration_plan = self.meta_backend.get_migration_plan(self.target_operations)
+            if wet_run and store_inverses and up_operations:
+                # the metadata only holds the common history once the down migrations are applied
+                inverse_operations = self.simulate_inverses(
+                    self.meta_backend.get_applied_operations(),
+                    up_operations,
+                    ignore_errors=True,
+                )
+            else:
+                inverse_operations = [None] * len(up_operations)
 
-        if not allow_down and migration_plan['down']:
-            raise RuntimeError('Down migrations required but not allowed. Use --down')
+            apply_operations(up_operations, up_operations, inverse_operations, True)
+            logger.info('Done')
+        finally:
+            self.context.meta_backend = meta_backend
 
-        def apply_operations(operations: list[Operation], up: bool):
-            for op in operations:
-                if up:
-                    up_op = op
-                else:
-                    # Down migrations apply the inverse operation
-                    up_op = attach_ops(op, self.context).down()
+            if background is not None:
+                background.close()
 
-                up_ops = attach_ops(up_op, self.context)
+            log.debug(f'Metadata cache hits: {self.meta_cache.hits}, misses: {self.meta_cache.misses}')
 
-                # Apply only if not applied already
-                if not up_ops.is_up():
-                    logger.info(pformat(up_op, highlight=True))
+    def plan_down(self, operations: list[Operation]) -> list[Operation]:
+        """ Build the inverse of each down operation
 
-                    if wet_run:
-                        up_ops.up()
-
-                # Update the metadata
-                if wet_run:
-                    if up:
-                        self.meta_backend.apply_operation(op)
-                    else:
-                        self.meta_backend.unapply_operation(op)
-
-        logger.info('Down')
-        apply_operations(migration_plan['down'], False)
-        logger.info('Up')
-        apply_operations(migration_plan['up'], True)
-        logger.info('Done')
+        Uses the inverses stored in the metadata when available, otherwise builds them with a single replay of the
+        applied history.
+
+        :param operations: the applied operations to revert, most recent first
+        :return: the inverse operations in the same order
+        """
+
+        if not operations:
+            return []
+
+        if any(isinstance(op, Baseline) for op in operations):
+            raise RuntimeError('Baselines cannot be rolled back')
+
+        stored_inverses = self.meta_backend.get_inverse_operations()
+        common_count = len(stored_inverses) - len(operations)
+        known_inverses = stored_inverses[common_count:]
+
+        # the history is only read when an inverse was not stored
+        if all(inverse is not None for inverse in known_inverses):
+            return list(reversed(known_inverses))
+
+        inverse_operations = self.simulate_inverses(
+            self.meta_backend.get_applied_operations()[:common_count],
+            list(reversed(operations)),
+            known_inverses,
+        )
+
+        return list(reversed(inverse_operations))
+
+    def simulate_history(
+        self,
+        history: list[Operation],
+        names: set[QualifiedName] | None = None,
+    ) -> MemoryDbBackend:
+        """ Simulate the history at most once per run
+
+        Down and up migrations both start from the common history, so each caller gets a fork of the same simulation.
+
+        :param history: the operations to simulate
+        :param names: [None] only simulate the operations affecting these entities, None simulates every operation
+        """
+
+        key = len(history), None if names is None else frozenset(names)
+
+        if self.history_simulation is None or self.history_simulation[0] != key:
+            if names is not None:
+                history = EntityHistoryIndex(history).select(names)
+
+            self.history_simulation = key, OperationOps.simulate(history, self.context.checkpoints)
+
+        return self.history_simulation[1].fork()
+
+    def simulate_inverses(
+        self,
+        history: list[Operation],
+        operations: list[Operation],
+        known_inverses: list[Operation | None] | None = None,
+        ignore_errors: bool = False,
+    ) -> list[Operation | None]:
+        """ Build the inverse of each operation as if they were applied in order after the history
+
+        Each inverse is built against the simulated database from just before its operation. The history is only
+        simulated if an inverse is not already known, and then only for the entities the operations affect.
+
+        :param history: the operations applied before the first operation
+        :param operations: the operations to invert
+        :param known_inverses: [None] inverses that do not need to be built, None where unknown
+        :param ignore_errors: [False] True to leave an inverse None if it cannot be built and to skip the operations the
+            simulation cannot apply, like SQL files or operations on entities created outside the history
+        :return: the inverse operations in the same order, None for baselines
+        """
+
+        known_inverses = known_inverses or [None] * len(operations)
+
+        if all(inverse is not None or isinstance(op, Baseline) for op, inverse in zip(operations, known_inverses)):
+            return list(known_inverses)
+
+        names = {affected_name(op) for op in operations}
+
+        try:
+            sim_db = self.simulate_history(history, None if None in names else names)
+        except Exception as e:
+            if not ignore_errors:
+                raise
+
+            log.warning(f'Unable to simulate the history, not storing inverse operations: {e}')
+            return list(known_inverses)
+
+        op_context = self.context.model_copy(update={'previous_db_backend_': sim_db})
+        inverse_operations = []
+
+        for op, inverse in zip(operations, known_inverses):
+            try:
+                # baselines cannot be rolled back, so they have no inverse
+                if inverse is None and not isinstance(op, Baseline):
+                    # the simulation keeps mutating the models an inverse may reference
+                    inverse = attach_ops(op, op_context).down().model_copy(deep=True)
+
+                replay(sim_db, [op])
+            except Exception as e:
+                if not ignore_errors:
+                    raise
+
+                # the operation is left out of the simulation, so its inverse is not trusted either
+                log.warning(f'Unable to simulate {op.KIND}, not storing its inverse operation: {e}')
+                inverse = known_inverses[len(inverse_operations)]
+
+            inverse_operations.append(inverse)
+
+        return inverse_operations
 
 
 def sort_operations(operations: list[Operation]) -> list[Operation]:
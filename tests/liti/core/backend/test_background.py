@@ -0,0 +1,146 @@
+import threading
+from threading import Event
+
+from pytest import fixture, raises
+
+from liti.core.backend.background import BackgroundMetaBackend
+from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
+from liti.core.context import Context
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.table import CreateSchema
+from liti.core.model.v1.schema import QualifiedName, Schema
+from liti.core.runner import MigrateRunner
+
+
+class FailingMetaBackend(MemoryMetaBackend):
+    """ Fails to write the operation at position `fail_at` and records the thread of each write """
+
+    def __init__(self, fail_at: int | None = None):
+        super().__init__()
+        self.fail_at = fail_at
+        self.write_threads: set[str] = set()
+
+    def apply_operation(self, operation: Operation, inverse: Operation | None = None):
+        self.write_threads.add(threading.current_thread().name)
+
+        if len(self.applied_operations) == self.fail_at:
+            raise ConnectionError('metadata write failed')
+
+        super().apply_operation(operation, inverse)
+
+
+@fixture
+def operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(4)
+    ]
+
+
+def test_writes_in_order(operations: list[Operation]):
+    meta_backend = FailingMetaBackend()
+    background = BackgroundMetaBackend(meta_backend)
+
+    for op in operations:
+        background.apply_operation(op)
+
+    background.unapply_operation(operations[3])
+
+    # reads wait for the writes queued before them
+    assert background.get_applied_operations() == operations[:3]
+    assert all(name.startswith('liti-meta') for name in meta_backend.write_threads)
+    background.close()
+
+
+def test_writes_do_not_wait(operations: list[Operation]):
+    meta_backend = MemoryMetaBackend()
+    background = BackgroundMetaBackend(meta_backend)
+    release = Event()
+
+    background.submit(release.wait)
+    background.apply_operation(operations[0])
+
+    # the write is queued behind the blocked call
+    assert meta_backend.applied_operations == []
+
+    release.set()
+    background.flush()
+    assert meta_backend.applied_operations == operations[:1]
+    background.close()
+
+
+def test_one_pending_write(operations: list[Operation]):
+    meta_backend = MemoryMetaBackend()
+    background = BackgroundMetaBackend(meta_backend)
+    release = Event()
+
+    background.write(release.wait)
+    writer = threading.Thread(target=background.apply_operation, args=(operations[0],))
+    writer.start()
+
+    # the second write waits until the first one completes
+    writer.join(0.1)
+    assert writer.is_alive()
+
+    release.set()
+    writer.join()
+    background.flush()
+    assert meta_backend.applied_operations == operations[:1]
+    background.close()
+
+
+def test_failed_write(operations: list[Operation]):
+    meta_backend = FailingMetaBackend(fail_at=1)
+    background = BackgroundMetaBackend(meta_backend)
+
+    for op in operations[:2]:
+        background.apply_operation(op)
+
+    # the next write waits for the failed one and reports the original failure
+    with raises(ConnectionError):
+        background.apply_operation(operations[2])
+
+    with raises(ConnectionError):
+        background.flush()
+
+    assert meta_backend.applied_operations == operations[:1]
+    background.close()
+
+
+def test_run(operations: list[Operation]):
+    db_backend = MemoryDbBackend()
+    meta_backend = FailingMetaBackend()
+
+    MigrateRunner(context=Context(
+        db_backend=db_backend,
+        meta_backend=meta_backend,
+        target_operations=operations,
+        silent=True,
+    )).run(wet_run=True, background_meta=True)
+
+    assert meta_backend.applied_operations == operations
+    assert len(db_backend.schemas) == 4
+
+
+def test_run_failed_write(operations: list[Operation]):
+    db_backend = MemoryDbBackend()
+    meta_backend = FailingMetaBackend(fail_at=1)
+
+    runner = MigrateRunner(context=Context(
+        db_backend=db_backend,
+        meta_backend=meta_backend,
+        target_operations=operations,
+        silent=True,
+    ))
+
+    with raises(ConnectionError):
+        runner.run(wet_run=True, background_meta=True)
+
+    assert meta_backend.applied_operations == operations[:1]
+
+    # the next run finds the operations applied without metadata through `is_up`
+    meta_backend.fail_at = None
+    runner.run(wet_run=True)
+
+    assert meta_backend.applied_operations == operations
+    assert len(db_backend.schemas) == 4
@@ -113,3 +113,26 @@ def test_get_migration_mismatch():
         create_table(3),
         drop_table(3),
     ]
+
+
+def test_get_migration_plan_changed_digests():
+    current = [
+        create_table(1),
+        drop_table(1),
+        create_table(2),
+    ]
+
+    target = [
+        create_table(1),
+        drop_table(1),
+        create_table(3),
+    ]
+
+    meta_backend = MemoryMetaBackend(current)
+
+    # stored digests go stale when a new model field has a default, the models are still equal
+    meta_backend.get_applied_digests = lambda: ['stale'] * len(current)
+    actual = meta_backend.get_migration_plan(target)
+
+    assert actual['down'] == [create_table(2)]
+    assert actual['up'] == [create_table(3)]
@@ -1,7 +1,12 @@
+import gzip
+import json
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Literal
-from unittest.mock import Mock
+from unittest.mock import call, Mock, patch
 
+from google.api_core.exceptions import ServiceUnavailable
+from pydantic import ValidationError
 from pytest import fixture, mark, raises
 
 from liti import bigquery as bq
@@ -10,21 +15,29 @@ from liti.core.backend.bigquery import BigQueryDbBackend, BigQueryMetaBackend, c
     extract_dataset_ref, interval_literal_to_sql, NULLABLE, REPEATED, REQUIRED, to_bq_table, to_column, \
     to_dataset_ref, to_datatype, to_datatype_array, to_field_type, to_fields, to_liti_materialized_view, to_liti_table, \
     to_liti_view, to_max_length, to_mode, to_precision, to_range_element_type, to_scale, to_schema_field, to_table_ref
+from liti.core.digest import chain_digest, EMPTY_DIGEST, operation_digest, prefix_digests
 from liti.core.model.v1.datatype import Array, BigNumeric, BOOL, BYTES, Bytes, Datatype, DATE, DATE_TIME, Float, \
     FLOAT64, GEOGRAPHY, Int, INT64, INTERVAL, JSON, Numeric, Range, STRING, String, Struct, TIME, TIMESTAMP
-from liti.core.model.v1.operation.data.table import CreateSchema
+from liti.core.mirror import MetaMirror
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.baseline import Baseline
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, DropSchema
 from liti.core.model.v1.schema import BigLake, Column, ColumnName, DatabaseName, ForeignKey, ForeignReference, \
     Identifier, IntervalLiteral, MaterializedView, Partitioning, PrimaryKey, QualifiedName, RoundingMode, Schema, \
     SchemaName, Table, View
 from liti.core.observe import set_defaults, validate_model
 from tests.liti.util import NoRaise
 
+META_TABLE_NAME = QualifiedName('test_project.test_dataset.meta_table')
+
 
 @fixture
 def bq_client() -> Mock:
     client = Mock()
+    client.session_id = None
     client.get_dataset.return_value = None
     client.get_table.return_value = None
+    client.find_table.return_value = None
     client.has_table.return_value = False
     client.has_view.return_value = False
     client.has_materialized_view.return_value = False
@@ -78,6 +91,7 @@ def mock_get_entity(bq_client: Mock, entity: bq.Dataset | bq.Table):
         bq_client.get_dataset.return_value = entity
     elif isinstance(entity, bq.Table):
         bq_client.get_table.return_value = entity
+        bq_client.find_table.return_value = entity
 
         if entity.table_type == 'TABLE':
             bq_client.has_table.return_value = True
@@ -1720,6 +1734,54 @@ def test_create_table_full(db_backend: BigQueryDbBackend, bq_client: Mock):
     )
 
 
+def test_rename_table(db_backend: BigQueryDbBackend, bq_client: Mock):
+    db_backend.rename_table(QualifiedName('test_project.test_dataset.old_table'), Identifier('new_table'))
+
+    bq_client.query_and_wait.assert_called_once_with(
+        'ALTER TABLE `test_project.test_dataset.old_table` RENAME TO `new_table`'
+    )
+
+    # the cached dataset listing follows the rename
+    assert bq_client.set_table_type.call_args_list == [
+        call(bq.TableReference.from_string('test_project.test_dataset.new_table'), 'TABLE'),
+        call(bq.TableReference.from_string('test_project.test_dataset.old_table'), None),
+    ]
+
+
+def test_execute_sql(db_backend: BigQueryDbBackend, bq_client: Mock):
+    bq_client.query_and_wait.side_effect = ServiceUnavailable('unavailable')
+
+    with raises(ServiceUnavailable):
+        db_backend.execute_sql('CREATE VIEW `test_project.test_dataset.test_view` AS SELECT 1')
+
+    # even a failed script may have changed relations before it stopped
+    bq_client.clear_table_types.assert_called_once()
+
+
+def test_get_relation(db_backend: BigQueryDbBackend, bq_client: Mock):
+    mock_get_entity(bq_client, make_view())
+
+    assert isinstance(db_backend.get_relation(QualifiedName('test_project.test_dataset.test_name')), View)
+    bq_client.find_table.assert_called_once_with(bq.TableReference.from_string('test_project.test_dataset.test_name'))
+
+
+def test_get_relations(db_backend: BigQueryDbBackend, bq_client: Mock):
+    table_names = [QualifiedName(f'test_project.test_dataset.table_{i}') for i in range(3)]
+    other_name = QualifiedName('test_project.other_dataset.test_name')
+    bq_client.load_tables.return_value = [make_table(table_names[0]), make_view(table_names[1])]
+    mock_get_entity(bq_client, make_table(other_name))
+
+    relations = db_backend.get_relations([*table_names, other_name])
+
+    # datasets with several of the relations are loaded from their catalog at once
+    bq_client.load_tables.assert_called_once_with(bq.DatasetReference('test_project', 'test_dataset'))
+    bq_client.find_table.assert_called_once_with(to_table_ref(other_name))
+    assert isinstance(relations[table_names[0]], Table)
+    assert isinstance(relations[table_names[1]], View)
+    assert relations[table_names[2]] is None
+    assert relations[other_name].name == other_name
+
+
 @mark.parametrize(
     'column_names, expected',
     [
@@ -2772,36 +2834,955 @@ def test_validate_partitioning(
         validate_model(node, db_backend, context)
 
 
+def test_initialize_partitioned(bq_client: Mock):
+    BigQueryMetaBackend(bq_client, META_TABLE_NAME, partitioned=True).initialize()
+
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        'CREATE SCHEMA IF NOT EXISTS `test_project.test_dataset`;\n'
+        '\n'
+        'CREATE TABLE IF NOT EXISTS `test_project.test_dataset.meta_table` (\n'
+        '    idx INT64 NOT NULL,\n'
+        '    op_kind STRING NOT NULL,\n'
+        '    op_data JSON NOT NULL,\n'
+        '    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP() NOT NULL,\n'
+        '    inverse_op JSON,\n'
+        '    op_digest STRING,\n'
+        '    chain_digest STRING\n'
+        ')\n'
+        'PARTITION BY RANGE_BUCKET(idx, GENERATE_ARRAY(0, 10000000, 1000))\n'
+        'CLUSTER BY idx;\n'
+        '\n'
+        'ALTER TABLE `test_project.test_dataset.meta_table`\n'
+        'ADD COLUMN IF NOT EXISTS inverse_op JSON,\n'
+        'ADD COLUMN IF NOT EXISTS op_digest STRING,\n'
+        'ADD COLUMN IF NOT EXISTS chain_digest STRING;\n'
+    )
+
+
+def test_upgrade_layout(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(range_partitioning=None, schema=[])
+
+    meta_backend.upgrade_layout()
+
+    assert bq_client.query_and_wait.call_count == 2
+    assert meta_backend.partitioned
+
+    sql = bq_client.query_and_wait.call_args.args[0]
+
+    assert sql.startswith(
+        'DROP TABLE IF EXISTS `test_project.test_dataset.meta_table__liti_upgrade`;\n'
+        '\n'
+        'CREATE TABLE IF NOT EXISTS `test_project.test_dataset.meta_table__liti_upgrade` (\n'
+    )
+
+    assert sql.endswith(
+        'PARTITION BY RANGE_BUCKET(idx, GENERATE_ARRAY(0, 10000000, 1000))\n'
+        'CLUSTER BY idx;\n'
+        '\n'
+        'INSERT INTO `test_project.test_dataset.meta_table__liti_upgrade` '
+        '(idx, op_kind, op_data, applied_at, inverse_op, op_digest, chain_digest)\n'
+        'SELECT idx, op_kind, op_data, applied_at, inverse_op, op_digest, chain_digest '
+        'FROM `test_project.test_dataset.meta_table`;\n'
+        '\n'
+        'DROP TABLE `test_project.test_dataset.meta_table`;\n'
+        '\n'
+        'ALTER TABLE `test_project.test_dataset.meta_table__liti_upgrade` RENAME TO `meta_table`;\n'
+    )
+
+
+def test_upgrade_layout_already_partitioned(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(range_partitioning=bq.RangePartitioning())
+
+    meta_backend.upgrade_layout()
+
+    bq_client.query_and_wait.assert_not_called()
+
+
+def test_upgrade_layout_streamed(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, stream='my_app')
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(range_partitioning=bq.RangePartitioning(), clustering_fields=['idx'], schema=[])
+
+    meta_backend.upgrade_layout()
+
+    assert 'CLUSTER BY stream, idx;\n' in bq_client.query_and_wait.call_args.args[0]
+
+    bq_client.query_and_wait.reset_mock()
+    bq_client.get_table.return_value.clustering_fields = ['stream', 'idx']
+    meta_backend.upgrade_layout()
+
+    bq_client.query_and_wait.assert_not_called()
+
+
+def test_upgrade_layout_missing_table(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    meta_backend.upgrade_layout()
+
+    bq_client.query_and_wait.assert_called_once()
+    assert 'CLUSTER BY idx' in bq_client.query_and_wait.call_args.args[0]
+
+
+def test_initialize_streamed(bq_client: Mock):
+    BigQueryMetaBackend(bq_client, META_TABLE_NAME, stream='my_app').initialize()
+
+    sql = bq_client.query_and_wait.call_args.args[0]
+
+    assert '    chain_digest STRING,\n    stream STRING\n)\nCLUSTER BY stream, idx;\n' in sql
+    assert 'ADD COLUMN IF NOT EXISTS chain_digest STRING,\nADD COLUMN IF NOT EXISTS stream STRING;\n' in sql
+
+
+def test_read_rows_streamed(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, stream='my_app')
+    bq_client.query_and_wait.return_value = [Mock(idx=0, chain_digest='first')]
+
+    assert [row.chain_digest for row in meta_backend.read_rows(['chain_digest'])] == ['first']
+    bq_client.list_rows.assert_not_called()
+
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        'SELECT chain_digest FROM `test_project.test_dataset.meta_table` '
+        'WHERE stream = @stream AND idx >= @start ORDER BY idx'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+
+    assert job_config.query_parameters == [
+        bq.ScalarQueryParameter('stream', 'STRING', 'my_app'),
+        bq.ScalarQueryParameter('start', 'INT64', 0),
+    ]
+
+
+def test_apply_operation_streamed(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, stream='my_app')
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.query_and_wait.side_effect = [[Mock(idx=2, chain_digest='previous')], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+
+    assert bq_client.query_and_wait.call_args_list[0].args[0] == (
+        'SELECT idx, chain_digest FROM `test_project.test_dataset.meta_table` '
+        'WHERE stream = @stream ORDER BY idx DESC LIMIT 1'
+    )
+
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        f'INSERT INTO `test_project.test_dataset.meta_table` '
+        f'(idx, op_kind, op_data, inverse_op, op_digest, chain_digest, stream)\n'
+        f'VALUES\n'
+        f'    (3, @op_kind_0, @op_data_0, @inverse_op_0, @op_digest_0, @chain_digest_0, @stream)\n'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters[0] == bq.ScalarQueryParameter('stream', 'STRING', 'my_app')
+
+
+def test_unapply_operation_streamed(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, stream='my_app')
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.query_and_wait.return_value = Mock(num_dml_affected_rows=1)
+
+    meta_backend.unapply_operation(create_schema)
+
+    assert bq_client.query_and_wait.call_args.args[0].startswith(
+        'DELETE FROM `test_project.test_dataset.meta_table`\n'
+        'WHERE stream = @stream AND idx = (SELECT MAX(idx) FROM `test_project.test_dataset.meta_table` '
+        'WHERE stream = @stream)\n'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters[0] == bq.ScalarQueryParameter('stream', 'STRING', 'my_app')
+
+
+def test_get_stream_tails(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.has_table.return_value = True
+
+    bq_client.query_and_wait.return_value = [
+        Mock(stream='first_app', tail={'idx': 4, 'chain_digest': 'first'}),
+        Mock(stream='second_app', tail={'idx': 0, 'chain_digest': 'second'}),
+    ]
+
+    assert meta_backend.get_stream_tails() == {'first_app': (5, 'first'), 'second_app': (1, 'second')}
+    bq_client.query_and_wait.assert_called_once()
+    assert 'GROUP BY stream' in bq_client.query_and_wait.call_args.args[0]
+
+
+def test_get_stream_tails_no_table(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    assert meta_backend.get_stream_tails() == {}
+    bq_client.query_and_wait.assert_not_called()
+
+
 def test_apply_operation(meta_backend: BigQueryMetaBackend, bq_client: Mock):
     schema = Schema(name=QualifiedName(database='test_project', schema_name='test_schema'))
     create_schema = CreateSchema(schema_object=schema)
-    bq_client.query_and_wait.return_value = Mock(num_dml_affected_rows=1)
+    drop_schema = DropSchema(schema_name=schema.name)
+    bq_client.query_and_wait.side_effect = [[Mock(idx=2, chain_digest='previous')], Mock(num_dml_affected_rows=1)]
 
-    meta_backend.apply_operation(create_schema)
+    meta_backend.apply_operation(create_schema, drop_schema)
 
-    bq_client.query_and_wait.assert_called_once()
+    assert bq_client.query_and_wait.call_count == 2
+    assert bq_client.query_and_wait.call_args_list[0].args[0] == (
+        'SELECT idx, chain_digest FROM `test_project.test_dataset.meta_table` ORDER BY idx DESC LIMIT 1'
+    )
 
     assert bq_client.query_and_wait.call_args.args[0] == (
-        f'INSERT INTO `test_project.test_dataset.meta_table` (idx, op_kind, op_data)\n'
-        f'VALUES (\n'
-        f'    (SELECT COALESCE(MAX(idx) + 1, 0) FROM `test_project.test_dataset.meta_table`),\n'
-        f'    @op_kind,\n'
-        f'    @op_data\n'
-        f')\n'
+        f'INSERT INTO `test_project.test_dataset.meta_table` '
+        f'(idx, op_kind, op_data, inverse_op, op_digest, chain_digest)\n'
+        f'VALUES\n'
+        f'    (3, @op_kind_0, @op_data_0, @inverse_op_0, @op_digest_0, @chain_digest_0)\n'
     )
 
     job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
 
     assert job_config.query_parameters == [
-        bq.ScalarQueryParameter('op_kind', 'STRING', 'create_schema'),
+        bq.ScalarQueryParameter('op_kind_0', 'STRING', 'create_schema'),
         bq.ScalarQueryParameter(
-            'op_data',
+            'op_data_0',
             'JSON',
             '{"schema_object":{"name":{"database":"test_project","schema_name":"test_schema"}}}',
         ),
+        bq.ScalarQueryParameter(
+            'inverse_op_0',
+            'JSON',
+            '{"kind": "drop_schema", "data": {"schema_name": {"database": "test_project", '
+            '"schema_name": "test_schema"}}}',
+        ),
+        bq.ScalarQueryParameter('op_digest_0', 'STRING', operation_digest(create_schema)),
+        bq.ScalarQueryParameter('chain_digest_0', 'STRING', chain_digest('previous', create_schema)),
     ]
 
 
+def test_apply_operation_no_inverse(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    schema = Schema(name=QualifiedName(database='test_project', schema_name='test_schema'))
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(CreateSchema(schema_object=schema))
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters[2] == bq.ScalarQueryParameter('inverse_op_0', 'JSON', None)
+
+
+def test_apply_operation_empty_table(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert '(0, @op_kind_0' in bq_client.query_and_wait.call_args.args[0]
+    assert job_config.query_parameters[4].value == prefix_digests([create_schema])[1]
+
+
+def test_apply_operation_legacy_rows(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    drop_schema = DropSchema(schema_name=create_schema.schema_object.name)
+
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+    bq_client.list_rows.return_value = [Mock(idx=0, op_kind='create_schema', op_data=create_schema.model_dump_json())]
+
+    bq_client.query_and_wait.side_effect = [
+        [Mock(idx=0, chain_digest=None)],
+        Mock(num_dml_affected_rows=1),
+    ]
+
+    meta_backend.apply_operation(drop_schema)
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert '(1, @op_kind_0' in bq_client.query_and_wait.call_args.args[0]
+    assert job_config.query_parameters[4].value == prefix_digests([create_schema, drop_schema])[2]
+
+
+def test_apply_operation_storage_write(bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    write_client = Mock()
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, write_client=write_client)
+    bq_client.query_and_wait.return_value = [Mock(idx=2, chain_digest='previous')]
+
+    meta_backend.apply_operation(create_schema)
+    meta_backend.apply_operation(create_schema)
+
+    # the last row is read once and no insert job runs
+    bq_client.query_and_wait.assert_called_once()
+    write_client.open_stream.assert_called_once()
+
+    append = write_client.open_stream.return_value.append
+
+    assert append.call_args_list[0].args[0] == [{
+        'idx': 3,
+        'op_kind': 'create_schema',
+        'op_data': '{"schema_object":{"name":{"database":"test_project","schema_name":"test_schema"}}}',
+        'op_data_zip': None,
+        'inverse_op': None,
+        'op_digest': operation_digest(create_schema),
+        'chain_digest': chain_digest('previous', create_schema),
+        'stream': None,
+    }]
+
+    assert append.call_args.args[0][0]['idx'] == 4
+
+
+def test_apply_operation_storage_write_unavailable(bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    write_client = Mock()
+    write_client.open_stream.side_effect = ServiceUnavailable('unavailable')
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, write_client=write_client)
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+
+    assert bq_client.query_and_wait.call_args.args[0].startswith('INSERT INTO')
+    assert meta_backend.write_client is None
+
+
+def test_apply_operation_storage_write_in_session(bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    write_client = Mock()
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, write_client=write_client)
+    bq_client.session_id = 'test_session'
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+
+    # appends are not part of the session transaction
+    assert bq_client.query_and_wait.call_args.args[0].startswith('INSERT INTO')
+    write_client.open_stream.assert_not_called()
+
+
+def test_apply_operation_compressed(bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, compress=True)
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        f'INSERT INTO `test_project.test_dataset.meta_table` '
+        f'(idx, op_kind, op_data_zip, inverse_op, op_digest, chain_digest, op_data)\n'
+        f'VALUES\n'
+        f"    (0, @op_kind_0, @op_data_zip_0, @inverse_op_0, @op_digest_0, @chain_digest_0, JSON 'null')\n"
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters[1].type_ == 'BYTES'
+    assert gzip.decompress(job_config.query_parameters[1].value).decode() == create_schema.model_dump_json(exclude_none=True)
+
+
+def test_initialize_compressed(bq_client: Mock):
+    BigQueryMetaBackend(bq_client, META_TABLE_NAME, compress=True).initialize()
+
+    sql = bq_client.query_and_wait.call_args.args[0]
+
+    assert '    chain_digest STRING,\n    op_data_zip BYTES\n)' in sql
+    assert 'ADD COLUMN IF NOT EXISTS chain_digest STRING,\nADD COLUMN IF NOT EXISTS op_data_zip BYTES;\n' in sql
+
+
+def test_read_compressed_rows(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(2)
+    ]
+
+    bq_client.has_table.return_value = True
+
+    bq_client.get_table.return_value = Mock(schema=[
+        bq.SchemaField('idx', 'INT64'),
+        bq.SchemaField('op_kind', 'STRING'),
+        bq.SchemaField('op_data', 'JSON'),
+        bq.SchemaField('op_data_zip', 'BYTES'),
+    ])
+
+    # rows written before compression was enabled are still read
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, op_kind='create_schema', op_data=operations[0].model_dump_json(), op_data_zip=None),
+        Mock(idx=1, op_kind='create_schema', op_data=None, op_data_zip=gzip.compress(operations[1].model_dump_json().encode())),
+    ]
+
+    assert meta_backend.get_applied_operations() == operations
+    assert [field.name for field in bq_client.list_rows.call_args.kwargs['selected_fields']] == ['idx', 'op_kind', 'op_data', 'op_data_zip']
+
+
+def test_unapply_operation_compressed(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('op_data_zip', 'BYTES')])
+    bq_client.query_and_wait.return_value = Mock(num_dml_affected_rows=1)
+
+    meta_backend.unapply_operation(create_schema)
+
+    assert (
+        '    AND (op_digest = @op_digest OR TO_JSON_STRING(op_data) = TO_JSON_STRING(@op_data))\n'
+        in bq_client.query_and_wait.call_args.args[0]
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters[-1] == bq.ScalarQueryParameter('op_digest', 'STRING', operation_digest(create_schema))
+
+
+def test_unapply_operation_compressed_changed_digest(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('op_data_zip', 'BYTES')])
+
+    # the row was written before a model field gained a default, so the delete matches neither its digest nor its data
+    op_data_zip = gzip.compress(create_schema.model_dump_json().encode())
+
+    bq_client.query_and_wait.side_effect = [
+        Mock(num_dml_affected_rows=0),
+        [Mock(idx=4, op_kind='create_schema', op_data=None, op_data_zip=op_data_zip)],
+        Mock(),
+    ]
+
+    meta_backend.unapply_operation(create_schema)
+
+    assert 'WHERE idx >= @first_idx;' in bq_client.query_and_wait.call_args.args[0]
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+
+    assert job_config.query_parameters == [
+        bq.ScalarQueryParameter('last_idx', 'INT64', 4),
+        bq.ScalarQueryParameter('first_idx', 'INT64', 4),
+    ]
+
+
+def test_unapply_operation_not_most_recent(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(2)
+    ]
+
+    bq_client.query_and_wait.side_effect = [
+        Mock(num_dml_affected_rows=0),
+        [Mock(idx=1, op_kind='create_schema', op_data=operations[1].model_dump_json())],
+    ]
+
+    with raises(ValueError):
+        meta_backend.unapply_operation(operations[0])
+
+    assert bq_client.query_and_wait.call_count == 2
+
+
+def test_apply_operation_batched(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, QualifiedName('test_project.test_dataset.meta_table'), batch_size=None)
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+    bq_client.query_and_wait.side_effect = [
+        [Mock(idx=4, chain_digest=EMPTY_DIGEST)],
+        Mock(num_dml_affected_rows=2),
+        Mock(num_dml_affected_rows=1),
+    ]
+
+    meta_backend.apply_operation(operations[0])
+    meta_backend.apply_operation(operations[1])
+    bq_client.query_and_wait.assert_not_called()
+
+    meta_backend.flush()
+
+    assert bq_client.query_and_wait.call_count == 2
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        f'INSERT INTO `test_project.test_dataset.meta_table` '
+        f'(idx, op_kind, op_data, inverse_op, op_digest, chain_digest)\n'
+        f'VALUES\n'
+        f'    (5, @op_kind_0, @op_data_0, @inverse_op_0, @op_digest_0, @chain_digest_0),\n'
+        f'    (6, @op_kind_1, @op_data_1, @inverse_op_1, @op_digest_1, @chain_digest_1)\n'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    digests = prefix_digests(operations)
+
+    assert [p.value for p in job_config.query_parameters if p.name.startswith('chain_digest')] == digests[1:3]
+
+    # flushing without buffered operations does not query
+    meta_backend.flush()
+    assert bq_client.query_and_wait.call_count == 2
+
+    # the next index and chain digest are only read once
+    meta_backend.apply_operation(operations[2])
+    meta_backend.flush()
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+
+    assert bq_client.query_and_wait.call_count == 3
+    assert '(7, @op_kind_0' in bq_client.query_and_wait.call_args.args[0]
+    assert job_config.query_parameters[4].value == digests[3]
+
+
+def test_apply_operation_batch_size(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, QualifiedName('test_project.test_dataset.meta_table'), batch_size=2)
+    schema = Schema(name=QualifiedName(database='test_project', schema_name='test_schema'))
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=2)]
+
+    meta_backend.apply_operation(CreateSchema(schema_object=schema))
+    bq_client.query_and_wait.assert_not_called()
+
+    meta_backend.apply_operation(CreateSchema(schema_object=schema))
+    assert bq_client.query_and_wait.call_count == 2
+    assert meta_backend.pending_operations == []
+
+
+def test_invalid_batch_size(bq_client: Mock):
+    with raises(ValueError):
+        BigQueryMetaBackend(bq_client, QualifiedName('test_project.test_dataset.meta_table'), batch_size=0)
+
+
+def test_get_applied_operations_flushes(bq_client: Mock):
+    meta_backend = BigQueryMetaBackend(bq_client, QualifiedName('test_project.test_dataset.meta_table'), batch_size=None)
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+    bq_client.list_rows.return_value = [Mock(idx=0, op_kind='create_schema', op_data=create_schema.model_dump_json())]
+
+    bq_client.query_and_wait.side_effect = [
+        [],
+        Mock(num_dml_affected_rows=1),
+    ]
+
+    meta_backend.apply_operation(create_schema)
+
+    assert meta_backend.get_applied_operations() == [create_schema]
+    assert bq_client.query_and_wait.call_count == 2
+
+
+def test_get_applied_digests(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[
+        bq.SchemaField('idx', 'INT64'),
+        bq.SchemaField('op_data', 'JSON'),
+        bq.SchemaField('chain_digest', 'STRING'),
+    ])
+
+    bq_client.list_rows.return_value = [Mock(idx=0, chain_digest='first'), Mock(idx=1, chain_digest='second')]
+
+    assert meta_backend.get_applied_digests() == ['first', 'second']
+    bq_client.query_and_wait.assert_not_called()
+
+    assert bq_client.list_rows.call_args.kwargs['selected_fields'] == [
+        bq.SchemaField('idx', 'INT64'),
+        bq.SchemaField('chain_digest', 'STRING'),
+    ]
+
+
+def test_get_applied_digests_legacy(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('op_data', 'JSON')])
+
+    assert meta_backend.get_applied_digests() is None
+
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('chain_digest', 'STRING')])
+    bq_client.list_rows.return_value = [Mock(idx=0, chain_digest=None), Mock(idx=1, chain_digest='second')]
+
+    assert meta_backend.get_applied_digests() is None
+
+
+def test_get_applied_digests_no_table(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    assert meta_backend.get_applied_digests() == []
+    bq_client.query_and_wait.assert_not_called()
+
+
+def test_get_applied_tail(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[])
+    bq_client.query_and_wait.return_value = [Mock(op_kind='create_schema', op_data=create_schema.model_dump_json())]
+
+    assert meta_backend.get_applied_tail(3) == [create_schema]
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        'SELECT op_kind, op_data FROM `test_project.test_dataset.meta_table` WHERE idx >= @start ORDER BY idx'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters == [bq.ScalarQueryParameter('start', 'INT64', 3)]
+
+
+def test_read_rows_in_idx_order(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('chain_digest', 'STRING')])
+    bq_client.list_rows.return_value = [Mock(idx=idx, chain_digest=str(idx)) for idx in [1, 0, 2, 5, 4]]
+
+    assert [row.idx for row in meta_backend.read_rows(['chain_digest'])] == [0, 1, 2, 4, 5]
+    assert bq_client.list_rows.call_args.kwargs['page_size'] == 1000
+    bq_client.query_and_wait.assert_not_called()
+
+
+def test_read_rows_in_session(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    bq_client.session_id = 'test_session'
+    bq_client.query_and_wait.return_value = [Mock(idx=0, chain_digest='first')]
+
+    assert [row.chain_digest for row in meta_backend.read_rows(['chain_digest'])] == ['first']
+    bq_client.list_rows.assert_not_called()
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters == [bq.ScalarQueryParameter('start', 'INT64', 0)]
+
+
+def test_get_applied_operations_decoded_json(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+
+    # the client library may return JSON columns already decoded
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, op_kind='create_schema', op_data=json.loads(create_schema.model_dump_json())),
+        Mock(idx=1, op_kind='create_schema', op_data=create_schema.model_dump_json()),
+    ]
+
+    assert meta_backend.get_applied_operations() == [create_schema, create_schema]
+
+
+def test_iter_applied_operations_parses_lazily(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, op_kind='create_schema', op_data=create_schema.model_dump_json()),
+        Mock(idx=1, op_kind='create_schema', op_data='not json'),
+    ]
+
+    with patch('liti.core.model.v1.parse.PARSE_CHUNK_SIZE', 1):
+        operations = meta_backend.iter_applied_operations()
+
+        # the row after the first chunk is not parsed until it is consumed
+        assert next(operations) == create_schema
+
+        with raises(ValidationError):
+            next(operations)
+
+
+def test_get_migration_plan_digests(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+    target = [*operations[:2], DropSchema(schema_name=operations[0].schema_object.name)]
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('chain_digest', 'STRING')])
+
+    bq_client.list_rows.return_value = [
+        Mock(idx=i, chain_digest=digest)
+        for i, digest in enumerate(prefix_digests(operations)[1:])
+    ]
+
+    bq_client.query_and_wait.return_value = [Mock(op_kind='create_schema', op_data=operations[2].model_dump_json())]
+
+    assert meta_backend.get_migration_plan(target) == {'down': [operations[2]], 'up': [target[2]]}
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters == [bq.ScalarQueryParameter('start', 'INT64', 2)]
+
+
+def test_get_migration_plan_legacy(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+    target = [*operations[:2], DropSchema(schema_name=operations[0].schema_object.name)]
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+
+    # the client library returns the JSON column decoded, its key order does not matter
+    bq_client.list_rows.return_value = [
+        Mock(idx=i, op_kind=op.KIND, op_data=dict(reversed(op.model_dump(mode='json', exclude_none=True).items())))
+        for i, op in enumerate(operations)
+    ]
+
+    bq_client.query_and_wait.return_value = [Mock(op_kind='create_schema', op_data=operations[2].model_dump_json())]
+
+    assert meta_backend.get_migration_plan(target) == {'down': [operations[2]], 'up': [target[2]]}
+
+    # only the divergent tail is parsed
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters == [bq.ScalarQueryParameter('start', 'INT64', 2)]
+
+
+def test_get_migration_plan_legacy_defaults(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    operations = [
+        CreateTable(table=Table(name=QualifiedName(f'test_project.test_dataset.table_{i}'), columns=[Column('id', INT64)]))
+        for i in range(2)
+    ]
+
+    def legacy_op_data(op: CreateTable) -> dict:
+        # written before the columns had a nullable field
+        op_data = op.model_dump(mode='json', exclude_none=True)
+
+        for column in op_data['table']['columns']:
+            del column['nullable']
+
+        return op_data
+
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('idx', 'INT64'), bq.SchemaField('op_data', 'JSON')])
+
+    bq_client.list_rows.return_value = [
+        Mock(idx=i, op_kind=op.KIND, op_data=legacy_op_data(op))
+        for i, op in enumerate(operations)
+    ]
+
+    bq_client.query_and_wait.return_value = [
+        Mock(op_kind=op.KIND, op_data=json.dumps(legacy_op_data(op)))
+        for op in operations
+    ]
+
+    assert meta_backend.get_migration_plan(operations) == {'down': [], 'up': []}
+
+
+def make_mirror_row(idx: int, operation: Operation, chain: str) -> dict:
+    return {
+        'idx': idx,
+        'op_kind': operation.KIND,
+        'op_data': operation.model_dump_json(exclude_none=True),
+        'inverse_op': None,
+        'chain_digest': chain,
+    }
+
+
+@fixture
+def mirror_operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+
+@fixture
+def mirror(tmp_path: Path, mirror_operations: list[Operation]) -> MetaMirror:
+    digests = prefix_digests(mirror_operations)
+    mirror = MetaMirror(tmp_path)
+    mirror.save(META_TABLE_NAME, [make_mirror_row(i, op, digests[i + 1]) for i, op in enumerate(mirror_operations[:2])])
+    return mirror
+
+
+@fixture
+def mirror_meta_backend(bq_client: Mock, mirror: MetaMirror) -> BigQueryMetaBackend:
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('chain_digest', 'STRING')])
+    return BigQueryMetaBackend(bq_client, META_TABLE_NAME, batch_size=None, mirror=mirror)
+
+
+def test_mirror_current(mirror_meta_backend: BigQueryMetaBackend, bq_client: Mock, mirror_operations: list[Operation]):
+    digests = prefix_digests(mirror_operations)
+    bq_client.query_and_wait.return_value = [Mock(idx=1, chain_digest=digests[2])]
+
+    assert mirror_meta_backend.get_applied_operations() == mirror_operations[:2]
+    assert mirror_meta_backend.get_inverse_operations() == [None, None]
+    assert mirror_meta_backend.get_applied_digests() == digests[1:3]
+    assert mirror_meta_backend.get_applied_tail(1) == mirror_operations[1:2]
+
+    # only the freshness check queries the table
+    bq_client.query_and_wait.assert_called_once()
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        'SELECT idx, chain_digest FROM `test_project.test_dataset.meta_table` ORDER BY idx DESC LIMIT 1'
+    )
+
+
+def test_mirror_fetches_new_rows(
+    mirror_meta_backend: BigQueryMetaBackend,
+    bq_client: Mock,
+    mirror: MetaMirror,
+    mirror_operations: list[Operation],
+):
+    digests = prefix_digests(mirror_operations)
+    rows = [make_mirror_row(i, op, digests[i + 1]) for i, op in enumerate(mirror_operations)]
+
+    bq_client.query_and_wait.side_effect = [
+        [Mock(idx=2, chain_digest=digests[3])],
+        [Mock(**row) for row in rows[1:]],
+    ]
+
+    assert mirror_meta_backend.get_applied_operations() == mirror_operations
+    assert mirror.load(META_TABLE_NAME) == rows
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+    assert job_config.query_parameters == [bq.ScalarQueryParameter('start', 'INT64', 1)]
+
+
+def test_mirror_diverged(
+    mirror_meta_backend: BigQueryMetaBackend,
+    bq_client: Mock,
+    mirror: MetaMirror,
+    mirror_operations: list[Operation],
+):
+    other_digests = prefix_digests(mirror_operations[1:])
+    rows = [make_mirror_row(i, op, other_digests[i + 1]) for i, op in enumerate(mirror_operations[1:])]
+
+    bq_client.query_and_wait.return_value = [Mock(idx=1, chain_digest=other_digests[2])]
+    bq_client.list_rows.return_value = [Mock(**row) for row in rows]
+
+    assert mirror_meta_backend.get_applied_operations() == mirror_operations[1:]
+    assert mirror.load(META_TABLE_NAME) == rows
+    assert bq_client.query_and_wait.call_count == 1
+
+
+def test_mirror_legacy_table(mirror_meta_backend: BigQueryMetaBackend, bq_client: Mock, mirror_operations: list[Operation]):
+    bq_client.query_and_wait.return_value = [Mock(idx=0, chain_digest=None)]
+
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, op_kind='create_schema', op_data=mirror_operations[0].model_dump_json()),
+    ]
+
+    assert mirror_meta_backend.get_applied_operations() == mirror_operations[:1]
+    assert mirror_meta_backend.mirror_rows is None
+
+
+def test_mirror_legacy_rows(
+    mirror_meta_backend: BigQueryMetaBackend,
+    bq_client: Mock,
+    mirror: MetaMirror,
+    mirror_operations: list[Operation],
+):
+    # the first row was applied before digests were stored, the second after the table was upgraded
+    digests = prefix_digests(mirror_operations)
+    rows = [make_mirror_row(0, mirror_operations[0], None), make_mirror_row(1, mirror_operations[1], digests[2])]
+    mirror.save(META_TABLE_NAME, rows)
+    bq_client.query_and_wait.return_value = [Mock(idx=1, chain_digest=digests[2])]
+
+    assert mirror_meta_backend.get_applied_digests() is None
+    assert mirror_meta_backend.get_migration_plan(mirror_operations[:2]) == {'down': [], 'up': []}
+
+
+def test_mirror_writes(
+    mirror_meta_backend: BigQueryMetaBackend,
+    bq_client: Mock,
+    mirror: MetaMirror,
+    mirror_operations: list[Operation],
+):
+    digests = prefix_digests(mirror_operations)
+
+    bq_client.query_and_wait.side_effect = [
+        [Mock(idx=1, chain_digest=digests[2])],
+        Mock(num_dml_affected_rows=1),
+        Mock(num_dml_affected_rows=1),
+    ]
+
+    mirror_meta_backend.get_applied_operations()
+    mirror_meta_backend.apply_operation(mirror_operations[2])
+    mirror_meta_backend.flush()
+
+    # the next index and chain digest come from the mirror
+    assert bq_client.query_and_wait.call_count == 2
+    assert '(2, @op_kind_0' in bq_client.query_and_wait.call_args.args[0]
+    assert mirror.load(META_TABLE_NAME) == [make_mirror_row(i, op, digests[i + 1]) for i, op in enumerate(mirror_operations)]
+
+    mirror_meta_backend.unapply_operation(mirror_operations[2])
+    mirror_meta_backend.flush()
+
+    assert mirror.load(META_TABLE_NAME) == [
+        make_mirror_row(i, op, digests[i + 1]) for i, op in enumerate(mirror_operations[:2])
+    ]
+
+
+def test_unapply_operations_batched(bq_client: Mock):
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, batch_size=None)
+
+    for op in reversed(operations[1:]):
+        meta_backend.unapply_operation(op)
+
+    bq_client.query_and_wait.assert_not_called()
+    bq_client.query_and_wait.return_value = [Mock(deleted=2)]
+    meta_backend.flush()
+    bq_client.query_and_wait.assert_called_once()
+
+    assert bq_client.query_and_wait.call_args.args[0] == (
+        'DECLARE last_idx INT64;\n'
+        'DECLARE deleted INT64;\n'
+        '\n'
+        'BEGIN TRANSACTION;\n'
+        '\n'
+        'SET last_idx = (SELECT MAX(idx) FROM `test_project.test_dataset.meta_table`);\n'
+        '\n'
+        'DELETE FROM `test_project.test_dataset.meta_table`\n'
+        'WHERE (\n'
+        '    (idx = last_idx - 0 AND op_kind = @op_kind_0 AND TO_JSON_STRING(op_data) = TO_JSON_STRING(@op_data_0))\n'
+        '    OR (idx = last_idx - 1 AND op_kind = @op_kind_1 AND TO_JSON_STRING(op_data) = TO_JSON_STRING(@op_data_1))\n'
+        ');\n'
+        '\n'
+        'SET deleted = @@row_count;\n'
+        '\n'
+        'IF deleted = @count THEN\n'
+        '    COMMIT TRANSACTION;\n'
+        'ELSE\n'
+        '    ROLLBACK TRANSACTION;\n'
+        'END IF;\n'
+        '\n'
+        'SELECT deleted;\n'
+    )
+
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+
+    assert job_config.query_parameters[:3] == [
+        bq.ScalarQueryParameter('count', 'INT64', 2),
+        bq.ScalarQueryParameter('op_kind_0', 'STRING', 'create_schema'),
+        bq.ScalarQueryParameter('op_data_0', 'JSON', operations[2].model_dump_json(exclude_none=True)),
+    ]
+
+    assert meta_backend.pending_unapplied == []
+
+
+def test_unapply_operation_flushes_applied(bq_client: Mock):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='test_schema')))
+    meta_backend = BigQueryMetaBackend(bq_client, META_TABLE_NAME, batch_size=None)
+    bq_client.query_and_wait.side_effect = [[], Mock(num_dml_affected_rows=1), Mock(num_dml_affected_rows=1)]
+
+    meta_backend.apply_operation(create_schema)
+    meta_backend.unapply_operation(create_schema)
+    meta_backend.flush()
+
+    # the insert is written before the delete
+    assert bq_client.query_and_wait.call_args_list[1].args[0].startswith('INSERT INTO')
+    assert bq_client.query_and_wait.call_args_list[2].args[0].startswith('DELETE FROM')
+
+
+def test_get_inverse_operations(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    schema_name = QualifiedName(database='test_project', schema_name='test_schema')
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('inverse_op', 'JSON')])
+
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, inverse_op=json.dumps(DropSchema(schema_name=schema_name).to_op_data(format='json'))),
+        Mock(idx=1, inverse_op=None),
+    ]
+
+    assert meta_backend.get_inverse_operations() == [DropSchema(schema_name=schema_name), None]
+    bq_client.query_and_wait.assert_not_called()
+
+
+def test_get_inverse_operations_legacy_table(meta_backend: BigQueryMetaBackend, bq_client: Mock):
+    schema = Schema(name=QualifiedName(database='test_project', schema_name='test_schema'))
+    bq_client.has_table.return_value = True
+    bq_client.get_table.return_value = Mock(schema=[bq.SchemaField('op_data', 'JSON')])
+    bq_client.list_rows.return_value = [
+        Mock(idx=0, op_kind='create_schema', op_data=CreateSchema(schema_object=schema).model_dump_json()),
+    ]
+
+    assert meta_backend.get_inverse_operations() == [None]
+
+
+def test_compact(mirror_meta_backend: BigQueryMetaBackend, bq_client: Mock, mirror: MetaMirror):
+    baseline = Baseline(operation_count=3, digest='digest', catalog={})
+    mirror_meta_backend.mirror_rows = []
+
+    mirror_meta_backend.compact(baseline)
+
+    sql = bq_client.query_and_wait.call_args.args[0]
+    job_config: bq.QueryJobConfig = bq_client.query_and_wait.call_args.kwargs['job_config']
+
+    assert sql.startswith('DECLARE last_idx INT64;\n\nBEGIN TRANSACTION;')
+    assert 'SELECT MIN(idx) FROM `test_project.test_dataset.meta_table` WHERE chain_digest = @digest' in sql
+    assert 'UPDATE `test_project.test_dataset.meta_table` SET idx = idx - last_idx WHERE TRUE;' in sql
+    assert job_config.query_parameters[0] == bq.ScalarQueryParameter('digest', 'STRING', 'digest')
+    assert job_config.query_parameters[3] == bq.ScalarQueryParameter('op_digest', 'STRING', operation_digest(baseline))
+    assert mirror_meta_backend.mirror_rows is None
+    assert mirror_meta_backend.next_idx is None
+    assert mirror.load(META_TABLE_NAME) == []
+
+
 def test_unapply_operation(meta_backend: BigQueryMetaBackend, bq_client: Mock):
     schema = Schema(name=QualifiedName(database='test_project', schema_name='test_schema'))
     create_schema = CreateSchema(schema_object=schema)
@@ -0,0 +1,67 @@
+from pytest import fixture
+
+from liti.core.backend.cache import CachedMetaBackend
+from liti.core.backend.memory import MemoryMetaBackend
+from liti.core.model.v1.operation.data.table import CreateSchema, DropSchema
+from liti.core.model.v1.schema import QualifiedName, Schema
+
+SCHEMA_NAME = QualifiedName('my_project.my_dataset')
+OTHER_NAME = QualifiedName('my_project.other_dataset')
+
+
+@fixture
+def meta_backend() -> MemoryMetaBackend:
+    return MemoryMetaBackend([CreateSchema(schema_object=Schema(name=SCHEMA_NAME))])
+
+
+def test_loads_once(meta_backend: MemoryMetaBackend):
+    cache = CachedMetaBackend(meta_backend)
+
+    assert cache.get_applied_operations() == meta_backend.applied_operations
+    assert cache.get_applied_operations() == meta_backend.applied_operations
+    assert cache.get_previous_operations() == []
+    assert cache.get_inverse_operations() == [None]
+    assert cache.get_inverse_operations() == [None]
+
+    assert cache.misses == 2
+    assert cache.hits == 3
+
+
+def test_writes_keep_cache_current(meta_backend: MemoryMetaBackend):
+    cache = CachedMetaBackend(meta_backend)
+    create_other = CreateSchema(schema_object=Schema(name=OTHER_NAME))
+    drop_other = DropSchema(schema_name=OTHER_NAME)
+
+    cache.get_applied_operations()
+    cache.get_inverse_operations()
+    cache.apply_operation(create_other, drop_other)
+
+    assert meta_backend.applied_operations[-1] == create_other
+    assert cache.get_applied_operations() == meta_backend.applied_operations
+    assert cache.get_inverse_operations() == [None, drop_other]
+
+    cache.unapply_operation(create_other)
+
+    assert cache.get_applied_operations() == meta_backend.applied_operations
+    assert cache.get_inverse_operations() == [None]
+    assert cache.misses == 2
+
+
+def test_reads_return_copies(meta_backend: MemoryMetaBackend):
+    cache = CachedMetaBackend(meta_backend)
+    cache.get_applied_operations().clear()
+
+    assert cache.get_applied_operations() == meta_backend.applied_operations
+
+
+def test_invalidate(meta_backend: MemoryMetaBackend):
+    cache = CachedMetaBackend(meta_backend)
+    cache.get_applied_operations()
+    meta_backend.applied_operations.append(CreateSchema(schema_object=Schema(name=OTHER_NAME)))
+
+    assert len(cache.get_applied_operations()) == 1
+
+    cache.invalidate()
+
+    assert len(cache.get_applied_operations()) == 2
+    assert cache.misses == 2
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+from pytest import fixture, raises
+
+from liti.core.backend.file import FileMetaBackend, INDEX_RECORD
+from liti.core.digest import prefix_digests
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.table import CreateSchema, DropSchema
+from liti.core.model.v1.schema import QualifiedName, Schema
+
+
+@fixture
+def operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+
+@fixture
+def meta_backend(tmp_path: Path, operations: list[Operation]) -> FileMetaBackend:
+    meta_backend = FileMetaBackend(tmp_path / 'meta' / 'my_app.jsonl')
+    meta_backend.initialize()
+
+    for op in operations:
+        meta_backend.apply_operation(op, DropSchema(schema_name=op.schema_object.name))
+
+    return meta_backend
+
+
+def test_missing_files(tmp_path: Path):
+    meta_backend = FileMetaBackend(tmp_path / 'my_app.jsonl')
+
+    assert meta_backend.get_applied_operations() == []
+    assert meta_backend.get_applied_digests() == []
+
+
+def test_apply_operation(meta_backend: FileMetaBackend, operations: list[Operation]):
+    assert meta_backend.get_applied_operations() == operations
+    assert meta_backend.get_applied_digests() == prefix_digests(operations)[1:]
+
+    assert meta_backend.get_inverse_operations() == [
+        DropSchema(schema_name=op.schema_object.name)
+        for op in operations
+    ]
+
+    # a new instance reads what the previous one wrote
+    assert FileMetaBackend(meta_backend.path).get_applied_operations() == operations
+
+
+def test_apply_operation_no_inverse(meta_backend: FileMetaBackend, operations: list[Operation]):
+    create_schema = CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name='other')))
+    meta_backend.apply_operation(create_schema)
+
+    assert meta_backend.get_applied_operations() == [*operations, create_schema]
+    assert meta_backend.get_inverse_operations()[-1] is None
+
+
+def test_get_applied_tail(meta_backend: FileMetaBackend, operations: list[Operation]):
+    assert meta_backend.get_applied_tail(1) == operations[1:]
+    assert meta_backend.get_applied_tail(3) == []
+
+
+def test_get_migration_plan(meta_backend: FileMetaBackend, operations: list[Operation]):
+    target = [*operations[:2], DropSchema(schema_name=operations[0].schema_object.name)]
+    assert meta_backend.get_migration_plan(target) == {'down': [operations[2]], 'up': [target[2]]}
+
+
+def test_unapply_operation(meta_backend: FileMetaBackend, operations: list[Operation]):
+    meta_backend.unapply_operation(operations[2])
+
+    assert meta_backend.get_applied_operations() == operations[:2]
+    assert meta_backend.get_applied_digests() == prefix_digests(operations[:2])[1:]
+
+    meta_backend.apply_operation(operations[2])
+    assert meta_backend.get_applied_operations() == operations
+
+
+def test_unapply_operation_not_most_recent(meta_backend: FileMetaBackend, operations: list[Operation]):
+    with raises(AssertionError):
+        meta_backend.unapply_operation(operations[1])
+
+    assert meta_backend.get_applied_operations() == operations
+
+
+def test_recover_interrupted_append(meta_backend: FileMetaBackend, operations: list[Operation]):
+    # the log was written but the index was not
+    with open(meta_backend.path, 'ab') as f:
+        f.write(b'{"op_kind":"create_schema"')
+
+    with open(meta_backend.index_path, 'ab') as f:
+        f.write(INDEX_RECORD.pack(0, bytes(32))[:10])
+
+    recovered = FileMetaBackend(meta_backend.path)
+
+    assert recovered.get_applied_operations() == operations
+    assert meta_backend.index_path.stat().st_size == len(operations) * INDEX_RECORD.size
+    assert meta_backend.path.read_bytes().endswith(b'}\n')
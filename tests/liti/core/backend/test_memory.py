@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from pytest import fixture, raises
+
+from liti.core.backend.memory import MemoryDbBackend
+from liti.core.function import replay
+from liti.core.model.v1.datatype import BOOL, INT64, STRING, Struct
+from liti.core.model.v1.operation.data.column import AddColumn, DropColumn, SetColumnDescription
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, DropTable, RenameTable, SetDescription
+from liti.core.model.v1.schema import Column, ColumnName, FieldPath, ForeignKey, ForeignReference, Identifier, \
+    Partitioning, QualifiedName, Schema, Table
+
+SCHEMA_NAME = QualifiedName('my_project.my_dataset')
+TABLE_NAME = QualifiedName('my_project.my_dataset.my_table')
+OTHER_NAME = QualifiedName('my_project.my_dataset.other_table')
+
+
+def make_table(name: QualifiedName) -> Table:
+    return Table(
+        name=name,
+        columns=[
+            Column('col_bool', BOOL),
+            Column('col_struct', Struct(fields={'field_int': INT64})),
+        ],
+        partitioning=Partitioning(kind='TIME', column=ColumnName('col_date'), time_unit='DAY'),
+    )
+
+
+@fixture
+def db_backend() -> MemoryDbBackend:
+    db_backend = MemoryDbBackend()
+    db_backend.create_schema(Schema(name=SCHEMA_NAME))
+    db_backend.create_table(make_table(TABLE_NAME))
+    db_backend.create_table(make_table(OTHER_NAME))
+    return db_backend
+
+
+def test_fork_shares_unchanged_entities(db_backend: MemoryDbBackend):
+    fork = db_backend.fork()
+    fork.set_description(TABLE_NAME, 'forked')
+
+    assert fork.get_table(TABLE_NAME).description == 'forked'
+    assert db_backend.get_table(TABLE_NAME).description is None
+    assert fork.get_table(OTHER_NAME) is db_backend.get_table(OTHER_NAME)
+    assert fork.get_schema(SCHEMA_NAME) is db_backend.get_schema(SCHEMA_NAME)
+
+
+def test_fork_shares_unchanged_columns(db_backend: MemoryDbBackend):
+    fork = db_backend.fork()
+    fork.set_column_description(TABLE_NAME, ColumnName('col_bool'), 'forked')
+
+    forked_columns = fork.get_table(TABLE_NAME).column_map
+    original_columns = db_backend.get_table(TABLE_NAME).column_map
+
+    assert forked_columns[ColumnName('col_bool')].description == 'forked'
+    assert original_columns[ColumnName('col_bool')].description is None
+    assert forked_columns[ColumnName('col_struct')] is original_columns[ColumnName('col_struct')]
+
+
+def test_fork_isolates_mutations(db_backend: MemoryDbBackend):
+    expected = db_backend.dump_catalog()
+    fork = db_backend.fork()
+
+    fork.set_description(SCHEMA_NAME, 'forked')
+    fork.add_column(TABLE_NAME, Column('col_string', STRING))
+    fork.drop_column(TABLE_NAME, ColumnName('col_bool'))
+    fork.add_column_field(TABLE_NAME, FieldPath('col_struct.field_bool'), BOOL)
+    fork.drop_column_field(TABLE_NAME, FieldPath('col_struct.field_int'))
+    fork.set_partition_expiration(TABLE_NAME, timedelta(days=1))
+    fork.set_require_partition_filter(TABLE_NAME, True)
+
+    fork.add_foreign_key(TABLE_NAME, ForeignKey(
+        foreign_table_name=OTHER_NAME,
+        references=[ForeignReference(
+            local_column_name=ColumnName('col_string'),
+            foreign_column_name=ColumnName('col_bool'),
+        )],
+    ))
+
+    fork.rename_table(OTHER_NAME, Identifier('renamed_table'))
+    fork.drop_table(QualifiedName('my_project.my_dataset.renamed_table'))
+
+    assert db_backend.dump_catalog() == expected
+    assert fork.get_schema(SCHEMA_NAME).description == 'forked'
+    assert fork.get_table(OTHER_NAME) is None
+
+    assert fork.get_table(TABLE_NAME).columns == [
+        Column('col_struct', Struct(fields={'field_bool': BOOL})),
+        Column('col_string', STRING),
+    ]
+
+
+def test_original_mutations_do_not_affect_fork(db_backend: MemoryDbBackend):
+    fork = db_backend.fork()
+    expected = fork.dump_catalog()
+
+    db_backend.set_column_nullable(TABLE_NAME, ColumnName('col_bool'), True)
+    db_backend.drop_schema(SCHEMA_NAME)
+
+    assert fork.dump_catalog() == expected
+
+
+def test_create_does_not_mutate_input():
+    table = make_table(TABLE_NAME)
+    db_backend = MemoryDbBackend()
+    db_backend.create_table(table)
+
+    db_backend.set_description(TABLE_NAME, 'mutated')
+    db_backend.set_column_description(TABLE_NAME, ColumnName('col_bool'), 'mutated')
+
+    assert table == make_table(TABLE_NAME)
+
+
+def test_state_at():
+    renamed_name = QualifiedName('my_project.my_dataset.renamed_table')
+
+    operations = [
+        CreateSchema(schema_object=Schema(name=SCHEMA_NAME)),
+        CreateTable(table=make_table(TABLE_NAME)),
+        SetDescription(entity_name=TABLE_NAME, description='first'),
+        AddColumn(table_name=TABLE_NAME, column=Column('col_string', STRING)),
+        SetColumnDescription(table_name=TABLE_NAME, column_name=ColumnName('col_string'), description='string'),
+        DropColumn(table_name=TABLE_NAME, column_name=ColumnName('col_bool')),
+        RenameTable(from_name=TABLE_NAME, to_name=Identifier('renamed_table')),
+        SetDescription(entity_name=renamed_name, description='second'),
+        DropTable(table_name=renamed_name),
+    ]
+
+    expected = []
+
+    for index in range(len(operations) + 1):
+        sim_db = MemoryDbBackend()
+        replay(sim_db, operations[:index])
+        expected.append(sim_db.dump_catalog())
+
+    db_backend = MemoryDbBackend(undo=True)
+    replay(db_backend, operations)
+
+    assert db_backend.operation_count == len(operations)
+
+    for index in range(len(operations) + 1):
+        assert db_backend.state_at(index).dump_catalog() == expected[index]
+
+    # stepping backward leaves the database untouched
+    assert db_backend.dump_catalog() == expected[-1]
+    assert db_backend.operation_count == len(operations)
+
+
+def test_undo():
+    db_backend = MemoryDbBackend(undo=True)
+    db_backend.create_table(make_table(TABLE_NAME))
+    expected = db_backend.dump_catalog()
+
+    replay(db_backend, [
+        SetDescription(entity_name=TABLE_NAME, description='first'),
+        SetColumnDescription(table_name=TABLE_NAME, column_name=ColumnName('col_bool'), description='bool'),
+    ])
+
+    db_backend.undo()
+    assert db_backend.get_table(TABLE_NAME).description == 'first'
+    assert db_backend.get_table(TABLE_NAME).column_map[ColumnName('col_bool')].description is None
+
+    db_backend.undo()
+    assert db_backend.dump_catalog() == expected
+    assert db_backend.operation_count == 0
+
+    with raises(ValueError):
+        db_backend.undo()
+
+
+def test_state_at_requires_undo_log(db_backend: MemoryDbBackend):
+    with raises(ValueError):
+        db_backend.state_at(0)
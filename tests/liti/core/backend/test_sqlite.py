@@ -0,0 +1,106 @@
+from pathlib import Path
+
+from pytest import fixture, raises
+
+from liti.core.backend.sqlite import SqliteMetaBackend
+from liti.core.digest import prefix_digests
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.table import CreateSchema, DropSchema
+from liti.core.model.v1.schema import QualifiedName, Schema
+
+
+@fixture
+def operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=QualifiedName(database='test_project', schema_name=f'test_schema_{i}')))
+        for i in range(3)
+    ]
+
+
+@fixture
+def meta_backend(tmp_path: Path, operations: list[Operation]) -> SqliteMetaBackend:
+    meta_backend = SqliteMetaBackend(tmp_path / 'meta.db')
+    meta_backend.initialize()
+
+    for op in operations:
+        meta_backend.apply_operation(op, DropSchema(schema_name=op.schema_object.name))
+
+    yield meta_backend
+    meta_backend.close()
+
+
+def test_missing_table(tmp_path: Path):
+    meta_backend = SqliteMetaBackend(tmp_path / 'meta.db')
+
+    assert meta_backend.get_applied_operations() == []
+    assert meta_backend.get_applied_digests() == []
+
+
+def test_initialize(meta_backend: SqliteMetaBackend):
+    connection = meta_backend.connect()
+
+    assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert ('liti_metadata_chain_digest',) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+
+    # initializing again keeps the rows
+    meta_backend.initialize()
+    assert len(meta_backend.get_applied_operations()) == 3
+
+
+def test_apply_operation(meta_backend: SqliteMetaBackend, operations: list[Operation]):
+    assert meta_backend.get_applied_operations() == operations
+    assert meta_backend.get_applied_digests() == prefix_digests(operations)[1:]
+    assert meta_backend.get_applied_tail(2) == operations[2:]
+
+    assert meta_backend.get_inverse_operations() == [
+        DropSchema(schema_name=op.schema_object.name)
+        for op in operations
+    ]
+
+
+def test_apply_operation_batched(tmp_path: Path, operations: list[Operation]):
+    meta_backend = SqliteMetaBackend(tmp_path / 'meta.db', batch_size=None)
+    meta_backend.initialize()
+
+    for op in operations:
+        meta_backend.apply_operation(op)
+
+    other = SqliteMetaBackend(tmp_path / 'meta.db')
+    assert other.get_applied_operations() == []
+
+    meta_backend.flush()
+    assert other.get_applied_operations() == operations
+    assert other.get_inverse_operations() == [None, None, None]
+
+
+def test_invalid_batch_size(tmp_path: Path):
+    with raises(ValueError):
+        SqliteMetaBackend(tmp_path / 'meta.db', batch_size=0)
+
+
+def test_unapply_operation(meta_backend: SqliteMetaBackend, operations: list[Operation]):
+    meta_backend.unapply_operation(operations[2])
+
+    assert meta_backend.get_applied_operations() == operations[:2]
+    assert meta_backend.get_applied_digests() == prefix_digests(operations[:2])[1:]
+
+
+def test_unapply_operation_not_most_recent(meta_backend: SqliteMetaBackend, operations: list[Operation]):
+    with raises(ValueError):
+        meta_backend.unapply_operation(operations[1])
+
+    assert meta_backend.get_applied_operations() == operations
+
+
+def test_unapply_operation_changed_digest(meta_backend: SqliteMetaBackend, operations: list[Operation]):
+    # rows stored before a model field gained a default have another digest
+    meta_backend.connect().execute("UPDATE liti_metadata SET op_digest = 'stale' WHERE idx = 2")
+
+    meta_backend.unapply_operation(operations[2])
+
+    assert meta_backend.get_applied_operations() == operations[:2]
+
+
+def test_get_migration_plan(meta_backend: SqliteMetaBackend, operations: list[Operation]):
+    target = [*operations[:2], DropSchema(schema_name=operations[0].schema_object.name)]
+    assert meta_backend.get_migration_plan(target) == {'down': [operations[2]], 'up': [target[2]]}
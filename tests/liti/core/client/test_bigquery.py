@@ -0,0 +1,81 @@
+from unittest.mock import Mock
+
+from google.api_core.exceptions import NotFound
+from pytest import fixture
+
+from liti import bigquery as bq
+from liti.core.client.bigquery import BqClient
+
+DATASET_REF = bq.DatasetReference('test_project', 'test_dataset')
+
+
+def make_item(table_id: str, table_type: str) -> bq.TableListItem:
+    return bq.TableListItem({
+        'tableReference': {'projectId': 'test_project', 'datasetId': 'test_dataset', 'tableId': table_id},
+        'type': table_type,
+    })
+
+
+def make_table(table_id: str, table_type: str) -> bq.Table:
+    bq_table = bq.Table(f'test_project.test_dataset.{table_id}')
+    bq_table._properties['type'] = table_type
+    return bq_table
+
+
+@fixture
+def google_client() -> Mock:
+    return Mock()
+
+
+@fixture
+def client(google_client: Mock) -> BqClient:
+    return BqClient(google_client)
+
+
+def test_direct_lookup(client: BqClient, google_client: Mock):
+    google_client.get_table.side_effect = [make_table('my_view', 'VIEW'), NotFound('missing')]
+
+    assert client.has_view(DATASET_REF.table('my_view'))
+    assert not client.has_table(DATASET_REF.table('missing'))
+    google_client.list_tables.assert_not_called()
+
+
+def test_cached_listing(client: BqClient, google_client: Mock):
+    google_client.list_tables.return_value = iter([make_item('my_table', 'TABLE'), make_item('my_view', 'VIEW')])
+
+    assert [item.table_id for item in client.list_tables(DATASET_REF)] == ['my_table', 'my_view']
+    assert client.has_table(DATASET_REF.table('my_table'))
+    assert client.has_view(DATASET_REF.table('my_view'))
+    assert not client.has_materialized_view(DATASET_REF.table('my_view'))
+    assert client.find_table(DATASET_REF.table('missing')) is None
+    google_client.get_table.assert_not_called()
+
+
+def test_cached_listing_changes(client: BqClient, google_client: Mock):
+    google_client.list_tables.return_value = iter([make_item('my_table', 'TABLE')])
+    client.list_tables(DATASET_REF)
+
+    client.delete_table(DATASET_REF.table('my_table'))
+    client.set_table_type(DATASET_REF.table('my_view'), 'VIEW')
+
+    assert not client.has_table(DATASET_REF.table('my_table'))
+    assert client.has_view(DATASET_REF.table('my_view'))
+
+    client.delete_dataset(DATASET_REF)
+    google_client.get_table.side_effect = NotFound('missing')
+
+    # listings of deleted datasets are forgotten
+    assert not client.has_view(DATASET_REF.table('my_view'))
+    google_client.get_table.assert_called_once()
+
+
+def test_clear_table_types(client: BqClient, google_client: Mock):
+    google_client.list_tables.return_value = iter([make_item('my_table', 'TABLE')])
+    client.list_tables(DATASET_REF)
+
+    client.clear_table_types()
+    google_client.get_table.return_value = make_table('my_view', 'VIEW')
+
+    # relations created outside the client are found once the listings are forgotten
+    assert client.has_view(DATASET_REF.table('my_view'))
+    google_client.get_table.assert_called_once_with(DATASET_REF.table('my_view'))
@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from google.api_core.exceptions import NotFound
+from pytest import mark, raises
+
+from liti import bigquery as bq
+from liti.core.backend.bigquery import to_liti_relation
+from liti.core.client.bigquery import BqClient
+from liti.core.client.bigquery_catalog import option_value, to_field_resource, to_table_resources
+from liti.core.model.v1.datatype import Array, BOOL, INT64, Numeric, Range, String, Struct, TIMESTAMP
+from liti.core.model.v1.schema import Column, Partitioning, PrimaryKey, QualifiedName, Table, View
+
+DATASET_REF = bq.DatasetReference('test_project', 'test_dataset')
+
+
+def relation_row(
+    table_name: str,
+    table_type: str = 'BASE TABLE',
+    partition_by: str | None = None,
+    view_definition: str | None = None,
+) -> Mock:
+    return Mock(table_name=table_name, table_type=table_type, partition_by=partition_by, view_definition=view_definition)
+
+
+def column_row(
+    table_name: str,
+    column_name: str,
+    data_type: str,
+    is_nullable: str = 'YES',
+    column_default: str = 'NULL',
+    rounding_mode: str | None = None,
+    clustering_ordinal_position: int | None = None,
+    description: str | None = None,
+) -> Mock:
+    return Mock(
+        table_name=table_name,
+        column_name=column_name,
+        data_type=data_type,
+        is_nullable=is_nullable,
+        column_default=column_default,
+        rounding_mode=rounding_mode,
+        clustering_ordinal_position=clustering_ordinal_position,
+        description=description,
+    )
+
+
+def option_row(table_name: str, option_name: str, value: str) -> Mock:
+    return Mock(table_name=table_name, option_name=option_name, option_value=value)
+
+
+def constraint_row(table_name: str, constraint_type: str, column_name: str) -> Mock:
+    return Mock(table_name=table_name, constraint_type=constraint_type, column_name=column_name)
+
+
+@mark.parametrize(
+    'data_type, expected',
+    [
+        ['BOOL', {'name': 'col', 'type': 'BOOL'}],
+        ['NUMERIC(10, 2)', {'name': 'col', 'type': 'NUMERIC', 'precision': '10', 'scale': '2'}],
+        ['STRING(16)', {'name': 'col', 'type': 'STRING', 'maxLength': '16'}],
+        ['RANGE<DATE>', {'name': 'col', 'type': 'RANGE', 'rangeElementType': {'type': 'DATE'}}],
+        ['ARRAY<INT64>', {'name': 'col', 'type': 'INT64', 'mode': 'REPEATED'}],
+        [
+            'ARRAY<STRUCT<a INT64 NOT NULL, `b c` ARRAY<STRING>>>',
+            {
+                'name': 'col',
+                'type': 'RECORD',
+                'mode': 'REPEATED',
+                'fields': [
+                    {'name': 'a', 'type': 'INT64', 'mode': 'REQUIRED'},
+                    {'name': 'b c', 'type': 'STRING', 'mode': 'REPEATED'},
+                ],
+            },
+        ],
+    ],
+)
+def test_to_field_resource(data_type, expected):
+    assert to_field_resource('col', data_type) == expected
+
+
+@mark.parametrize('data_type', ['ARRAY<INT64', 'STRUCT<a INT64 COLLATE \'und:ci\'>', 'INT64(4)', 'STRING(1, 2)'])
+def test_to_field_resource_invalid(data_type):
+    with raises(ValueError):
+        to_field_resource('col', data_type)
+
+
+@mark.parametrize(
+    'value, expected',
+    [
+        ['"say \\"hi\\"\\n"', 'say "hi"\n'],
+        ['[STRUCT("env", "prod"), STRUCT("team", "data")]', {'env': 'prod', 'team': 'data'}],
+        ['TIMESTAMP "2030-01-02T03:04:05.000Z"', datetime(2030, 1, 2, 3, 4, 5, tzinfo=timezone.utc)],
+        ['true', True],
+        ['7.5', 7.5],
+    ],
+)
+def test_option_value(value, expected):
+    assert option_value(value) == expected
+
+
+def test_to_table_resources():
+    resources = to_table_resources(
+        DATASET_REF,
+        relations=[
+            relation_row('events', partition_by='TIMESTAMP_TRUNC(`ts`, HOUR)'),
+            relation_row('ranges', partition_by='RANGE_BUCKET(id, GENERATE_ARRAY(0, 100, 10))'),
+            relation_row('my_view', 'VIEW', view_definition='SELECT 1 AS one'),
+            relation_row('my_mview', 'MATERIALIZED VIEW'),
+            relation_row('child', partition_by='_PARTITIONDATE'),
+            relation_row('external', 'EXTERNAL'),
+        ],
+        columns=[
+            column_row('events', 'id', 'INT64', is_nullable='NO', clustering_ordinal_position=1),
+            column_row('events', 'ts', 'TIMESTAMP', column_default='CURRENT_TIMESTAMP()'),
+            column_row('events', 'amount', 'NUMERIC(10, 2)', rounding_mode='ROUND_HALF_EVEN', description='in cents'),
+            column_row('ranges', 'id', 'INT64'),
+            column_row('my_view', 'one', 'INT64'),
+            column_row('child', 'parent_id', 'INT64'),
+        ],
+        options=[
+            option_row('events', 'description', '"All events"'),
+            option_row('events', 'labels', '[STRUCT("env", "prod")]'),
+            option_row('events', 'partition_expiration_days', '7.0'),
+            option_row('events', 'require_partition_filter', 'true'),
+        ],
+        constraints=[
+            constraint_row('events', 'PRIMARY KEY', 'id'),
+            constraint_row('child', 'FOREIGN KEY', 'parent_id'),
+        ],
+    )
+
+    # materialized views and foreign keys are fetched with the API, external tables have no liti model
+    assert resources['my_mview'] is None
+    assert resources['child'] is None
+    assert 'external' not in resources
+
+    relations = {name: to_liti_relation(bq.Table.from_api_repr(r)) for name, r in resources.items() if r}
+
+    assert relations['events'] == Table(
+        name=QualifiedName('test_project.test_dataset.events'),
+        columns=[
+            Column('id', INT64, nullable=False),
+            Column('ts', TIMESTAMP, default_expression='CURRENT_TIMESTAMP()', nullable=True),
+            Column(
+                'amount',
+                Numeric(precision=10, scale=2),
+                nullable=True,
+                description='in cents',
+                rounding_mode='ROUND_HALF_EVEN',
+            ),
+        ],
+        primary_key=PrimaryKey(column_names=['id']),
+        partitioning=Partitioning(
+            kind='TIME',
+            column='ts',
+            time_unit='HOUR',
+            expiration=7.0,
+            require_filter=True,
+        ),
+        clustering=['id'],
+        description='All events',
+        labels={'env': 'prod'},
+    )
+
+    assert relations['ranges'].partitioning == Partitioning(
+        kind='INT',
+        column='id',
+        int_start=0,
+        int_end=100,
+        int_step=10,
+    )
+    assert relations['my_view'] == View(
+        name=QualifiedName('test_project.test_dataset.my_view'),
+        columns=[Column('one', INT64, nullable=True)],
+        select_sql='SELECT 1 AS one',
+    )
+
+
+def test_load_tables():
+    google_client = Mock()
+    client = BqClient(google_client)
+    mview = bq.Table('test_project.test_dataset.my_mview')
+    mview._properties['type'] = 'MATERIALIZED_VIEW'
+    google_client.get_table.return_value = mview
+
+    google_client.query_and_wait.side_effect = [
+        [relation_row('my_mview', 'MATERIALIZED VIEW'), relation_row('flags'), relation_row('external', 'EXTERNAL')],
+        [
+            column_row('flags', 'flag', 'BOOL'),
+            column_row('flags', 'tags', 'ARRAY<STRING>'),
+            column_row('flags', 'meta', 'STRUCT<during RANGE<DATE>>'),
+        ],
+        [],
+        [],
+    ]
+
+    tables = client.load_tables(DATASET_REF)
+
+    assert google_client.query_and_wait.call_count == 4
+    assert [t.table_id for t in tables] == ['flags', 'my_mview']
+    assert tables[1] is mview
+    google_client.get_table.assert_called_once_with(DATASET_REF.table('my_mview'))
+
+    assert to_liti_relation(tables[0]).columns == [
+        Column('flag', BOOL, nullable=True),
+        Column('tags', Array(inner=String()), nullable=True),
+        Column('meta', Struct(fields={'during': Range(kind='DATE')}), nullable=True),
+    ]
+
+    # the catalog also answers existence checks
+    assert client.has_materialized_view(DATASET_REF.table('my_mview'))
+    assert not client.has_table(DATASET_REF.table('missing'))
+    google_client.get_table.assert_called_once()
+
+
+def test_load_tables_missing_dataset():
+    google_client = Mock()
+    google_client.query_and_wait.side_effect = NotFound('missing')
+
+    assert BqClient(google_client).load_tables(DATASET_REF) == []
@@ -0,0 +1,75 @@
+from unittest.mock import Mock, patch
+
+from google.api_core.exceptions import AlreadyExists, ServiceUnavailable
+from pytest import fixture, raises
+
+from liti.core.client.bigquery_storage import ALREADY_EXISTS_CODE, BqAppendStream, build_row_message
+
+COLUMNS = {'idx': int, 'op_kind': str, 'inverse_op': str}
+
+
+@fixture(autouse=True)
+def bqs() -> Mock:
+    with patch('liti.core.client.bigquery_storage.bqs') as bqs:
+        yield bqs
+
+
+@fixture
+def write_client() -> Mock:
+    client = Mock()
+    client.append_rows.return_value = [Mock(error=Mock(code=0))]
+    return client
+
+
+def test_build_row_message():
+    descriptor, message_class = build_row_message(COLUMNS)
+    row = message_class.FromString(message_class(idx=3, op_kind='create_schema').SerializeToString())
+
+    assert [field.name for field in descriptor.field] == ['idx', 'op_kind', 'inverse_op']
+    assert row.idx == 3
+    assert not row.HasField('inverse_op')
+
+
+def test_append_offsets(bqs: Mock, write_client: Mock):
+    stream = BqAppendStream(write_client, 'test_stream', COLUMNS)
+
+    stream.append([{'idx': 0, 'op_kind': 'create_schema', 'inverse_op': None}])
+    stream.append([{'idx': 1, 'op_kind': 'create_schema'}, {'idx': 2, 'op_kind': 'create_schema'}])
+
+    offsets = [call.kwargs['offset'] for call in bqs.types.AppendRowsRequest.call_args_list]
+
+    assert offsets == [0, 1]
+    assert stream.offset == 3
+
+
+def test_append_retry(bqs: Mock, write_client: Mock):
+    stream = BqAppendStream(write_client, 'test_stream', COLUMNS)
+    write_client.append_rows.side_effect = [ServiceUnavailable('unavailable'), [Mock(error=Mock(code=0))]]
+
+    stream.append([{'idx': 0, 'op_kind': 'create_schema'}])
+
+    # the retry sends the same request with the same offset
+    requests = [list(call.args[0]) for call in write_client.append_rows.call_args_list]
+
+    assert requests[0] == requests[1]
+    assert stream.offset == 1
+
+
+def test_append_already_written(write_client: Mock):
+    stream = BqAppendStream(write_client, 'test_stream', COLUMNS)
+    write_client.append_rows.side_effect = [AlreadyExists('written'), [Mock(error=Mock(code=ALREADY_EXISTS_CODE))]]
+
+    stream.append([{'idx': 0, 'op_kind': 'create_schema'}])
+    stream.append([{'idx': 1, 'op_kind': 'create_schema'}])
+
+    assert stream.offset == 2
+
+
+def test_append_error(write_client: Mock):
+    stream = BqAppendStream(write_client, 'test_stream', COLUMNS)
+    write_client.append_rows.return_value = [Mock(error=Mock(code=3, message='invalid'))]
+
+    with raises(RuntimeError):
+        stream.append([{'idx': 0, 'op_kind': 'create_schema'}])
+
+    assert stream.offset == 0
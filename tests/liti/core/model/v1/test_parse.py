@@ -0,0 +1,64 @@
+import json
+from unittest.mock import patch
+
+from pytest import fixture
+
+from liti.core.model.v1.datatype import INT64
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.column import AddColumn, RenameColumn
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, SetLabels
+from liti.core.model.v1.parse import iter_parse_operation_rows, parse_operation, parse_operation_rows
+from liti.core.model.v1.schema import Column, ColumnName, QualifiedName, Schema, Table
+
+TABLE_NAME = QualifiedName('my_project.my_dataset.my_table')
+
+
+@fixture
+def operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=QualifiedName('my_project.my_dataset'))),
+        CreateTable(table=Table(name=TABLE_NAME, columns=[Column('id', INT64)])),
+        AddColumn(table_name=TABLE_NAME, column=Column('col_a', INT64)),
+        SetLabels(entity_name=TABLE_NAME, labels={'key': 'value'}),
+        AddColumn(table_name=TABLE_NAME, column=Column('col_b', INT64)),
+        RenameColumn(table_name=TABLE_NAME, from_name=ColumnName('col_a'), to_name=ColumnName('col_c')),
+    ]
+
+
+def test_parse_operation_rows_json(operations: list[Operation]):
+    rows = [(op.KIND, op.model_dump_json(exclude_none=True)) for op in operations]
+
+    assert parse_operation_rows(rows) == operations
+    assert parse_operation_rows(rows) == [parse_operation(op_kind, json.loads(op_data)) for op_kind, op_data in rows]
+
+
+def test_parse_operation_rows_mixed(operations: list[Operation]):
+    # the BigQuery client may return some JSON columns decoded and others as strings
+    rows = [
+        (op.KIND, op.model_dump_json(exclude_none=True) if i % 2 else json.loads(op.model_dump_json(exclude_none=True)))
+        for i, op in enumerate(operations)
+    ]
+
+    assert parse_operation_rows(rows) == operations
+
+
+def test_parse_operation_rows_empty():
+    assert parse_operation_rows([], processes=4) == []
+
+
+def test_parse_operation_rows_processes(operations: list[Operation]):
+    rows = [(op.KIND, op.model_dump_json(exclude_none=True)) for op in operations] * 3
+
+    with patch('liti.core.model.v1.parse.PARSE_CHUNK_SIZE', 4):
+        assert parse_operation_rows(rows, processes=2) == operations * 3
+
+
+def test_iter_parse_operation_rows(operations: list[Operation]):
+    rows = iter([(op.KIND, op.model_dump_json(exclude_none=True)) for op in operations])
+
+    with patch('liti.core.model.v1.parse.PARSE_CHUNK_SIZE', 2):
+        parsed = iter_parse_operation_rows(rows)
+
+        # only the first chunk is read to yield its operations
+        assert next(parsed) == operations[0]
+        assert len(list(rows)) == len(operations) - 2
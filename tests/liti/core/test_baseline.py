@@ -0,0 +1,205 @@
+from pathlib import Path
+
+from pytest import fixture, raises
+
+from liti.core.backend.file import FileMetaBackend
+from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
+from liti.core.baseline import build_baseline, create_operations, write_baseline_file
+from liti.core.context import Context
+from liti.core.digest import op_data_prefix_digests, prefix_digests
+from liti.core.function import replay
+from liti.core.model.v1.datatype import BOOL, INT64
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.column import AddColumn
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, RenameTable, SetDescription
+from liti.core.model.v1.operation.data.view import CreateView
+from liti.core.model.v1.parse import parse_baseline_file
+from liti.core.model.v1.schema import Column, ColumnName, ForeignKey, ForeignReference, Identifier, QualifiedName, \
+    Schema, Table, View
+from liti.core.runner import MigrateRunner
+
+SCHEMA_NAME = QualifiedName('my_project.my_dataset')
+PARENT_NAME = QualifiedName('my_project.my_dataset.parent_table')
+CHILD_NAME = QualifiedName('my_project.my_dataset.child_table')
+RENAMED_NAME = QualifiedName('my_project.my_dataset.renamed_table')
+
+
+@fixture
+def history() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=SCHEMA_NAME)),
+        CreateTable(table=Table(
+            name=CHILD_NAME,
+            columns=[Column('parent_id', INT64)],
+            foreign_keys=[ForeignKey(
+                foreign_table_name=PARENT_NAME,
+                references=[ForeignReference(
+                    local_column_name=ColumnName('parent_id'),
+                    foreign_column_name=ColumnName('id'),
+                )],
+            )],
+        )),
+        CreateTable(table=Table(name=PARENT_NAME, columns=[Column('id', INT64)])),
+        CreateTable(table=Table(name=QualifiedName('my_project.my_dataset.old_table'), columns=[Column('id', INT64)])),
+        RenameTable(from_name=QualifiedName('my_project.my_dataset.old_table'), to_name=Identifier('renamed_table')),
+        CreateView(view=View(name=QualifiedName('my_project.my_dataset.my_view'), select_sql='SELECT 1 AS one')),
+        SetDescription(entity_name=PARENT_NAME, description='parent'),
+        AddColumn(table_name=PARENT_NAME, column=Column('col_bool', BOOL)),
+    ]
+
+
+def simulate(operations: list[Operation]) -> MemoryDbBackend:
+    db_backend = MemoryDbBackend()
+    replay(db_backend, operations)
+    return db_backend
+
+
+def make_runner(db_backend: MemoryDbBackend, meta_backend, target: list[Operation]) -> MigrateRunner:
+    return MigrateRunner(context=Context(
+        db_backend=db_backend,
+        meta_backend=meta_backend,
+        target_operations=target,
+        silent=True,
+    ))
+
+
+def test_build_baseline(history: list[Operation]):
+    baseline = build_baseline(history[:6])
+
+    assert baseline.operation_count == 6
+    assert baseline.digest == prefix_digests(history[:6])[-1]
+    assert baseline.catalog == simulate(history[:6]).dump_catalog()
+
+    # the digests after the baseline are unchanged
+    assert prefix_digests([baseline, *history[6:]])[1:] == prefix_digests(history)[6:]
+
+
+def test_op_data_prefix_digests(history: list[Operation]):
+    operations = [build_baseline(history[:6]), *history[6:]]
+    rows = [(op.KIND, op.model_dump(mode='json', exclude_none=True)) for op in operations]
+
+    assert op_data_prefix_digests(rows) == prefix_digests(operations)
+
+
+def test_create_operations(history: list[Operation]):
+    baseline = build_baseline(history)
+    db_backend = simulate(create_operations(baseline))
+
+    # referenced tables are created first and renamed tables are created with their current names
+    operations = create_operations(baseline)
+
+    assert [type(op) for op in operations] == [CreateSchema, CreateTable, CreateTable, CreateTable, CreateView]
+    assert operations[1].table.name == PARENT_NAME
+    assert db_backend.get_table(RENAMED_NAME).name == RENAMED_NAME
+    assert set(db_backend.tables) == set(simulate(history).tables)
+    assert db_backend.get_table(PARENT_NAME) == simulate(history).get_table(PARENT_NAME)
+
+
+def test_baseline_file(tmp_path: Path, history: list[Operation]):
+    baseline = build_baseline(history)
+    write_baseline_file(tmp_path / 'baseline.json', baseline)
+
+    assert parse_baseline_file(tmp_path / 'baseline.json') == baseline
+
+
+def test_migrate_new_database(history: list[Operation]):
+    baseline = build_baseline(history[:6])
+    db_backend = MemoryDbBackend()
+    meta_backend = MemoryMetaBackend()
+
+    make_runner(db_backend, meta_backend, [baseline, *history[6:]]).run(wet_run=True)
+
+    assert set(db_backend.tables) == set(simulate(history).tables)
+    assert db_backend.get_table(PARENT_NAME) == simulate(history).get_table(PARENT_NAME)
+    assert meta_backend.applied_operations == [baseline, *history[6:]]
+    assert meta_backend.inverse_operations[0] is None
+
+
+def test_migrate_uncompacted_metadata(history: list[Operation]):
+    baseline = build_baseline(history[:6])
+    db_backend = simulate(history[:7])
+    meta_backend = MemoryMetaBackend(history[:7])
+
+    make_runner(db_backend, meta_backend, [baseline, *history[6:]]).run(wet_run=True)
+
+    assert meta_backend.applied_operations == history
+    assert db_backend.get_table(PARENT_NAME).column_map[ColumnName('col_bool')] == Column('col_bool', BOOL)
+
+
+def test_plan_uncompacted_digests(tmp_path: Path, history: list[Operation]):
+    baseline = build_baseline(history[:6])
+    meta_backend = FileMetaBackend(tmp_path / 'meta.jsonl')
+
+    for op in history[:7]:
+        meta_backend.apply_operation(op)
+
+    assert meta_backend.get_migration_plan([baseline, *history[6:]]) == {'down': [], 'up': history[7:]}
+    assert meta_backend.get_migration_plan([baseline]) == {'down': [history[6]], 'up': []}
+
+
+def test_compact(tmp_path: Path, history: list[Operation]):
+    baseline = build_baseline(history[:6])
+    meta_backend = FileMetaBackend(tmp_path / 'meta.jsonl')
+
+    for op in history:
+        meta_backend.apply_operation(op)
+
+    meta_backend.compact(baseline)
+
+    assert meta_backend.get_applied_operations() == [baseline, *history[6:]]
+    assert meta_backend.get_applied_digests() == prefix_digests(history)[6:]
+    assert meta_backend.get_migration_plan([baseline, *history[6:]]) == {'down': [], 'up': []}
+
+
+def test_nested_baseline(tmp_path: Path, history: list[Operation]):
+    earlier = build_baseline(history[:4])
+    baseline = build_baseline([earlier, *history[4:6]])
+
+    # the count and digest are those of the operations both baselines compact
+    assert baseline.operation_count == 6
+    assert baseline.digest == prefix_digests(history[:6])[-1]
+
+    uncompacted = FileMetaBackend(tmp_path / 'uncompacted.jsonl')
+    compacted = FileMetaBackend(tmp_path / 'compacted.jsonl')
+
+    for op in history[:7]:
+        uncompacted.apply_operation(op)
+
+    for op in [earlier, *history[4:7]]:
+        compacted.apply_operation(op)
+
+    for meta_backend in [uncompacted, compacted]:
+        assert meta_backend.get_migration_plan([baseline, *history[6:]]) == {'down': [], 'up': history[7:]}
+
+        meta_backend.compact(baseline)
+
+        assert meta_backend.get_applied_operations() == [baseline, history[6]]
+
+
+def test_nested_baseline_operations(history: list[Operation]):
+    earlier = build_baseline(history[:4])
+    baseline = build_baseline([earlier, *history[4:6]])
+    meta_backend = MemoryMetaBackend([earlier, *history[4:7]])
+
+    assert meta_backend.get_migration_plan([baseline, *history[6:]]) == {'down': [], 'up': history[7:]}
+
+
+def test_compact_mismatch(history: list[Operation]):
+    meta_backend = MemoryMetaBackend(history[1:])
+
+    with raises(ValueError):
+        meta_backend.compact(build_baseline(history[:6]))
+
+    assert meta_backend.applied_operations == history[1:]
+
+
+def test_cannot_roll_back(history: list[Operation]):
+    baseline = build_baseline(history[:6])
+    db_backend = simulate([baseline])
+    meta_backend = MemoryMetaBackend([baseline])
+
+    with raises(RuntimeError):
+        make_runner(db_backend, meta_backend, []).run(wet_run=True, allow_down=True)
+
+    assert meta_backend.applied_operations == [baseline]
+
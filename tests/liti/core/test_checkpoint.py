@@ -0,0 +1,94 @@
+from pathlib import Path
+
+from pytest import fixture, mark, raises
+
+from liti.core.checkpoint import SimulationCheckpoints
+from liti.core.digest import prefix_digests
+from liti.core.model.v1.datatype import BOOL, INT64
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.column import AddColumn
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, RenameTable, SetDescription
+from liti.core.model.v1.operation.ops.base import OperationOps
+from liti.core.model.v1.schema import Column, Identifier, QualifiedName, Schema, Table
+
+
+@fixture
+def operations() -> list[Operation]:
+    schema_name = QualifiedName('my_project.my_dataset')
+    table_name = QualifiedName('my_project.my_dataset.my_table')
+
+    return [
+        CreateSchema(schema_object=Schema(name=schema_name)),
+        CreateTable(table=Table(name=table_name, columns=[Column('col_bool', BOOL)])),
+        SetDescription(entity_name=table_name, description='first'),
+        AddColumn(table_name=table_name, column=Column('col_int', INT64)),
+        SetDescription(entity_name=table_name, description='second'),
+        RenameTable(from_name=table_name, to_name=Identifier('renamed_table')),
+        SetDescription(entity_name=schema_name, description='schema'),
+    ]
+
+
+@mark.parametrize(
+    'start, end, expected',
+    [
+        [0, 0, []],
+        [0, 1, []],
+        [0, 2, [2]],
+        [0, 7, [2, 4, 6]],
+        [2, 7, [4, 6]],
+        [3, 7, [4, 6]],
+        [6, 7, []],
+    ],
+)
+def test_counts(tmp_path: Path, start: int, end: int, expected: list[int]):
+    assert list(SimulationCheckpoints(tmp_path, 2).counts(start, end)) == expected
+
+
+def test_invalid_interval(tmp_path: Path):
+    with raises(ValueError):
+        SimulationCheckpoints(tmp_path, 0)
+
+
+def test_simulate_saves_checkpoints(tmp_path: Path, operations: list[Operation]):
+    checkpoints = SimulationCheckpoints(tmp_path, 2)
+    digests = prefix_digests(operations)
+
+    actual = OperationOps.simulate(operations, checkpoints)
+    expected = OperationOps.simulate(operations)
+
+    assert actual.dump_catalog() == expected.dump_catalog()
+    assert sorted(path.stem for path in tmp_path.iterdir()) == sorted([digests[2], digests[4], digests[6]])
+
+
+def test_simulate_restores_checkpoint(tmp_path: Path, operations: list[Operation]):
+    checkpoints = SimulationCheckpoints(tmp_path, 2)
+    OperationOps.simulate(operations[:5], checkpoints)
+
+    count, restored = checkpoints.restore(prefix_digests(operations))
+
+    assert count == 4
+    assert restored.dump_catalog() == OperationOps.simulate(operations[:4]).dump_catalog()
+    assert OperationOps.simulate(operations, checkpoints).dump_catalog() == OperationOps.simulate(operations).dump_catalog()
+
+
+def test_restore_diverged_history(tmp_path: Path, operations: list[Operation]):
+    checkpoints = SimulationCheckpoints(tmp_path, 2)
+    OperationOps.simulate(operations, checkpoints)
+
+    diverged = operations[:3] + [SetDescription(entity_name=operations[2].entity_name, description='other')]
+    count, _ = checkpoints.restore(prefix_digests(diverged))
+
+    assert count == 2
+
+
+def test_restore_corrupt_checkpoint(tmp_path: Path, operations: list[Operation]):
+    checkpoints = SimulationCheckpoints(tmp_path, 2)
+    OperationOps.simulate(operations[:5], checkpoints)
+    digests = prefix_digests(operations)
+
+    # a corrupt checkpoint is a cache miss, the next one down is restored
+    checkpoints.path(digests[4]).write_text('{"tables": ')
+    count, _ = checkpoints.restore(digests)
+
+    assert count == 2
+    assert list(tmp_path.glob('*.tmp')) == []
@@ -1,8 +1,11 @@
 from pytest import fixture, mark
 
-from liti.core.function import extract_nested_datatype
+from liti.core.backend.memory import MemoryDbBackend
+from liti.core.function import extract_nested_datatype, replay
 from liti.core.model.v1.datatype import Array, BOOL, Datatype, FLOAT64, INT64, STRING, Struct
-from liti.core.model.v1.schema import Column, FieldPath, Table, QualifiedName
+from liti.core.model.v1.operation.data.column import AddColumn
+from liti.core.model.v1.operation.data.table import CreateSchema, CreateTable, SetDescription
+from liti.core.model.v1.schema import Column, FieldPath, QualifiedName, Schema, Table
 
 
 @fixture
@@ -44,3 +47,23 @@ def nested_table() -> Table:
 )
 def test_extract_nested_datatype(nested_table: Table, field_path: str, expected: Datatype):
     assert extract_nested_datatype(nested_table, FieldPath(field_path)) == expected
+
+
+def test_replay():
+    table_name = QualifiedName('my_project.my_dataset.my_table')
+
+    operations = [
+        CreateSchema(schema_object=Schema(name=QualifiedName('my_project.my_dataset'))),
+        CreateTable(table=Table(name=table_name, columns=[Column('col_bool', BOOL)])),
+        AddColumn(table_name=table_name, column=Column('col_int', INT64)),
+        SetDescription(entity_name=table_name, description='replayed'),
+    ]
+
+    db_backend = MemoryDbBackend()
+    replay(db_backend, operations)
+
+    assert db_backend.get_table(table_name) == Table(
+        name=table_name,
+        columns=[Column('col_bool', BOOL), Column('col_int', INT64)],
+        description='replayed',
+    )
@@ -0,0 +1,99 @@
+from pytest import fixture
+
+from liti.core.backend.memory import MemoryMetaBackend
+from liti.core.context import Context
+from liti.core.function import attach_ops
+from liti.core.history import affected_name, EntityHistoryIndex
+from liti.core.model.v1.datatype import BOOL, INT64
+from liti.core.model.v1.operation.data.base import Operation
+from liti.core.model.v1.operation.data.column import AddColumn, DropColumn
+from liti.core.model.v1.operation.data.sql import ExecuteSql
+from liti.core.model.v1.operation.data.table import AddForeignKey, CreateSchema, CreateTable, RenameTable, \
+    SetDescription
+from liti.core.model.v1.operation.ops.base import OperationOps
+from liti.core.model.v1.schema import Column, ColumnName, ForeignKey, ForeignReference, Identifier, QualifiedName, \
+    Schema, Table
+
+SCHEMA_NAME = QualifiedName('my_project.my_dataset')
+TABLE_NAME = QualifiedName('my_project.my_dataset.my_table')
+RENAMED_NAME = QualifiedName('my_project.my_dataset.renamed_table')
+OTHER_NAME = QualifiedName('my_project.my_dataset.other_table')
+
+
+@fixture
+def operations() -> list[Operation]:
+    return [
+        CreateSchema(schema_object=Schema(name=SCHEMA_NAME)),
+        CreateTable(table=Table(name=TABLE_NAME, columns=[Column('col_bool', BOOL)])),
+        CreateTable(table=Table(name=OTHER_NAME, columns=[Column('col_int', INT64)])),
+        AddColumn(table_name=TABLE_NAME, column=Column('col_int', INT64)),
+        SetDescription(entity_name=OTHER_NAME, description='other'),
+        RenameTable(from_name=TABLE_NAME, to_name=Identifier('renamed_table')),
+        AddForeignKey(
+            table_name=OTHER_NAME,
+            foreign_key=ForeignKey(
+                name='fk_renamed',
+                foreign_table_name=RENAMED_NAME,
+                references=[ForeignReference(local_column_name='col_int', foreign_column_name='col_int')],
+            ),
+        ),
+        SetDescription(entity_name=SCHEMA_NAME, description='schema'),
+    ]
+
+
+def test_affected_name(operations: list[Operation]):
+    assert [affected_name(op) for op in operations] == [
+        SCHEMA_NAME,
+        TABLE_NAME,
+        OTHER_NAME,
+        TABLE_NAME,
+        OTHER_NAME,
+        TABLE_NAME,
+        OTHER_NAME,
+        SCHEMA_NAME,
+    ]
+
+    assert affected_name(ExecuteSql(up='up.sql', down='down.sql')) is None
+
+
+def test_positions(operations: list[Operation]):
+    index = EntityHistoryIndex(operations)
+
+    assert index.positions({SCHEMA_NAME}) == [0, 7]
+    assert index.positions({RENAMED_NAME}) == [1, 3, 5]
+    assert index.positions({TABLE_NAME}) == []
+    assert index.positions({OTHER_NAME}) == [2, 4, 6]
+    assert index.positions({RENAMED_NAME, OTHER_NAME}) == [1, 2, 3, 4, 5, 6]
+    assert index.positions(set()) == []
+
+
+def test_positions_unscoped(operations: list[Operation]):
+    index = EntityHistoryIndex([*operations, ExecuteSql(up='up.sql', down='down.sql')])
+
+    assert index.positions({SCHEMA_NAME}) == [0, 7, 8]
+    assert index.positions(set()) == [8]
+
+
+def test_select(operations: list[Operation]):
+    index = EntityHistoryIndex(operations)
+    assert index.select({RENAMED_NAME}) == [operations[1], operations[3], operations[5]]
+
+
+def test_simulate_previous(monkeypatch, operations: list[Operation]):
+    drop_column = DropColumn(table_name=RENAMED_NAME, column_name=ColumnName('col_int'))
+    meta_backend = MemoryMetaBackend([*operations, drop_column])
+    simulations = []
+    simulate = OperationOps.simulate
+
+    def counting_simulate(ops, checkpoints=None):
+        simulations.append(ops)
+        return simulate(ops, checkpoints)
+
+    monkeypatch.setattr(OperationOps, 'simulate', staticmethod(counting_simulate))
+
+    assert attach_ops(drop_column, Context(meta_backend=meta_backend)).down() == AddColumn(
+        table_name=RENAMED_NAME,
+        column=Column('col_int', INT64),
+    )
+
+    assert simulations == [[operations[1], operations[3], operations[5]]]
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from pytest import mark
+
+from liti.core.mirror import MetaMirror
+from liti.core.model.v1.schema import QualifiedName
+
+TABLE_NAME = QualifiedName('my_project.my_dataset.meta_table')
+
+
+def test_save_and_load(tmp_path: Path):
+    mirror = MetaMirror(tmp_path / 'mirror')
+
+    rows = [
+        {'idx': 0, 'op_kind': 'create_schema', 'op_data': '{}', 'inverse_op': None, 'chain_digest': 'first'},
+        {'idx': 1, 'op_kind': 'drop_schema', 'op_data': '{}', 'inverse_op': '{}', 'chain_digest': 'second'},
+    ]
+
+    assert mirror.load(TABLE_NAME) == []
+
+    mirror.save(TABLE_NAME, rows)
+
+    assert mirror.path(TABLE_NAME) == tmp_path / 'mirror' / 'my_project.my_dataset.meta_table.jsonl'
+    assert mirror.load(TABLE_NAME) == rows
+    assert list((tmp_path / 'mirror').iterdir()) == [mirror.path(TABLE_NAME)]
+
+    mirror.save(TABLE_NAME, rows[:1])
+    assert mirror.load(TABLE_NAME) == rows[:1]
+
+
+@mark.parametrize('content', ['{"idx": 0, "op_kind": "create_sch', '{"idx": 0}\n', '[0]\n'])
+def test_load_corrupt(tmp_path: Path, content: str):
+    mirror = MetaMirror(tmp_path)
+    mirror.path(TABLE_NAME).write_text(content)
+
+    # a truncated or invalid copy is a cache miss
+    assert mirror.load(TABLE_NAME) == []
@@ -6,10 +6,12 @@ from pytest import fixture, mark
 
 from liti.core.backend.memory import MemoryDbBackend, MemoryMetaBackend
 from liti.core.context import Context
+from liti.core.digest import prefix_digests
 from liti.core.model.v1.datatype import Array, BigNumeric, BOOL, BYTES, Bytes, DATE, DATE_TIME, FLOAT64, GEOGRAPHY, \
     INT64, JSON, Numeric, Range, STRING, String, Struct, TIME, TIMESTAMP
-from liti.core.model.v1.operation.data.column import AddColumn
-from liti.core.model.v1.operation.data.table import CreateTable
+from liti.core.model.v1.operation.data.column import AddColumn, DropColumn
+from liti.core.model.v1.operation.data.table import CreateTable, DropTable, SetDescription
+from liti.core.model.v1.operation.ops.base import OperationOps
 from liti.core.model.v1.schema import Column, ColumnName, ForeignKey, ForeignReference, IntervalLiteral, Partitioning, \
     PrimaryKey, QualifiedName, RoundingMode, Table
 from liti.core.model.v1.template import Template
@@ -992,6 +994,170 @@ def test_drop_materialized_view(db_backend: MemoryDbBackend, meta_backend: Memor
     assert materialized_view.refresh_interval == timedelta(hours=1)
 
 
+def test_plan_down(monkeypatch, db_backend: MemoryDbBackend):
+    table_name = QualifiedName('my_project.my_dataset.plan_table')
+    table = Table(name=table_name, columns=[Column('col_bool', BOOL), Column('col_int', INT64)])
+
+    meta_backend = MemoryMetaBackend([
+        CreateTable(table=table),
+        SetDescription(entity_name=table_name, description='first'),
+        SetDescription(entity_name=table_name, description='second'),
+        DropColumn(table_name=table_name, column_name=ColumnName('col_int')),
+    ])
+
+    simulations = []
+    simulate = OperationOps.simulate
+
+    def counting_simulate(operations, checkpoints=None):
+        simulations.append(len(operations))
+        return simulate(operations, checkpoints)
+
+    monkeypatch.setattr(OperationOps, 'simulate', staticmethod(counting_simulate))
+    runner = MigrateRunner(context=Context(db_backend=db_backend, meta_backend=meta_backend))
+
+    assert runner.plan_down(list(reversed(meta_backend.applied_operations[1:]))) == [
+        AddColumn(table_name=table_name, column=Column('col_int', INT64)),
+        SetDescription(entity_name=table_name, description='first'),
+        SetDescription(entity_name=table_name, description=None),
+    ]
+
+    assert simulations == [1]
+    assert runner.plan_down([]) == []
+
+
+def test_plan_down_stored_inverses(monkeypatch, db_backend: MemoryDbBackend):
+    table_name = QualifiedName('my_project.my_dataset.plan_table')
+    create_table = CreateTable(table=Table(name=table_name, columns=[Column('col_bool', BOOL)]))
+    meta_backend = MemoryMetaBackend([create_table], [DropTable(table_name=table_name)])
+
+    def fail_get_applied_operations():
+        raise AssertionError('Stored inverses should not require the history')
+
+    monkeypatch.setattr(meta_backend, 'get_applied_operations', fail_get_applied_operations)
+    runner = MigrateRunner(context=Context(db_backend=db_backend, meta_backend=meta_backend))
+
+    assert runner.plan_down([create_table]) == [DropTable(table_name=table_name)]
+
+
+def test_inverses_outside_history(db_backend: MemoryDbBackend, meta_backend: MemoryMetaBackend):
+    table_name = QualifiedName('my_project.my_dataset.adopted_table')
+    other_name = QualifiedName('my_project.my_dataset.other_table')
+
+    # created before liti was adopted, so the history does not know it
+    db_backend.create_table(Table(name=table_name, columns=[Column('col_bool', BOOL)]))
+
+    operations = [
+        AddColumn(table_name=table_name, column=Column('col_int', INT64)),
+        SetDescription(entity_name=table_name, description='adopted'),
+        CreateTable(table=Table(name=other_name, columns=[Column('col_bool', BOOL)])),
+    ]
+
+    MigrateRunner(context=Context(
+        db_backend=db_backend,
+        meta_backend=meta_backend,
+        target_operations=operations,
+        silent=True,
+    )).run(wet_run=True)
+
+    # the operations the simulation cannot apply are stored without an inverse
+    assert meta_backend.applied_operations == operations
+    assert meta_backend.inverse_operations == [None, None, DropTable(table_name=other_name)]
+    assert db_backend.get_table(table_name).description == 'adopted'
+
+
+def test_stored_inverses(monkeypatch, db_backend: MemoryDbBackend, meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    table_name = QualifiedName('my_project.my_dataset.revert_table')
+
+    make_runner('target_drop_table').run(wet_run=True)
+
+    assert meta_backend.inverse_operations == [
+        DropTable(table_name=table_name),
+        CreateTable(table=Table(name=table_name, columns=[Column('col_bool', BOOL)])),
+    ]
+
+    def fail_simulate(operations, checkpoints=None):
+        raise AssertionError('Stored inverses should not require a simulation')
+
+    monkeypatch.setattr(OperationOps, 'simulate', staticmethod(fail_simulate))
+    make_runner('target_revert').run(wet_run=True, allow_down=True, store_inverses=False)
+
+    assert db_backend.get_table(table_name) == Table(name=table_name, columns=[Column('col_bool', BOOL)])
+    assert meta_backend.inverse_operations == [DropTable(table_name=table_name)]
+
+
+def test_dry_run_multiple_down(db_backend: MemoryDbBackend, meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    table_name = QualifiedName('my_project.my_dataset.revert_table')
+
+    make_runner('target_drop_table').run(wet_run=True)
+    make_runner('target_empty').run(wet_run=False, allow_down=True)
+
+    assert len(db_backend.tables) == 0
+    assert len(meta_backend.get_applied_operations()) == 2
+
+    assert make_runner('target_empty').plan_down(list(reversed(meta_backend.get_applied_operations()))) == [
+        CreateTable(table=Table(name=table_name, columns=[Column('col_bool', BOOL)])),
+        DropTable(table_name=table_name),
+    ]
+
+
+def test_flush_per_phase(monkeypatch, meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    flushes = []
+    monkeypatch.setattr(meta_backend, 'flush', lambda: flushes.append(len(meta_backend.applied_operations)))
+
+    make_runner('target_drop_table').run(wet_run=False)
+    assert flushes == []
+
+    make_runner('target_drop_table').run(wet_run=True)
+    assert flushes == [0, 2]
+
+    make_runner('target_empty').run(wet_run=True, allow_down=True)
+    assert flushes == [0, 2, 0, 0]
+
+
+def test_meta_cache(monkeypatch, meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    reads = []
+    get_applied_operations = meta_backend.get_applied_operations
+
+    def counting_get_applied_operations():
+        reads.append(True)
+        return get_applied_operations()
+
+    make_runner('target_drop_table').run(wet_run=True)
+    monkeypatch.setattr(meta_backend, 'get_applied_operations', counting_get_applied_operations)
+
+    runner = make_runner('target_empty')
+    runner.run(wet_run=True, allow_down=True, store_inverses=False)
+
+    # the stored inverses are enough to roll back, so the history is only read to plan
+    assert len(reads) == 1
+    assert runner.meta_cache.misses == 2
+    assert runner.context.meta_backend is meta_backend
+    assert meta_backend.applied_operations == []
+
+
+def test_unchanged_run_reads_digests_only(monkeypatch, meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    make_runner('target_drop_table').run(wet_run=True)
+    digests = prefix_digests(meta_backend.applied_operations)[1:]
+
+    def fail_get_applied_operations():
+        raise AssertionError('An unchanged history should not be loaded')
+
+    monkeypatch.setattr(meta_backend, 'get_applied_digests', lambda: digests)
+    monkeypatch.setattr(meta_backend, 'get_applied_operations', fail_get_applied_operations)
+
+    make_runner('target_drop_table').run(wet_run=True)
+
+
+def test_prepare_target_operations(meta_backend: MemoryMetaBackend, make_runner: MakeRunner):
+    make_runner('target_create_view').run(wet_run=True)
+    applied_digests = prefix_digests(meta_backend.applied_operations)
+    runner = make_runner('target_create_view')
+
+    # the view SQL is read from its select file as a default
+    assert prefix_digests(runner.target_operations) != applied_digests
+    assert prefix_digests(runner.prepare_target_operations()) == applied_digests
+
+
 def test_template_database_and_schema(
     db_backend: MemoryDbBackend,
     meta_backend: MemoryMetaBackend,
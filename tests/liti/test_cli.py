@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+from pytest import mark
+
+from liti.cli import build_meta_backend, Clients, main, parse_all_arguments, parse_compact_arguments, \
+    parse_migrate_arguments, parse_scan_arguments, parse_status_arguments, parse_upgrade_meta_arguments
+
+
+@mark.parametrize(
+    'parse, argv',
+    [
+        [parse_all_arguments, ['migrate', '-t', 'migrations', '--db', 'bigquery', '--meta', 'bigquery']],
+        [parse_migrate_arguments, ['migrate', '-t', 'migrations', '--db', 'bigquery', '--meta', 'bigquery']],
+        [parse_scan_arguments, ['scan', '--db', 'bigquery', '--scan-database', 'my_project', '--scan-schema', 'my_dataset']],
+        [parse_upgrade_meta_arguments, ['upgrade-meta', '--meta', 'bigquery', '--meta-table-name', 'my_project.my_dataset.meta']],
+        [parse_status_arguments, ['status', '--db', 'bigquery', '--meta', 'bigquery', '--meta-table-name', 'my_project.my_dataset.meta']],
+        [parse_compact_arguments, ['compact', '-t', 'migrations', '--baseline-count', '2', '--db', 'bigquery']],
+    ],
+)
+def test_parse_arguments(monkeypatch, parse, argv: list[str]):
+    monkeypatch.setattr(sys, 'argv', ['liti', *argv])
+
+    assert parse().command == argv[0]
+
+
+def test_meta_batch_size_default(monkeypatch, tmp_path: Path):
+    meta_file = str(tmp_path / 'meta.db')
+    monkeypatch.setattr(sys, 'argv', ['liti', 'migrate', '-t', 'migrations', '--meta', 'sqlite', '--meta-file', meta_file])
+    args = parse_migrate_arguments()
+
+    # each operation is recorded before the next one runs unless batching is requested
+    assert build_meta_backend(args, Clients()).batch_size == 1
+
+
+def test_main(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['liti', 'migrate', '-t', 'tests/res/target_create_table'])
+
+    # a dry run against the memory backends exercises the whole entrypoint
+    main()